@@ -0,0 +1,45 @@
+# Databricks notebook source
+# 00_run_pipeline
+# Runs the Bronze -> Silver -> Gold notebooks and SQL scripts as a DAG on this
+# cluster's Spark session. Dependencies come from the tables each step reads and
+# writes; independent steps (e.g. the Gold dimension builds) run concurrently.
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(".."))  # repo root, so `pipeline` is importable
+
+from pipeline import instrumentation
+from pipeline.runner import PIPELINE, run_pipeline
+
+# True : show the plan (waves of nodes that can run together) without running anything
+# False: run it
+dry_run = True
+
+# Skip nodes that completed in the previous, failed run (unchanged source only)
+resume = False
+
+# Rebuild Gold tables even when their SQL and input Delta versions are unchanged
+force = False
+
+max_workers = 4
+retries = 2
+
+# COMMAND ----------
+
+result = run_pipeline(spark, PIPELINE, max_workers=max_workers, retries=retries,
+                      resume=resume, dry_run=dry_run, display=display, force=force)
+display(spark.createDataFrame(result))
+
+# COMMAND ----------
+
+# Per-write telemetry of this run vs the previous run of each stage (pipeline/instrumentation.py)
+if not dry_run:
+    spark.sql(instrumentation.trend_view_sql())
+    display(spark.sql(f"""
+    SELECT stage, target_table, seconds, prev_seconds, slowdown, rows_in, prev_rows_in,
+           rows_out, bytes_written, files_written, shuffle_read_bytes, spill_bytes, plan_changed
+    FROM {instrumentation.RUNS_TREND_VIEW}
+    WHERE run_id = '{instrumentation.current_run_id()}'
+    ORDER BY slowdown DESC NULLS LAST
+    """))
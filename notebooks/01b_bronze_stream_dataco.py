@@ -0,0 +1,35 @@
+# Databricks notebook source
+# 01b_bronze_stream_dataco
+# Streaming alternative to notebooks 02 + 01: watches a landing volume for new
+# DataCo CSV files and appends each one, once, to the audited Bronze table with
+# cleaned column names and _ingest_ts / _batch_id. Notebook 03 (incremental)
+# picks the new batches up as usual. See pipeline/bronze_stream.py.
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(".."))  # repo root, so `pipeline` is importable
+
+from pipeline.bronze_stream import CHECKPOINT_DIR, LANDING_DIR, TARGET_TABLE, start_stream
+from pipeline.profiling import profile_new_batches
+
+# True : process the files that landed since the last run, then stop (scheduled job)
+# False: keep running, one micro-batch per trigger interval
+once = True
+
+spark.sql("CREATE VOLUME IF NOT EXISTS workspace.bronze.landing")
+spark.sql("CREATE VOLUME IF NOT EXISTS workspace.bronze.checkpoints")
+
+# COMMAND ----------
+
+query = start_stream(spark, LANDING_DIR, TARGET_TABLE, CHECKPOINT_DIR, auto_loader=True, once=once)
+if once:
+    query.awaitTermination()
+    display(spark.createDataFrame(
+        [(p["batchId"], p["numInputRows"]) for p in query.recentProgress], "batch_id BIGINT, rows BIGINT"
+    ))
+
+    # Profiles of the micro-batches just appended, and their drift checks (pipeline/profiling.py)
+    drift = profile_new_batches(spark)
+    if drift is not None:
+        display(drift.where("NOT passed"))
@@ -1,43 +1,62 @@
 # Databricks notebook source
-import re
+import os
+import sys
+
+sys.path.append(os.path.abspath(".."))  # repo root, so `pipeline` is importable
+
+from pipeline.instrumentation import track
+from pipeline.schema_registry import DRIFT_SCHEMA, check_schema, register
 
 source_table = "default.data_co_supply_chain_dataset"
 target_table = "bronze.dataco_supplychain_raw"
 
+# "table": write the renamed columns to target_table (skipped while the source is unchanged)
+# "view" : a view renaming the source columns in place (no copy; always current)
+materialize = "table"
+
+# Set to True for one run after reviewing a drift report, to rebuild Bronze on the new schema
+accept_drift = False
+
 df = spark.table(source_table)
 
-def clean_name(col: str) -> str:
-    col = col.strip().lower()
-    col = re.sub(r'[\s\-\/]+', '_', col)      # spaces, hyphens, slashes -> _
-    col = re.sub(r'[()]+', '', col)           # remove parentheses
-    col = re.sub(r'[^0-9a-zA-Z_]', '', col)   # remove other special chars
-    col = re.sub(r'__+', '_', col)            # collapse multiple underscores
-    return col
-
-clean_cols = [clean_name(c) for c in df.columns]
-
-# Ensuring uniqueness (in case two columns clean to same name)
-seen = {}
-final_cols = []
-for c in clean_cols:
-    if c in seen:
-        seen[c] += 1
-        final_cols.append(f"{c}_{seen[c]}")
-    else:
-        seen[c] = 0
-        final_cols.append(c)
+# Raw schema fingerprint vs ops.schema_registry; the registered raw -> clean mapping
+# (lower snake_case, uniqueness suffix) is reused while the source schema is unchanged
+check = check_schema(spark, source_table)
+print("Source schema:", check.status, "| source version:", check.source_version,
+      "| registered version:", check.registered_version)
+
+if check.status == "drift":
+    display(spark.createDataFrame(check.drift, DRIFT_SCHEMA))
+    if not accept_drift:
+        raise RuntimeError(
+            f"Schema drift in {source_table}: {len(check.drift)} column change(s); "
+            "review the report, update Silver if needed and rerun with accept_drift = True"
+        )
+
+# COMMAND ----------
 
+final_cols = [clean for _, clean in check.mapping]
 df_clean = df.toDF(*final_cols)
 
 print("Original column count:", len(df.columns))
 print("Cleaned column count :", len(df_clean.columns))
 
-(
-    df_clean.write
-    .format("delta")
-    .mode("overwrite")
-    .option("overwriteSchema", "true")
-    .saveAsTable(target_table)
-)
+if check.status == "unchanged" and not check.source_changed and spark.catalog.tableExists(target_table):
+    print("Source schema and data unchanged since the last write; skipping", target_table)
+elif materialize == "view":
+    renamed = ", ".join(f"`{raw}` AS {clean}" for raw, clean in check.mapping)
+    if spark.catalog.tableExists(target_table) and spark.catalog.getTable(target_table).tableType != "VIEW":
+        spark.sql(f"DROP TABLE {target_table}")
+    spark.sql(f"CREATE OR REPLACE VIEW {target_table} AS SELECT {renamed} FROM {source_table}")
+    register(spark, source_table, check)
+else:
+    # Only a new or accepted schema may replace the Bronze schema; otherwise Delta
+    # rejects a write whose columns differ from the table's
+    writer = df_clean.write.format("delta").mode("overwrite")
+    if check.status != "unchanged":
+        writer = writer.option("overwriteSchema", "true")
+    with track(spark, "bronze_clean_names", target_table, query=df_clean):
+        writer.saveAsTable(target_table)
+    register(spark, source_table, check)
 
 display(df_clean.limit(5))
@@ -0,0 +1,36 @@
+# Databricks notebook source
+# 05_gold_quality_gate
+# Runs the declarative checks in pipeline/validation.py (one aggregate scan per
+# table), appends the results to the QA results table and fails the run if any
+# error-severity check (incl. FK coverage) did not pass. The Data Trust page reads the latest results view.
+
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(".."))  # repo root, so `pipeline` is importable
+
+from pipeline import fk_coverage, validation
+
+run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+# COMMAND ----------
+
+results = validation.run_validations(spark, run_id=run_id)
+spark.sql(validation.latest_view_sql())
+
+display(results.orderBy("passed", "table_name", "check_name"))
+
+# COMMAND ----------
+
+### FK coverage: one scan per fact against broadcast dimension key sets (pipeline/fk_coverage.py)
+coverage = fk_coverage.run_fk_checks(spark, run_id=run_id)
+spark.sql(validation.latest_view_sql())
+
+display(coverage)
+
+# COMMAND ----------
+
+### Gate: raises (and fails the job / pipeline runner node) on any failed error check
+validation.gate(spark, run_id)
+print("Quality gate passed:", run_id)
@@ -0,0 +1,29 @@
+# Databricks notebook source
+# 06_gold_export
+# Exports every Gold table as compressed Parquet plus a manifest (schema, row
+# counts, checksums, source Delta version) to a Unity Catalog volume, replacing
+# the hand-made CSV export. Run after the quality gate (05) has passed.
+# mode = "changes" exports only the rows changed since the last export (change
+# data feed), as upsert/delete partitions. See pipeline/export.py for the layout.
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(".."))  # repo root, so `pipeline` is importable
+
+from pipeline.export import EXPORT_VOLUME, export_changes, export_gold
+
+# ("parquet",)        : Parquet only
+# ("parquet", "csv")  : also one <table>.csv per table (same files as data/databricks_gold_export)
+formats = ("parquet",)
+
+# "full"    : a snapshot of every table at its current Delta version
+# "changes" : net upserts/deletes since each table's watermark (full snapshot on first run)
+mode = "full"
+
+spark.sql(f"CREATE VOLUME IF NOT EXISTS {EXPORT_VOLUME}")
+
+# COMMAND ----------
+
+summary = export_gold(spark, formats=formats) if mode == "full" else export_changes(spark, formats=formats)
+display(spark.createDataFrame(summary))
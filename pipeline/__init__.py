@@ -0,0 +1 @@
+"""Shared building blocks for the DataCo medallion pipeline notebooks."""
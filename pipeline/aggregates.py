@@ -0,0 +1,176 @@
+"""Gold aggregate tables for the dashboard pages, maintained incrementally.
+
+The Power BI pages aggregate ``fact_sales`` / ``fact_fulfilment`` at query
+time. ``AGGREGATES`` declares small daily tables at the grain the pages slice
+by, so a visual reads thousands of rows instead of the facts.
+
+Each aggregate is keyed by ``order_date_key`` plus its dimensions. A refresh
+reads the change data feed of its fact since the fact version it was last
+built from (kept in ``ops.build_state``, see :mod:`pipeline.build_state`),
+collects the order dates those changes touch (before and after images), and
+recomputes only those days from the fact, which the fact's clustering on
+``order_date_key`` keeps to the files of those days. The recomputed days are
+MERGEd in: changed groups updated, new groups inserted, groups that vanished
+from those days deleted. Recomputing days rather than adding deltas makes a
+retried refresh idempotent, and keeps non-additive measures (distinct orders)
+exact.
+
+The aggregate is rebuilt in full when it does not exist yet, when its SQL
+changed, when another input (a dimension) changed, when someone else wrote it,
+or when the feed does not cover the range (e.g. the fact was replaced).
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+
+from pipeline.build_state import last_build, record_builds, sql_hash, table_versions
+from pipeline.instrumentation import current_run_id, track
+
+logger = logging.getLogger(__name__)
+
+GOLD_SCHEMA = "workspace.gold"
+DAY_KEY = "order_date_key"
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    fact: str
+    grain: tuple
+    select: str  # SELECT ... FROM {gold}.<fact> f ... {where} GROUP BY ...
+    dims: tuple = ()
+
+    def sql(self, gold_schema=GOLD_SCHEMA, days=None) -> str:
+        """The aggregate over every day, or only over ``days`` (order_date_key values)."""
+        where = "" if days is None else f"WHERE f.{DAY_KEY} IN ({', '.join(str(int(d)) for d in days)})"
+        return self.select.format(gold=gold_schema, where=where)
+
+    def inputs(self, gold_schema=GOLD_SCHEMA) -> list:
+        return [f"{gold_schema}.{t}" for t in (self.fact, *self.dims)]
+
+
+AGGREGATES = {
+    # Executive Overview, Pricing & Discount, Discount Leakage
+    "agg_daily_sales_category_channel_discount": Aggregate(
+        fact="fact_sales",
+        grain=(DAY_KEY, "category_id", "channel_key", "discount_band_key"),
+        select="""
+SELECT
+  f.order_date_key, f.category_id, f.channel_key, f.discount_band_key,
+  COUNT(*)                   AS order_items,
+  COUNT(DISTINCT f.order_id) AS orders,
+  SUM(f.quantity)            AS quantity,
+  SUM(f.gross_sales)         AS gross_sales,
+  SUM(f.net_sales)           AS net_sales,
+  SUM(f.discount_amount)     AS discount_amount,
+  SUM(f.profit)              AS profit
+FROM {gold}.fact_sales f
+{where}
+GROUP BY f.order_date_key, f.category_id, f.channel_key, f.discount_band_key""",
+    ),
+    # Operations
+    "agg_daily_late_delivery_market_mode": Aggregate(
+        fact="fact_fulfilment",
+        grain=(DAY_KEY, "market", "shipping_mode"),
+        dims=("dim_channel",),
+        select="""
+SELECT
+  f.order_date_key, c.market, f.shipping_mode,
+  COUNT(*)                                                             AS order_items,
+  SUM(f.is_late_by_days)                                               AS late_items,
+  SUM(f.late_delivery_risk)                                            AS late_risk_items,
+  SUM(CASE WHEN f.delivery_status = 'Shipping canceled' THEN 1 ELSE 0 END) AS canceled_items,
+  SUM(f.days_for_shipping_real)                                        AS shipping_days,
+  SUM(f.shipping_days_variance)                                        AS shipping_days_variance,
+  CAST(SUM(f.is_late_by_days) AS DOUBLE) / COUNT(*)                    AS late_rate
+FROM {gold}.fact_fulfilment f
+LEFT JOIN {gold}.dim_channel c ON f.channel_key = c.channel_key
+{where}
+GROUP BY f.order_date_key, c.market, f.shipping_mode""",
+    ),
+}
+
+
+def _create_sql(target: str, select_sql: str) -> str:
+    return (f"CREATE OR REPLACE TABLE {target} USING delta CLUSTER BY ({DAY_KEY}) "
+            f"TBLPROPERTIES (delta.enableChangeDataFeed = true) AS {select_sql}")
+
+
+def merge_days_sql(target: str, agg: Aggregate, columns: list, days, gold_schema=GOLD_SCHEMA) -> str:
+    """Replace the groups of ``days`` in ``target`` with a recomputation of those days."""
+    on = " AND ".join(f"t.{k} <=> s.{k}" for k in agg.grain)  # grain columns can be NULL
+    changed = "\n     OR ".join(f"NOT (t.{c} <=> s.{c})" for c in columns if c not in agg.grain)
+    day_list = ", ".join(str(int(d)) for d in days)
+    return f"""
+MERGE INTO {target} t
+USING ({agg.sql(gold_schema, days)}) s
+ON {on}
+WHEN MATCHED AND ({changed}) THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *
+WHEN NOT MATCHED BY SOURCE AND t.{DAY_KEY} IN ({day_list}) THEN DELETE"""
+
+
+# Delta error classes of a table_changes range the feed does not cover: change data
+# not recorded for a version, commit or _change_data files cleaned up, or a bad range
+CHANGE_FEED_GAPS = (
+    "DELTA_MISSING_CHANGE_DATA",
+    "DELTA_CHANGE_DATA_FILE_NOT_FOUND",
+    "DELTA_FILE_NOT_FOUND_DETAILED",
+    "DELTA_VERSION_NOT_FOUND",
+    "DELTA_VERSIONS_NOT_CONTIGUOUS",
+    "DELTA_INVALID_CDC_RANGE",
+)
+
+
+def is_change_feed_gap(exc: Exception) -> bool:
+    """Whether ``exc`` (from reading ``table_changes``) means the feed does not cover the range."""
+    error_class = getattr(exc, "getErrorClass", lambda: None)()  # pyspark >= 3.4; else in the message
+    return any(c in f"{error_class} {exc}" for c in CHANGE_FEED_GAPS)
+
+
+def changed_days(spark, fact: str, start: int, end: int) -> list:
+    """Order dates touched by the commits ``start``..``end`` of ``fact``, old and new values."""
+    rows = spark.sql(
+        f"SELECT DISTINCT {DAY_KEY} FROM table_changes('{fact}', {start}, {end}) WHERE {DAY_KEY} IS NOT NULL"
+    ).collect()
+    return sorted(r[0] for r in rows)
+
+
+def refresh_aggregate(spark, name: str, gold_schema=GOLD_SCHEMA, force=False) -> dict:
+    """Bring one aggregate up to date with its inputs; returns ``{"table", "seconds", "status", "days"}``."""
+    start = time.perf_counter()
+    agg, target = AGGREGATES[name], f"{gold_schema}.{name}"
+    fact = f"{gold_schema}.{agg.fact}"
+    full_sql = agg.sql(gold_schema)
+    versions = table_versions(spark, agg.inputs(gold_schema))
+    last = None if force else last_build(spark, target)
+
+    days, sql_text, status = None, _create_sql(target, full_sql), "rebuilt"
+    if (last is not None and None not in versions.values() and last["sql_hash"] == sql_hash(full_sql)
+            and table_versions(spark, [target]).get(target) == last["output_version"]
+            and all(last["input_versions"].get(t) == v for t, v in versions.items() if t != fact)):
+        previous = last["input_versions"].get(fact)
+        if previous == versions[fact]:
+            return {"table": target, "seconds": 0.0, "status": "skipped", "days": 0}
+        try:
+            days = changed_days(spark, fact, previous + 1, versions[fact])
+        except Exception as exc:  # noqa: BLE001 - only a gap in the feed falls back to a rebuild
+            if not is_change_feed_gap(exc):
+                raise
+            logger.warning("No change feed for %s v%s-v%s, rebuilding %s: %s",
+                           fact, previous + 1, versions[fact], target, exc)
+        if days is not None:
+            columns = spark.table(target).columns
+            sql_text, status = merge_days_sql(target, agg, columns, days, gold_schema), "merged"
+
+    if days != []:
+        with track(spark, f"gold.{name}", target) as write:
+            write.sql(sql_text)
+    record_builds(spark, [(target, full_sql, versions)], current_run_id())
+    return {"table": target, "seconds": round(time.perf_counter() - start, 3), "status": status,
+            "days": len(days) if days is not None else None}
+
+
+def refresh_aggregates(spark, names=None, gold_schema=GOLD_SCHEMA, force=False) -> list[dict]:
+    """Refresh ``names`` (default: all of AGGREGATES) after the facts are built."""
+    return [refresh_aggregate(spark, name, gold_schema, force) for name in (names or AGGREGATES)]
@@ -0,0 +1,144 @@
+"""Per-stage benchmark of the pipeline over synthetic extracts.
+
+For every scale factor, a :mod:`pipeline.synthetic` extract is generated (and
+reused on later runs with the same scale and seed), the full pipeline runs on a
+fresh :class:`pipeline.local.LocalPipeline` database file, and each stage's wall
+time, rows written, rows/sec and bytes added to the database are appended to
+``HISTORY_CSV`` (one line per stage) and ``HISTORY_JSON`` (one line per run).
+Each stage is compared with the median of earlier runs at the same scale, and
+stages slower than ``REGRESSION_RATIO`` x that median are reported::
+
+    python -m pipeline.benchmark --scale 1 5 10
+
+Silver v1/v2/v3 run as one fused statement, so Silver reports as
+``silver_lookups`` + ``silver_fused``.
+"""
+
+import argparse
+import csv
+import json
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pipeline import synthetic
+from pipeline.local import LocalPipeline
+from pipeline.sqlfiles import REPO_ROOT
+
+WORK_DIR = REPO_ROOT / ".local" / "benchmark"
+# Untracked like the extracts; pass --history to keep the history somewhere shared
+HISTORY_CSV = WORK_DIR / "history.csv"
+HISTORY_JSON = WORK_DIR / "history.jsonl"
+
+REGRESSION_RATIO = 1.25
+# Stages shorter than this are too noisy to flag
+MIN_SECONDS = 0.5
+
+HISTORY_COLUMNS = [
+    "run_id", "git_commit", "engine", "host", "scale", "seed", "source_rows",
+    "stage", "seconds", "rows", "rows_per_sec", "bytes_written",
+]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def extract_dir(scale: float, seed: int, work_dir=WORK_DIR) -> Path:
+    """Synthetic extract for ``(scale, seed)``, generated on first use."""
+    out = Path(work_dir) / f"sf{scale:g}_seed{seed}"
+    if not (out / "_SUCCESS").exists():
+        synthetic.generate(scale, out, seed)
+        (out / "_SUCCESS").touch()
+    return out
+
+
+def run_scale(scale: float, seed=42, run_id=None, work_dir=WORK_DIR) -> list[dict]:
+    """Run the pipeline once over the ``scale`` x extract; one history row per stage."""
+    source = extract_dir(scale, seed, work_dir)
+    db_path = Path(work_dir) / f"sf{scale:g}.duckdb"
+    for stale in (db_path, db_path.with_suffix(".duckdb.wal")):
+        stale.unlink(missing_ok=True)
+
+    pipe = LocalPipeline(db_path, workdir=Path(work_dir) / "tmp")
+    pipe.measure = True
+    timings = pipe.run(source)
+    pipe.con.close()
+    db_path.unlink(missing_ok=True)
+
+    base = {
+        "run_id": run_id, "git_commit": _git_commit(), "engine": "duckdb", "host": platform.node(),
+        "scale": scale, "seed": seed, "source_rows": round(synthetic.BASE_ROWS * scale),
+    }
+    return [
+        {**base, **t, "rows_per_sec": round(t["rows"] / t["seconds"]) if t["rows"] and t["seconds"] else None}
+        for t in timings
+    ]
+
+
+def read_history(path=HISTORY_CSV) -> list[dict]:
+    if not Path(path).exists():
+        return []
+    with Path(path).open(newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def append_history(rows: list[dict], csv_path=HISTORY_CSV, json_path=HISTORY_JSON):
+    csv_path, json_path = Path(csv_path), Path(json_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not csv_path.exists()
+    with csv_path.open("a", newline="") as f:
+        writer = csv.DictWriter(f, HISTORY_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows({k: r.get(k) for k in HISTORY_COLUMNS} for r in rows)
+    with json_path.open("a") as f:
+        f.write(json.dumps({"run_id": rows[0]["run_id"], "scale": rows[0]["scale"], "stages": rows}) + "\n")
+
+
+def regressions(rows: list[dict], history: list[dict]) -> list[dict]:
+    """Stages of ``rows`` slower than REGRESSION_RATIO x the median of earlier runs at that scale."""
+    flagged = []
+    for row in rows:
+        earlier = [float(h["seconds"]) for h in history
+                   if float(h["scale"]) == row["scale"] and h["stage"] == row["stage"]]
+        if not earlier:
+            continue
+        baseline = statistics.median(earlier)
+        if row["seconds"] >= MIN_SECONDS and row["seconds"] > REGRESSION_RATIO * baseline:
+            flagged.append({"scale": row["scale"], "stage": row["stage"], "seconds": row["seconds"],
+                            "baseline_seconds": baseline})
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage over synthetic data.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1.0], help="scale factors (1 = 180,519 rows)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=str(WORK_DIR), help="synthetic extracts + scratch databases")
+    parser.add_argument("--history", default=str(HISTORY_CSV), help="CSV history (JSON lines written alongside)")
+    args = parser.parse_args(argv)
+
+    history_csv = Path(args.history)
+    history = read_history(history_csv)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    flagged = []
+    for scale in args.scale:
+        rows = run_scale(scale, args.seed, run_id, args.work_dir)
+        for r in rows:
+            rate = f"{r['rows_per_sec']:>12,}/s" if r["rows_per_sec"] else " " * 14
+            print(f"sf{scale:<6g} {r['stage']:<28} {r['seconds']:>8.3f}s {rate} {r['bytes_written']:>14,} B")
+        flagged += regressions(rows, history)
+        append_history(rows, history_csv, history_csv.with_suffix(".jsonl"))
+    for f in flagged:
+        print(f"REGRESSION sf{f['scale']:g} {f['stage']}: {f['seconds']:.3f}s vs median {f['baseline_seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
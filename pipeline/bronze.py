@@ -0,0 +1,33 @@
+"""Bronze helpers shared by the notebooks and the local backend."""
+
+import re
+
+
+def clean_name(col: str) -> str:
+    col = col.strip().lower()
+    col = re.sub(r'[\s\-\/]+', '_', col)      # spaces, hyphens, slashes -> _
+    col = re.sub(r'[()]+', '', col)           # remove parentheses
+    col = re.sub(r'[^0-9a-zA-Z_]', '', col)   # remove other special chars
+    col = re.sub(r'__+', '_', col)            # collapse multiple underscores
+    return col
+
+
+def clean_names(columns: list[str]) -> list[str]:
+    """clean_name for every column, suffixed _1, _2, ... where two clean to the same name."""
+    seen = {}
+    final_cols = []
+    for c in (clean_name(c) for c in columns):
+        if c in seen:
+            seen[c] += 1
+            final_cols.append(f"{c}_{seen[c]}")
+        else:
+            seen[c] = 0
+            final_cols.append(c)
+    return final_cols
+
+
+def row_hash_sql(columns: list[str]) -> str:
+    """SQL expression hashing a row's ``columns``; NULLs and column positions are kept apart
+    (``to_json`` of a struct), so two rows hash equal only when every value is equal."""
+    fields = ", ".join(f"`{c}`" for c in columns)
+    return f"sha2(to_json(struct({fields})), 256)"
@@ -0,0 +1,173 @@
+"""Streaming ingest of DataCo CSV drops into the audited Bronze table.
+
+The batch path (notebooks 02 then 01) starts from a pre-loaded table and
+reaches Bronze on the next scheduled run. Here a structured stream watches a
+landing directory instead: each new CSV file is read once, its columns renamed
+with :func:`pipeline.bronze.clean_names` (notebook 02), stamped with
+``_ingest_ts`` / ``_batch_id`` (notebook 01) and appended to
+``bronze.dataco_supplychain_raw_audited``, where notebook 03's incremental
+mode picks it up like any other batch.
+
+Exactly once: the stream's checkpoint records which files each micro-batch
+read, so a restarted query neither skips nor re-reads a file. Each micro-batch
+is appended with Delta's idempotent-write options (``txnAppId`` /
+``txnVersion`` = the micro-batch id), so a micro-batch replayed after a
+failure between the append and the checkpoint commit is not written twice.
+
+The source is Auto Loader (``cloudFiles``) on Databricks or Spark's plain file
+source anywhere else, including local mode::
+
+    python -m pipeline.bronze_stream landing/ --target .local/bronze_audited \\
+        --checkpoint .local/checkpoints/bronze --once
+
+Both read with a fixed schema: the raw header of the landing files, typed as
+the existing target's columns (inferred from the files present when the target
+does not exist yet). A drop whose cleaned columns differ from the target's
+stops the stream before anything is written.
+"""
+
+import argparse
+import logging
+import re
+from datetime import datetime, timezone
+
+from pipeline.bronze import clean_names
+from pipeline.instrumentation import track
+
+logger = logging.getLogger(__name__)
+
+LANDING_DIR = "/Volumes/workspace/bronze/landing/dataco"
+CHECKPOINT_DIR = "/Volumes/workspace/bronze/checkpoints/dataco_stream"
+TARGET_TABLE = "bronze.dataco_supplychain_raw_audited"
+AUDIT_COLUMNS = ("_ingest_ts", "_batch_id")
+APP_ID = "bronze_stream"  # Delta txnAppId: stable across restarts of the same query
+DEFAULT_TRIGGER = "1 minute"
+
+
+def _is_path(target: str) -> bool:
+    return not re.fullmatch(r"\w+(\.\w+){1,2}", target)
+
+
+def _target_exists(spark, target: str) -> bool:
+    if not _is_path(target):
+        return spark.catalog.tableExists(target)
+    from delta.tables import DeltaTable
+    return DeltaTable.isDeltaTable(spark, target)
+
+
+def _read_target(spark, target: str):
+    return spark.read.format("delta").load(target) if _is_path(target) else spark.table(target)
+
+
+def stream_schema(spark, landing_dir: str, target=TARGET_TABLE):
+    """Schema to read the drops with: raw header names, typed as ``target``'s columns.
+
+    Raises ``ValueError`` when the cleaned header does not match the target.
+    """
+    from pyspark.sql.types import StructField, StructType
+
+    raw_columns = spark.read.option("header", True).csv(landing_dir).columns  # first line only
+    columns = clean_names(raw_columns)
+    if not _target_exists(spark, target):
+        return spark.read.option("header", True).option("inferSchema", True).csv(landing_dir).schema
+
+    existing = [f for f in _read_target(spark, target).schema if f.name not in AUDIT_COLUMNS]
+    if [f.name for f in existing] != columns:
+        added = [c for c in columns if c not in {f.name for f in existing}]
+        missing = [f.name for f in existing if f.name not in columns]
+        raise ValueError(f"Landing files do not match {target}: added {added}, missing {missing}"
+                         + ("" if added or missing else ", column order differs"))
+    return StructType([StructField(raw, f.dataType, True) for raw, f in zip(raw_columns, existing)])
+
+
+def read_drops(spark, landing_dir: str, schema, auto_loader=False, max_files_per_trigger=None):
+    """Streaming DataFrame of the CSV files landing in ``landing_dir``, with cleaned column names."""
+    if auto_loader:
+        reader = spark.readStream.format("cloudFiles").option("cloudFiles.format", "csv")
+        if max_files_per_trigger:
+            reader = reader.option("cloudFiles.maxFilesPerTrigger", max_files_per_trigger)
+    else:
+        reader = spark.readStream.format("csv")
+        if max_files_per_trigger:
+            reader = reader.option("maxFilesPerTrigger", max_files_per_trigger)
+    df = reader.option("header", True).schema(schema).load(landing_dir)
+    return df.toDF(*clean_names(df.columns))
+
+
+def append_batch(target: str, app_id=APP_ID):
+    """``foreachBatch`` function: audit columns + idempotent Delta append of one micro-batch."""
+    from pyspark.sql.functions import current_timestamp, lit
+
+    def write(batch_df, epoch_id: int):
+        batch_id = f"{datetime.now(timezone.utc):%Y%m%d_%H%M%S}_s{epoch_id}"
+        writer = (
+            batch_df.withColumn("_ingest_ts", current_timestamp())
+            .withColumn("_batch_id", lit(batch_id))
+            .write.format("delta")
+            .mode("append")
+            .option("txnAppId", app_id)
+            .option("txnVersion", epoch_id)
+        )
+        if _is_path(target):
+            writer.save(target)
+        else:
+            with track(batch_df.sparkSession, "bronze_stream", target):
+                writer.saveAsTable(target)
+
+    return write
+
+
+def start_stream(spark, landing_dir=LANDING_DIR, target=TARGET_TABLE, checkpoint_dir=CHECKPOINT_DIR,
+                 auto_loader=False, once=False, trigger=DEFAULT_TRIGGER, max_files_per_trigger=None):
+    """Start the ingest query; ``once`` processes the files present and stops (``availableNow``).
+
+    ``target`` is a table name or a Delta path (local mode, no metastore).
+    Returns the ``StreamingQuery``.
+    """
+    schema = stream_schema(spark, landing_dir, target)
+    drops = read_drops(spark, landing_dir, schema, auto_loader, max_files_per_trigger)
+    writer = (
+        drops.writeStream.queryName(APP_ID)
+        .option("checkpointLocation", checkpoint_dir)
+        .foreachBatch(append_batch(target))
+    )
+    writer = writer.trigger(availableNow=True) if once else writer.trigger(processingTime=trigger)
+    return writer.start()
+
+
+def local_spark():
+    """Local-mode session with Delta (``pip install delta-spark``)."""
+    from delta import configure_spark_with_delta_pip
+    from pyspark.sql import SparkSession
+
+    builder = (
+        SparkSession.builder.master("local[*]").appName(APP_ID)
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension")
+        .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog")
+    )
+    return configure_spark_with_delta_pip(builder).getOrCreate()
+
+
+def main(argv=None) -> list:
+    """Run the stream from the command line; returns the progress of its micro-batches."""
+    parser = argparse.ArgumentParser(description="Stream DataCo CSV drops into the audited Bronze table.")
+    parser.add_argument("landing_dir", help="directory the CSV files land in")
+    parser.add_argument("--target", required=True, help="Delta path (or table name) to append to")
+    parser.add_argument("--checkpoint", required=True, help="checkpoint directory of the query")
+    parser.add_argument("--once", action="store_true", help="process the files present, then stop")
+    parser.add_argument("--trigger", default=DEFAULT_TRIGGER, help="micro-batch interval when not --once")
+    parser.add_argument("--max-files-per-trigger", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    spark = local_spark()
+    query = start_stream(spark, args.landing_dir, args.target, args.checkpoint, once=args.once,
+                         trigger=args.trigger, max_files_per_trigger=args.max_files_per_trigger)
+    query.awaitTermination()
+    for progress in query.recentProgress:
+        logger.info("batch %s: %s rows", progress["batchId"], progress["numInputRows"])
+    return query.recentProgress
+
+
+if __name__ == "__main__":
+    main()
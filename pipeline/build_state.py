@@ -0,0 +1,134 @@
+"""Skip rebuilding a table whose SQL and inputs are unchanged since its last build.
+
+For every table built through :func:`pipeline.gold.build_gold`,
+:mod:`pipeline.aggregates` or a SQL statement of the runner, ``BUILD_STATE_TABLE`` keeps the hash of the SQL that
+built it, the Delta versions of the tables it read at the time, and the version
+the build produced. A later build of the same table is skipped when all three
+still match: same SQL, no new commits on any input, and nobody has written the
+table since. Inputs that are views are resolved to the tables they read, so a
+view over Silver is versioned by the Silver table. A missing table or an input
+whose version cannot be read always rebuilds; ``force`` rebuilds regardless.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+
+from pipeline.sqlfiles import quote_literal
+from pipeline.text_fixes import delta_version
+
+BUILD_STATE_TABLE = "workspace.ops.build_state"
+
+_lock = threading.Lock()  # one MERGE at a time: concurrent MERGEs into one Delta table conflict
+
+
+def sql_hash(sql_text: str) -> str:
+    return hashlib.sha1(" ".join(sql_text.split()).encode("utf-8")).hexdigest()
+
+
+def _view_reads(spark, table: str):
+    """Tables read by ``table`` if it is a view, else None."""
+    from pipeline.runner import sql_io  # runner imports this module
+
+    try:
+        rows = spark.sql(f"DESCRIBE TABLE EXTENDED {table}").collect()
+    except Exception:  # noqa: BLE001 - table does not exist
+        return None
+    text = next((r["data_type"] for r in rows if r["col_name"] == "View Text"), None)
+    return None if text is None else sql_io(text)[0]
+
+
+def table_versions(spark, tables) -> dict:
+    """``{table: Delta version}`` for ``tables``, with views replaced by the tables they read.
+
+    Missing tables map to None.
+    """
+    versions, pending, seen = {}, list(tables), set()
+    while pending:
+        table = pending.pop()
+        if table in seen:
+            continue
+        seen.add(table)
+        try:
+            versions[table] = delta_version(spark, table)
+            continue
+        except Exception:  # noqa: BLE001 - a view, or not there
+            pass
+        reads = _view_reads(spark, table)
+        if reads is None:
+            versions[table] = None
+        else:
+            pending.extend(reads)
+    return versions
+
+
+def _ensure_table(spark, state_table: str):
+    spark.sql(f"CREATE SCHEMA IF NOT EXISTS {state_table.rsplit('.', 1)[0]}")
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {state_table} (
+      target_table   STRING,
+      sql_hash       STRING,
+      input_versions STRING,
+      output_version BIGINT,
+      run_id         STRING,
+      built_at       TIMESTAMP
+    ) USING delta
+    """)
+
+
+def last_build(spark, target: str, state_table=BUILD_STATE_TABLE):
+    """The recorded build of ``target`` (``sql_hash``, ``input_versions`` dict,
+    ``output_version``), or None."""
+    _ensure_table(spark, state_table)
+    row = (
+        spark.table(state_table)
+        .where(f"target_table = {quote_literal(target)}")
+        .select("sql_hash", "input_versions", "output_version")
+        .first()
+    )
+    if row is None:
+        return None
+    return {"sql_hash": row["sql_hash"], "input_versions": json.loads(row["input_versions"]),
+            "output_version": row["output_version"]}
+
+
+def is_current(spark, target: str, sql_text: str, inputs, state_table=BUILD_STATE_TABLE):
+    """``(current, input_versions)``: whether ``target`` can be skipped, and the
+    input versions to record if it is rebuilt now."""
+    versions = table_versions(spark, inputs)
+    last = last_build(spark, target, state_table)
+    current = (
+        last is not None
+        and None not in versions.values()
+        and last["sql_hash"] == sql_hash(sql_text)
+        and last["input_versions"] == versions
+        and table_versions(spark, [target]).get(target) == last["output_version"]
+    )
+    return current, versions
+
+
+def record_builds(spark, builds: list, run_id=None, state_table=BUILD_STATE_TABLE):
+    """Upsert ``(target, sql_text, input_versions)`` tuples after successful builds."""
+    if not builds:
+        return
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    rows = [
+        (target, sql_hash(sql_text), json.dumps(versions, sort_keys=True),
+         table_versions(spark, [target]).get(target), run_id)
+        for target, sql_text, versions in builds
+    ]
+    with _lock:
+        _ensure_table(spark, state_table)
+        (
+            spark.createDataFrame(rows, "target_table STRING, sql_hash STRING, input_versions STRING, "
+                                        "output_version BIGINT, run_id STRING")
+            .createOrReplaceTempView("build_state_updates")
+        )
+        spark.sql(f"""
+        MERGE INTO {state_table} t
+        USING (SELECT *, current_timestamp() AS built_at FROM build_state_updates) s
+        ON t.target_table = s.target_table
+        WHEN MATCHED THEN UPDATE SET *
+        WHEN NOT MATCHED THEN INSERT *
+        """)
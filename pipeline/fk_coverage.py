@@ -0,0 +1,103 @@
+"""Foreign-key coverage of the Gold facts in one scan per fact.
+
+The coverage queries in ``sql/gold/02_gold_validation.sql`` LEFT JOIN each fact
+to the full dimension tables. Here each dimension's key set is read once into a
+small cached table of distinct keys, and every FK column of a fact is probed
+against those sets in a single query: the key sets are broadcast, so the fact
+is scanned once and each probe is a hash lookup. Missing-key counts (NULL FKs
+count as missing, as in the SQL checks) and a sample of orphan keys are
+returned, and the counts are logged to the QA results table next to the other
+checks.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from pipeline.validation import GOLD_SCHEMA, QA_RESULTS_TABLE, record_results
+
+# fact -> [(fk column, dimension, dimension key)]
+_SALES_FKS = [
+    ("order_date_key", "dim_date", "date_key"),
+    ("customer_id", "dim_customer", "customer_id"),
+    ("product_card_id", "dim_product", "product_card_id"),
+    ("category_id", "dim_category", "category_id"),
+    ("department_id", "dim_department", "department_id"),
+    ("geo_key", "dim_geo", "geo_key"),
+    ("channel_key", "dim_channel", "channel_key"),
+]
+FOREIGN_KEYS = {
+    f"{GOLD_SCHEMA}.fact_sales": _SALES_FKS + [
+        ("discount_band_key", "dim_discount_band", "discount_band_key"),
+    ],
+    f"{GOLD_SCHEMA}.fact_fulfilment": _SALES_FKS + [
+        ("ship_date_key", "dim_date", "date_key"),
+    ],
+}
+
+SAMPLE_SIZE = 10
+
+RESULT_SCHEMA = (
+    "fact_table STRING, fk_column STRING, dim_table STRING, dim_key STRING, "
+    "fact_rows BIGINT, missing_rows BIGINT, orphan_sample ARRAY<STRING>"
+)
+
+
+def key_set_view(dim: str, key: str) -> str:
+    return "fk_keys_" + re.sub(r"\W", "_", f"{dim}_{key}")
+
+
+def _dim_table(dim: str, gold_schema: str) -> str:
+    return dim if "." in dim else f"{gold_schema}.{dim}"
+
+
+def coverage_sql(fact: str, fks: list, sample_size=SAMPLE_SIZE, gold_schema=GOLD_SCHEMA) -> str:
+    """One query over ``fact``: missing count + orphan sample for every FK column."""
+    aliases = [f"k{i}" for i in range(len(fks))]
+    selects, joins = ["COUNT(*) AS fact_rows"], []
+    for alias, (col, dim, key) in zip(aliases, fks):
+        view = key_set_view(_dim_table(dim, gold_schema), key)
+        selects.append(f"SUM(CASE WHEN {alias}.key IS NULL THEN 1 ELSE 0 END) AS {alias}_missing")
+        selects.append(
+            f"slice(collect_set(CASE WHEN {alias}.key IS NULL THEN coalesce(CAST(f.{col} AS STRING), 'NULL') END), "
+            f"1, {sample_size}) AS {alias}_orphans"
+        )
+        joins.append(f"LEFT JOIN {view} {alias} ON f.{col} = {alias}.key")
+    return (
+        f"SELECT /*+ BROADCAST({', '.join(aliases)}) */\n  " + ",\n  ".join(selects)
+        + f"\nFROM {fact} f\n" + "\n".join(joins)
+    )
+
+
+def run_fk_checks(spark, foreign_keys=None, run_id=None, sample_size=SAMPLE_SIZE,
+                  gold_schema=GOLD_SCHEMA, results_table=QA_RESULTS_TABLE):
+    """Check every FK of ``foreign_keys`` (default: FOREIGN_KEYS), one scan per fact.
+
+    Returns one row per (fact, FK column); the missing counts are also appended
+    to ``results_table`` as ``fk_coverage`` checks with a threshold of 0.
+    """
+    foreign_keys = FOREIGN_KEYS if foreign_keys is None else foreign_keys
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+    key_sets = {(_dim_table(dim, gold_schema), key) for fks in foreign_keys.values() for _, dim, key in fks}
+    for dim, key in sorted(key_sets):
+        spark.sql(f"""
+        CACHE TABLE {key_set_view(dim, key)} AS
+        SELECT DISTINCT {key} AS key FROM {dim} WHERE {key} IS NOT NULL
+        """)
+
+    coverage, qa_rows = [], []
+    try:
+        for fact, fks in foreign_keys.items():
+            row = spark.sql(coverage_sql(fact, fks, sample_size, gold_schema)).first()
+            for i, (col, dim, key) in enumerate(fks):
+                missing = row[f"k{i}_missing"] or 0
+                coverage.append((fact, col, _dim_table(dim, gold_schema), key, row["fact_rows"], missing,
+                                 row[f"k{i}_orphans"]))
+                qa_rows.append((run_id, fact, f"fk:{col}", "fk_coverage", col, float(missing), 0.0,
+                                "error", missing == 0, row["fact_rows"]))
+    finally:
+        for dim, key in key_sets:
+            spark.sql(f"UNCACHE TABLE IF EXISTS {key_set_view(dim, key)}")
+
+    record_results(spark, qa_rows, results_table)
+    return spark.createDataFrame(coverage, RESULT_SCHEMA)
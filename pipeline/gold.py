@@ -0,0 +1,355 @@
+"""Gold star schema build from a single read of Silver.
+
+``sql/gold/01_gold_build.sql`` issues one ``CREATE OR REPLACE TABLE ... AS
+SELECT`` per output, and every one of them re-scans the Silver view. The
+builder below reads the Silver columns the star schema needs once into a cached
+temp view, derives every dimension and fact from that view and writes the
+outputs concurrently, so a refresh costs one Silver scan plus the writes.
+Category/department names are not carried in Silver; both name dims share one
+pruned, cached read of Bronze. Each write is recorded in ``ops.pipeline_runs``
+(see :mod:`pipeline.instrumentation`). Facts are clustered and compacted per
+:data:`pipeline.layout.FACT_LAYOUTS`.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.build_state import is_current, record_builds
+from pipeline.instrumentation import current_run_id, track
+from pipeline.layout import FACT_LAYOUTS, matches
+
+SILVER_TABLE = "workspace.silver.dataco_supplychain_clean_current"
+BRONZE_TABLE = "workspace.bronze.dataco_supplychain_raw_audited"
+GOLD_SCHEMA = "workspace.gold"
+
+# Temp views holding the cached, column-pruned reads
+SILVER_VIEW = "gold_silver_src"
+BRONZE_VIEW = "gold_bronze_names"
+
+# Every Silver column read by a Gold table below (nothing else is scanned or cached)
+SILVER_COLUMNS = [
+    "order_item_id", "order_id", "customer_id", "product_card_id", "category_id", "department_id",
+    "order_date", "ship_date",
+    "gross_sales", "net_sales", "discount_amount", "discount_rate", "profit", "quantity", "unit_price",
+    "days_for_shipping_real", "days_for_shipment_scheduled", "late_delivery_risk", "is_late_by_days",
+    "delivery_status", "shipping_mode", "order_status",
+    "market", "order_region", "order_country", "order_state", "order_city", "order_zipcode",
+    "customer_segment", "customer_country", "customer_state", "customer_city", "customer_zipcode",
+    "latitude", "longitude",
+    "product_name", "product_category_id", "catalog_price", "product_description", "product_status",
+    "customer_country_key", "customer_state_key", "customer_city_key", "customer_zipcode_key",
+    "market_key", "order_region_key", "shipping_mode_key",
+    "geo_key", "channel_key", "discount_band_key",
+    "_ingest_ts", "_batch_id",
+]
+BRONZE_COLUMNS = ["category_id", "category_name", "department_id", "department_name"]
+
+# Type 2 dimensions: business key -> tracked attributes. A member gets a new
+# version when the hash of its attributes changes (see scd2_merge_sql)
+SCD2_DIMS = {
+    "dim_customer": ("customer_id", (
+        "customer_segment", "customer_country", "customer_state", "customer_city", "customer_zipcode",
+        "latitude", "longitude",
+        "customer_country_key", "customer_state_key", "customer_city_key", "customer_zipcode_key",
+    )),
+    "dim_product": ("product_card_id", (
+        "product_name", "product_category_id", "category_id", "department_id",
+        "catalog_price", "product_description", "product_status",
+    )),
+}
+
+
+def attr_hash_sql(name: str, alias="") -> str:
+    """``xxhash64`` of the tracked attributes of ``name`` (columns of ``alias``).
+
+    ``xxhash64`` skips NULL arguments, so ``('a', NULL)`` and ``(NULL, 'a')``
+    would hash alike; each attribute is hashed as a string with NULL as U+0000,
+    keeping both its position and its NULL-ness in the hash.
+    """
+    prefix = f"{alias}." if alias else ""
+    return "xxhash64(" + ", ".join(
+        f"coalesce(CAST({prefix}{a} AS STRING), '\\u0000')" for a in SCD2_DIMS[name][1]
+    ) + ")"
+
+
+def scd2_source_sql(name: str, since=None) -> str:
+    """Latest attributes + hash per member of ``name``, from Silver rows ingested after ``since`` (SQL)."""
+    key, attrs = SCD2_DIMS[name]
+    where = f"{key} IS NOT NULL" + (f" AND _ingest_ts > ({since})" if since else "")
+    return f"""
+SELECT
+  {key}, {', '.join(attrs)},
+  {attr_hash_sql(name)} AS attr_hash,
+  _ingest_ts AS valid_from
+FROM {SILVER_VIEW}
+WHERE {where}
+QUALIFY ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY _ingest_ts DESC, order_date DESC, order_item_id DESC) = 1"""
+
+
+def _scd2_initial_sql(name: str) -> str:
+    return f"""
+SELECT *, CAST(NULL AS TIMESTAMP) AS valid_to, true AS is_current
+FROM ({scd2_source_sql(name)})"""
+
+
+_ORDER_DATE_KEY = "CAST(date_format(order_date, 'yyyyMMdd') AS INT) AS order_date_key"
+_SHIP_DATE_KEY = "CAST(date_format(ship_date,  'yyyyMMdd') AS INT) AS ship_date_key"
+
+# Gold table -> SELECT over SILVER_VIEW / BRONZE_VIEW (same output as 01_gold_build.sql)
+GOLD_TABLES = {
+    "dim_date": f"""
+WITH bounds AS (
+  SELECT
+    LEAST(MIN(order_date), MIN(ship_date))  AS min_date,
+    GREATEST(MAX(order_date), MAX(ship_date)) AS max_date
+  FROM {SILVER_VIEW}
+),
+dates AS (
+  SELECT explode(sequence(min_date, max_date, interval 1 day)) AS date_day
+  FROM bounds
+)
+SELECT
+  CAST(date_format(date_day, 'yyyyMMdd') AS INT) AS date_key,
+  date_day                                     AS date,
+  year(date_day)                               AS year,
+  quarter(date_day)                            AS quarter,
+  month(date_day)                              AS month,
+  date_format(date_day, 'yyyy-MM')             AS year_month,
+  weekofyear(date_day)                         AS week_of_year,
+  date_format(date_day, 'EEEE')                AS day_name,
+  dayofweek(date_day)                          AS day_of_week
+FROM dates""",
+    # Type 2 (SCD2_DIMS): created with one current version per member, then
+    # maintained by scd2_merge_sql
+    "dim_customer": _scd2_initial_sql("dim_customer"),
+    "dim_product": _scd2_initial_sql("dim_product"),
+    "dim_category": f"""
+SELECT DISTINCT category_id, category_name
+FROM {BRONZE_VIEW}
+WHERE category_id IS NOT NULL""",
+    "dim_department": f"""
+SELECT DISTINCT department_id, department_name
+FROM {BRONZE_VIEW}
+WHERE department_id IS NOT NULL""",
+    "dim_geo": f"""
+SELECT DISTINCT
+  geo_key,
+  order_country AS country,
+  order_state   AS state,
+  order_city    AS city
+FROM {SILVER_VIEW}""",
+    "dim_channel": f"""
+SELECT DISTINCT
+  channel_key, market, order_region, shipping_mode,
+  market_key, order_region_key, shipping_mode_key
+FROM {SILVER_VIEW}""",
+    "dim_discount_band": """
+SELECT * FROM VALUES
+  (1, '0% (No Discount)',      CAST(0.00 AS DOUBLE), CAST(0.00 AS DOUBLE)),
+  (2, '>0% to 5%',             CAST(0.00 AS DOUBLE), CAST(0.05 AS DOUBLE)),
+  (3, '>5% to 10%',            CAST(0.05 AS DOUBLE), CAST(0.10 AS DOUBLE)),
+  (4, '>10% to 15%',           CAST(0.10 AS DOUBLE), CAST(0.15 AS DOUBLE)),
+  (5, '>15% to 20%',           CAST(0.15 AS DOUBLE), CAST(0.20 AS DOUBLE)),
+  (6, '>20% to 25%',           CAST(0.20 AS DOUBLE), CAST(0.25 AS DOUBLE))
+AS t(discount_band_key, discount_band_label, rate_min, rate_max)""",
+    "fact_sales": f"""
+SELECT
+  order_item_id, order_id,
+  customer_id, product_card_id, category_id, department_id,
+  {_ORDER_DATE_KEY},
+  geo_key, channel_key, discount_band_key,
+  gross_sales, net_sales, discount_amount, discount_rate, profit, quantity, unit_price,
+  order_status,
+  _ingest_ts, _batch_id
+FROM {SILVER_VIEW}""",
+    "fact_fulfilment": f"""
+SELECT
+  order_item_id, order_id,
+  customer_id, product_card_id, category_id, department_id,
+  {_ORDER_DATE_KEY},
+  {_SHIP_DATE_KEY},
+  geo_key, channel_key,
+  days_for_shipping_real,
+  days_for_shipment_scheduled,
+  (days_for_shipping_real - days_for_shipment_scheduled) AS shipping_days_variance,
+  late_delivery_risk,
+  is_late_by_days,
+  delivery_status, shipping_mode, order_status,
+  order_zipcode,
+  _ingest_ts, _batch_id
+FROM {SILVER_VIEW}""",
+    # Wide convenience fact (sales + fulfilment attributes), see docs/runboooks/snowflake_load.md
+    "fact_order_item": f"""
+SELECT
+  order_item_id, order_id,
+  customer_id, product_card_id, category_id, department_id,
+  {_ORDER_DATE_KEY},
+  {_SHIP_DATE_KEY},
+  geo_key, channel_key, discount_band_key,
+  gross_sales, net_sales, discount_amount, discount_rate, profit, quantity, unit_price,
+  days_for_shipping_real, days_for_shipment_scheduled, late_delivery_risk, is_late_by_days,
+  delivery_status, shipping_mode, order_status,
+  market, order_region, order_country, order_state, order_city, order_zipcode,
+  _ingest_ts, _batch_id
+FROM {SILVER_VIEW}""",
+}
+
+
+# Grain of each Gold table. Rebuilds of an existing table MERGE on it (changed rows
+# only), so the change data feed carries just the rows that actually changed.
+# Type 2 dims keep one row per member version and are maintained by scd2_merge_sql
+GOLD_KEYS = {
+    "dim_date": ("date_key",),
+    "dim_customer": ("customer_id", "valid_from"),
+    "dim_product": ("product_card_id", "valid_from"),
+    "dim_category": ("category_id",),
+    "dim_department": ("department_id",),
+    "dim_geo": ("geo_key",),
+    "dim_channel": ("channel_key",),
+    "dim_discount_band": ("discount_band_key",),
+    "fact_sales": ("order_item_id",),
+    "fact_fulfilment": ("order_item_id",),
+    "fact_order_item": ("order_item_id",),
+}
+
+CDF_PROPERTY = "delta.enableChangeDataFeed"
+
+
+def merge_sql(target: str, select_sql: str, key: tuple, columns: list) -> str:
+    """Sync ``target`` to ``select_sql`` on the ``key`` columns: update changed rows,
+    insert new keys, delete vanished ones."""
+    on = " AND ".join(f"t.{k} = s.{k}" for k in key)
+    changed = "\n     OR ".join(f"NOT (t.{c} <=> s.{c})" for c in columns if c not in key)
+    return f"""
+MERGE INTO {target} t
+USING ({select_sql}) s
+ON {on}
+WHEN MATCHED AND ({changed}) THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *
+WHEN NOT MATCHED BY SOURCE THEN DELETE"""
+
+
+def scd2_merge_sql(target: str, name: str, incremental=True) -> str:
+    """Type 2 maintenance of ``target``: expire the current version of members
+    whose attribute hash changed and insert their new version; insert new members.
+
+    ``incremental`` only reads Silver rows ingested after the newest version in
+    ``target``, so the cost follows the change volume. Each changed member comes
+    from the source twice: once matching its current version (to expire it) and
+    once with a NULL merge key (matching nothing, to insert the new version).
+    The current version's hash is recomputed from its attributes rather than
+    read from ``attr_hash``, so a change to the hash itself opens no versions.
+    """
+    key, attrs = SCD2_DIMS[name]
+    since = f"SELECT COALESCE(MAX(valid_from), TIMESTAMP '1900-01-01') FROM {target}" if incremental else None
+    columns = [key, *attrs, "attr_hash", "valid_from"]
+    current_hash = attr_hash_sql(name, "d")
+    return f"""
+MERGE INTO {target} t
+USING (
+  WITH latest AS ({scd2_source_sql(name, since)}
+  )
+  SELECT l.{key} AS _merge_key, l.* FROM latest l
+  UNION ALL
+  SELECT NULL AS _merge_key, l.* FROM latest l
+  JOIN {target} d ON d.{key} = l.{key} AND d.is_current AND {current_hash} <> l.attr_hash
+) s
+ON t.{key} = s._merge_key AND t.is_current
+WHEN MATCHED AND {attr_hash_sql(name, "t")} <> s.attr_hash THEN UPDATE SET is_current = false, valid_to = s.valid_from
+WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}, valid_to, is_current)
+  VALUES ({', '.join(f's.{c}' for c in columns)}, NULL, true)"""
+
+
+def _cdf_enabled(spark, table: str) -> bool:
+    row = spark.sql(f"SHOW TBLPROPERTIES {table} ('{CDF_PROPERTY}')").first()
+    return row is not None and str(row["value"]).lower() == "true"
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def build_gold(spark, tables=None, silver_table=SILVER_TABLE, bronze_table=BRONZE_TABLE,
+               gold_schema=GOLD_SCHEMA, max_workers=4, force=False, layouts=None) -> list[dict]:
+    """Write ``tables`` (default: all of GOLD_TABLES) from one cached read of Silver.
+
+    Tables are created with the change data feed enabled; an existing table
+    with unchanged columns is synced with :func:`merge_sql` instead of being
+    replaced, so only changed rows are written. Type 2 dims (SCD2_DIMS) are
+    never replaced once they exist: :func:`scd2_merge_sql` versions them from
+    the Silver rows ingested since their newest version (all of Silver with
+    ``force``). A table whose SQL and inputs
+    are unchanged since its last build is skipped unless ``force`` (see
+    :mod:`pipeline.build_state`); when every table is current, Silver is not
+    read at all. Tables with a layout in ``layouts`` (default: FACT_LAYOUTS)
+    are created clustered/partitioned and compacted with ``OPTIMIZE`` after
+    each write; a table whose layout changed is replaced rather than merged.
+    Returns one ``{"table", "seconds", "status"}`` entry per output, preceded
+    by the time spent reading and caching the sources.
+    """
+    tables = list(tables or GOLD_TABLES)
+    layouts = FACT_LAYOUTS if layouts is None else layouts
+    sources = {SILVER_VIEW: silver_table, BRONZE_VIEW: bronze_table}
+
+    def statement(name: str) -> str:
+        layout = layouts.get(name)
+        props = {CDF_PROPERTY: "true", **(layout.properties() if layout else {})}
+        clause = f"{layout.create_clause()} " if layout and layout.create_clause() else ""
+        return (f"CREATE OR REPLACE TABLE {gold_schema}.{name} USING delta {clause}"
+                f"TBLPROPERTIES ({', '.join(f'{k} = {v}' for k, v in props.items())}) AS {GOLD_TABLES[name]}")
+
+    stale, timings = {}, []
+    for name in tables:
+        inputs = [table for view, table in sources.items() if view in GOLD_TABLES[name]]
+        current, versions = is_current(spark, f"{gold_schema}.{name}", statement(name), inputs)
+        if force or not current:
+            stale[name] = versions
+        else:
+            timings.append({"table": f"{gold_schema}.{name}", "seconds": 0.0, "status": "skipped"})
+    if not stale:
+        return timings
+
+    needed = {view for name in stale for view in sources if view in GOLD_TABLES[name]}
+    cached = {}
+    for view, table in sources.items():
+        if view in needed:
+            columns = SILVER_COLUMNS if view == SILVER_VIEW else BRONZE_COLUMNS
+            cached[view] = spark.table(table).select(*columns).cache()
+            cached[view].createOrReplaceTempView(view)
+
+    def write(name: str) -> dict:
+        target = f"{gold_schema}.{name}"
+        sql_text, status = statement(name), "replaced"
+        if name in SCD2_DIMS and spark.catalog.tableExists(target):
+            if sorted(spark.sql(GOLD_TABLES[name]).columns) == sorted(spark.table(target).columns):
+                sql_text, status = scd2_merge_sql(target, name, incremental=not force), "scd2"
+        elif (name in GOLD_KEYS and spark.catalog.tableExists(target) and _cdf_enabled(spark, target)
+                and (name not in layouts or matches(spark, target, layouts[name]))):
+            columns = spark.sql(GOLD_TABLES[name]).columns
+            if sorted(columns) == sorted(spark.table(target).columns):
+                sql_text, status = merge_sql(target, GOLD_TABLES[name], GOLD_KEYS[name], columns), "merged"
+        with track(spark, f"gold.{name}", target) as write:
+            seconds = _timed(lambda: write.sql(sql_text))
+        if name in layouts:
+            optimize_sql = layouts[name].optimize_sql(target)
+            with track(spark, f"gold.{name}.optimize", target) as write:
+                seconds += _timed(lambda: write.sql(optimize_sql))
+            status += "+optimized"
+        record_builds(spark, [(target, statement(name), stale[name])], current_run_id())
+        return {"table": target, "seconds": seconds, "status": status}
+
+    try:
+        # Materialise the caches up front, so the writes below never hit storage for Silver
+        timings += [
+            {"table": sources[view], "seconds": _timed(df.count), "status": "cached"}
+            for view, df in cached.items()
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            timings += list(pool.map(write, stale))
+    finally:
+        for view, df in cached.items():
+            spark.catalog.dropTempView(view)
+            df.unpersist()
+    return timings
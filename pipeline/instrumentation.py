@@ -0,0 +1,221 @@
+"""Per-write run telemetry, appended to ``ops.pipeline_runs``.
+
+Wrap a write in :func:`track` and one row is recorded for it (also when it
+fails): wall time, rows read and written, bytes and files written, shuffle and
+spill, the Delta version it produced and a hash of its physical plan::
+
+    with track(spark, "silver_build", silver_table) as write:
+        write.sql(f"CREATE OR REPLACE TABLE {silver_table} AS {select_sql}")
+
+Output rows/bytes/files and the version come from the Delta commit
+(``DESCRIBE HISTORY``). Rows read, shuffle and spill come from the driver's
+status tracker and status store for the jobs the write ran under its own job
+group; where there is no SparkContext (serverless / Spark Connect) those
+columns are NULL. The plan hash is taken from the executed statement's (or
+written DataFrame's) query execution after the write, so nothing is planned
+twice. It ignores expression ids, so it only changes when the plan does; a
+stage that got slower with a new hash changed plan, one with the same hash got
+more data or a slower cluster.
+
+All rows of one pipeline run share a run id (:func:`start_run`).
+"""
+
+import hashlib
+import logging
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from pipeline.text_fixes import delta_version
+
+logger = logging.getLogger(__name__)
+
+RUNS_TABLE = "workspace.ops.pipeline_runs"
+RUNS_TREND_VIEW = "workspace.ops.pipeline_runs_trend"
+
+RUNS_SCHEMA = (
+    "run_id STRING, stage STRING, target_table STRING, operation STRING, status STRING, error STRING, "
+    "started_at TIMESTAMP, seconds DOUBLE, rows_in BIGINT, rows_out BIGINT, bytes_written BIGINT, "
+    "files_written BIGINT, shuffle_read_bytes BIGINT, shuffle_write_bytes BIGINT, spill_bytes BIGINT, "
+    "delta_version BIGINT, plan_hash STRING"
+)
+
+# Delta operationMetrics per column, first key present wins (WRITE/CTAS, MERGE, OPTIMIZE)
+_DELTA_METRICS = {
+    "rows_out": ("numOutputRows",),
+    "bytes_written": ("numOutputBytes", "numTargetBytesAdded", "numAddedBytes"),
+    "files_written": ("numFiles", "numTargetFilesAdded", "numAddedFiles"),
+    "rows_in": ("numSourceRows",),
+}
+
+_run_id = None
+
+
+def start_run(run_id=None) -> str:
+    """Start a new run id for the rows recorded from now on."""
+    global _run_id
+    _run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    return _run_id
+
+
+def current_run_id() -> str:
+    return _run_id or start_run()
+
+
+def plan_hash(df):
+    """Hash of the physical plan ``df`` ran with (from its ``queryExecution``), or None."""
+    try:
+        plan = df._jdf.queryExecution().executedPlan().toString()
+    except Exception:  # noqa: BLE001 - telemetry only (no JVM handle under Spark Connect)
+        return None
+    plan = re.sub(r"#\d+L?|\[plan_id=\d+\]", "", plan)  # expression / plan ids change every run
+    return hashlib.sha1(plan.encode("utf-8")).hexdigest()[:16]
+
+
+def _version(spark, table):
+    try:
+        return delta_version(spark, table)
+    except Exception:  # noqa: BLE001 - table does not exist yet
+        return None
+
+
+def _delta_commit(spark, table: str, before) -> dict:
+    """Version and metrics of the commit ``table`` got after version ``before``."""
+    try:
+        row = spark.sql(f"DESCRIBE HISTORY {table} LIMIT 1").first()
+    except Exception:  # noqa: BLE001
+        return {}
+    if row is None or (before is not None and row["version"] <= before):
+        return {}
+    metrics = row["operationMetrics"] or {}
+    out = {"delta_version": row["version"], "operation": row["operation"]}
+    for column, keys in _DELTA_METRICS.items():
+        out[column] = next((int(metrics[k]) for k in keys if metrics.get(k) is not None), None)
+    return out
+
+
+def _stage_attempts(sc, stage_id: int):
+    """``v1.StageData`` of every attempt of ``stage_id`` from the driver's status store (a Scala Seq)."""
+    store = sc._jsc.sc().statusStore()
+    try:  # (stageId, details, taskStatus, withSummaries, unsortedQuantiles) on current Spark
+        return store.stageData(stage_id, False, sc._jvm.java.util.Collections.emptyList(), False,
+                               sc._gateway.new_array(sc._jvm.double, 0))
+    except Exception:  # noqa: BLE001 - older Spark: (stageId, details)
+        return store.stageData(stage_id, False)
+
+
+def _job_group_metrics(spark, group: str) -> dict:
+    """Rows read, shuffle and spill of the Spark jobs run under ``group`` (empty if unavailable).
+
+    The status tracker gives the group's job ids and their stages; stage metrics
+    are read in-process from the status store the Spark UI is served from.
+    """
+    try:
+        sc = spark.sparkContext
+        tracker = sc.statusTracker()
+        jobs = [tracker.getJobInfo(job_id) for job_id in tracker.getJobIdsForGroup(group)]
+        stage_ids = {s for job in jobs if job is not None for s in job.stageIds}
+        totals = {"rows_in": 0, "shuffle_read_bytes": 0, "shuffle_write_bytes": 0, "spill_bytes": 0}
+        for stage_id in stage_ids:
+            attempts = _stage_attempts(sc, stage_id)
+            for i in range(attempts.size()):
+                attempt = attempts.apply(i)
+                if attempt.status().toString() == "SKIPPED":
+                    continue
+                totals["rows_in"] += attempt.inputRecords()
+                totals["shuffle_read_bytes"] += attempt.shuffleReadBytes()
+                totals["shuffle_write_bytes"] += attempt.shuffleWriteBytes()
+                totals["spill_bytes"] += attempt.memoryBytesSpilled() + attempt.diskBytesSpilled()
+        return totals
+    except Exception:  # noqa: BLE001 - no SparkContext (serverless / Spark Connect)
+        return {}
+
+
+def _set_job_group(spark, group):
+    """Set the job group of this thread; returns the previous one (False if unsupported)."""
+    try:
+        sc = spark.sparkContext
+        previous = sc.getLocalProperty("spark.jobGroup.id")
+        sc.setLocalProperty("spark.jobGroup.id", group)
+        return previous
+    except Exception:  # noqa: BLE001
+        return False
+
+
+class TrackedWrite:
+    """Yielded by :func:`track`: runs the tracked statement and keeps its result for the plan hash."""
+
+    def __init__(self, spark, result=None):
+        self.spark = spark
+        self.result = result
+
+    def sql(self, sql_text: str):
+        self.result = self.spark.sql(sql_text)
+        return self.result
+
+
+@contextmanager
+def track(spark, stage: str, target_table: str, query=None, run_id=None, runs_table=RUNS_TABLE):
+    """Record the write done inside the ``with`` block to ``runs_table``.
+
+    Run a SQL write through the yielded :class:`TrackedWrite` (``write.sql(...)``),
+    or pass the DataFrame being written as ``query``; either is only used for
+    the plan hash.
+    """
+    run_id = run_id or current_run_id()
+    before = _version(spark, target_table)
+    write = TrackedWrite(spark, query)
+    group = f"pipeline_runs:{run_id}:{stage}"
+    previous_group = _set_job_group(spark, group)
+
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    status, error = "ok", None
+    try:
+        yield write
+    except Exception as exc:
+        status, error = "failed", f"{type(exc).__name__}: {exc}"[:1000]
+        raise
+    finally:
+        seconds = round(time.perf_counter() - start, 3)
+        if previous_group is not False:
+            _set_job_group(spark, previous_group)
+        metrics = _job_group_metrics(spark, group)
+        # Delta's counts win where present (MERGE reports its source rows; other writes do not)
+        metrics.update({k: v for k, v in _delta_commit(spark, target_table, before).items() if v is not None})
+        row = (
+            run_id, stage, target_table, metrics.get("operation"), status, error, started_at, seconds,
+            metrics.get("rows_in"), metrics.get("rows_out"), metrics.get("bytes_written"),
+            metrics.get("files_written"), metrics.get("shuffle_read_bytes"), metrics.get("shuffle_write_bytes"),
+            metrics.get("spill_bytes"), metrics.get("delta_version"),
+            plan_hash(write.result) if write.result is not None else None,
+        )
+        try:
+            record_runs(spark, [row], runs_table)
+        except Exception as exc:  # noqa: BLE001 - telemetry must not fail the write it measures
+            logger.warning("Could not record run telemetry for %s: %s", stage, exc)
+
+
+def record_runs(spark, rows: list, runs_table=RUNS_TABLE):
+    """Append result tuples (in RUNS_SCHEMA order) to ``runs_table``."""
+    spark.sql(f"CREATE SCHEMA IF NOT EXISTS {runs_table.rsplit('.', 1)[0]}")
+    spark.sql(f"CREATE TABLE IF NOT EXISTS {runs_table} ({RUNS_SCHEMA}) USING delta")
+    spark.createDataFrame(rows, RUNS_SCHEMA).write.format("delta").mode("append").saveAsTable(runs_table)
+
+
+def trend_view_sql(runs_table=RUNS_TABLE, view=RUNS_TREND_VIEW) -> str:
+    """View comparing every stage with its previous successful run."""
+    return f"""
+    CREATE OR REPLACE VIEW {view} AS
+    SELECT
+      *,
+      LAG(seconds)   OVER w AS prev_seconds,
+      LAG(rows_in)   OVER w AS prev_rows_in,
+      LAG(plan_hash) OVER w AS prev_plan_hash,
+      seconds / NULLIF(LAG(seconds) OVER w, 0) AS slowdown,
+      plan_hash <> LAG(plan_hash) OVER w AS plan_changed
+    FROM {runs_table}
+    WHERE status = 'ok'
+    WINDOW w AS (PARTITION BY stage ORDER BY started_at)
+    """
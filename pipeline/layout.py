@@ -0,0 +1,246 @@
+"""Physical layout of the Gold facts: clustering/partitioning, compaction and file stats.
+
+Plain ``USING delta`` CTAS writes files in whatever order Silver was scanned,
+so every file spans every date, channel and category, and a query filtered on
+any of them reads the whole table. ``FACT_LAYOUTS`` declares a layout per
+table, applied by :func:`pipeline.gold.build_gold`:
+
+* ``cluster_by``: liquid clustering keys (``CLUSTER BY``); ``OPTIMIZE``
+  rewrites files so each covers a narrow range of these columns;
+* ``partition_by`` / ``zorder_by``: the Hive-style alternative (a partition
+  directory per value, ``OPTIMIZE ... ZORDER BY`` inside partitions); use it
+  only for low-cardinality columns with GBs per value;
+* ``target_file_size``: ``delta.targetFileSize`` for writes and ``OPTIMIZE``.
+
+Delta skips files using the min/max statistics it records per file in the
+``add`` actions of its transaction log. :func:`verify_layouts` reads those
+statistics from the log (no data file is scanned), fails when a live file has
+none for a layout column, and measures, per column, the share of files a
+single-value filter still has to read (1.0 = no skipping) over the values of
+the column's dimension.
+
+The log is read by path, which works for tables whose storage the cluster can
+read directly: external tables (Hive metastore, or Unity Catalog external
+locations with ``READ FILES``). Unity Catalog managed tables usually deny path
+access; their checks are recorded as skipped instead.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from pipeline.validation import QA_RESULTS_TABLE, record_results
+
+logger = logging.getLogger(__name__)
+
+# A single-value filter reading more than this share of files is reported (warn)
+MAX_FILES_READ_RATIO = 0.5
+
+# Layout column -> (dimension, key) whose values the skipping is measured over
+LAYOUT_DIMS = {
+    "order_date_key": ("dim_date", "date_key"),
+    "category_id": ("dim_category", "category_id"),
+    "channel_key": ("dim_channel", "channel_key"),
+}
+
+# Errors of a path read the metastore does not allow (e.g. the location of a
+# Unity Catalog managed table), as error classes or in the message
+PATH_ACCESS_DENIED = (
+    "INSUFFICIENT_PERMISSIONS",
+    "UNAUTHORIZED_ACCESS",
+    "PERMISSION_DENIED",
+    "LOCATION_OVERLAP",
+    "AccessDeniedException",
+)
+
+
+@dataclass(frozen=True)
+class Layout:
+    cluster_by: tuple = ()
+    partition_by: tuple = ()
+    zorder_by: tuple = ()
+    target_file_size: str = "128mb"
+
+    @property
+    def columns(self) -> tuple:
+        return self.cluster_by + self.partition_by + self.zorder_by
+
+    def create_clause(self) -> str:
+        """``PARTITIONED BY`` / ``CLUSTER BY`` for ``CREATE TABLE ... USING delta``."""
+        if self.cluster_by and (self.partition_by or self.zorder_by):
+            raise ValueError("Liquid clustering cannot be combined with partitioning or Z-ordering")
+        if self.cluster_by:
+            return f"CLUSTER BY ({', '.join(self.cluster_by)})"
+        if self.partition_by:
+            return f"PARTITIONED BY ({', '.join(self.partition_by)})"
+        return ""
+
+    def properties(self) -> dict:
+        return {"delta.targetFileSize": f"'{self.target_file_size}'"} if self.target_file_size else {}
+
+    def optimize_sql(self, table: str) -> str:
+        zorder = f" ZORDER BY ({', '.join(self.zorder_by)})" if self.zorder_by else ""
+        return f"OPTIMIZE {table}{zorder}"
+
+
+FACT_LAYOUTS = {
+    "fact_sales": Layout(cluster_by=("order_date_key", "category_id")),
+    "fact_fulfilment": Layout(cluster_by=("order_date_key", "channel_key")),
+    "fact_order_item": Layout(cluster_by=("order_date_key", "channel_key", "category_id")),
+}
+
+
+def matches(spark, table: str, layout: Layout) -> bool:
+    """Whether the existing ``table`` already has the clustering/partition columns of ``layout``."""
+    detail = spark.sql(f"DESCRIBE DETAIL {table}").first().asDict()
+    return (
+        list(detail.get("clusteringColumns") or []) == list(layout.cluster_by)
+        and list(detail.get("partitionColumns") or []) == list(layout.partition_by)
+    )
+
+
+def _log_dir(spark, table: str) -> str:
+    return spark.sql(f"DESCRIBE DETAIL {table}").first()["location"].rstrip("/") + "/_delta_log"
+
+
+def is_path_access_denied(exc: Exception) -> bool:
+    """Whether ``exc`` (from reading a table's ``_delta_log`` by path) means the path is not readable."""
+    error_class = getattr(exc, "getErrorClass", lambda: None)()
+    return any(c in f"{error_class} {exc}" for c in PATH_ACCESS_DENIED)
+
+
+def _last_checkpoint(spark, log_dir: str) -> int:
+    """Version of the latest checkpoint, or -1 when the table has none yet."""
+    try:
+        return spark.read.json(f"{log_dir}/_last_checkpoint").first()["version"]
+    except Exception:  # noqa: BLE001 - no _last_checkpoint file: replay every commit
+        return -1
+
+
+def file_stats(spark, table: str) -> list:
+    """Per live data file of ``table``: ``{"path", "rows", "min", "max", "null_count"}``.
+
+    Replays the Delta log (latest checkpoint, then the later commits in version
+    order) and parses the ``stats`` JSON of each file's ``add`` action. A file
+    written without statistics has ``rows`` None and empty ranges.
+    """
+    from pyspark.sql.functions import col, regexp_extract
+
+    log_dir = _log_dir(spark, table)
+    checkpoint = _last_checkpoint(spark, log_dir)
+    live = {}
+    if checkpoint >= 0:
+        parts = spark.read.parquet(f"{log_dir}/{checkpoint:020d}.checkpoint*.parquet")
+        for r in parts.where("add IS NOT NULL").select("add.path", "add.stats").collect():
+            live[r["path"]] = r["stats"]
+
+    commits = spark.read.json(f"{log_dir}/*.json").select(
+        "*", regexp_extract(col("_metadata.file_path"), r"(\d+)\.json$", 1).cast("long").alias("_version")
+    ).where(col("_version") > checkpoint)
+    actions = []
+    if "remove" in commits.columns:
+        actions += [(r["_version"], 0, r["path"], None)
+                    for r in commits.where("remove IS NOT NULL").select("_version", "remove.path").collect()]
+    if "add" in commits.columns:
+        actions += [(r["_version"], 1, r["path"], r["stats"])
+                    for r in commits.where("add IS NOT NULL").select("_version", "add.path", "add.stats").collect()]
+    # Within a commit removes go first: a deletion-vector update removes and re-adds the same path
+    for _, is_add, path, stats in sorted(actions, key=lambda a: a[:2]):
+        if is_add:
+            live[path] = stats
+        else:
+            live.pop(path, None)
+
+    files = []
+    for path, stats in sorted(live.items()):
+        parsed = json.loads(stats) if stats else {}
+        files.append({"path": path, "rows": parsed.get("numRecords"), "min": parsed.get("minValues", {}),
+                      "max": parsed.get("maxValues", {}), "null_count": parsed.get("nullCount", {})})
+    return files
+
+
+def has_stats(file: dict, column: str) -> bool:
+    """Whether Delta can skip ``file`` on ``column``: a min/max, or a column that is all NULL."""
+    return column in file["min"] or (file["rows"] is not None and file["null_count"].get(column) == file["rows"])
+
+
+def _comparable(value):
+    # The log stores dates and strings as JSON strings, numbers as numbers
+    return value if isinstance(value, (int, float, str)) else str(value)
+
+
+def files_read_ratio(files: list, column: str, values: list) -> float:
+    """Mean share of ``files`` a filter ``column = value`` reads, over ``values``.
+
+    A file without statistics for ``column`` is read for every value.
+    """
+    if not files or not values:
+        return 0.0
+    hits = 0
+    for v in map(_comparable, values):
+        for f in files:
+            if not has_stats(f, column):
+                hits += 1
+            elif column in f["min"] and f["min"][column] <= v <= f["max"][column]:
+                hits += 1
+    return hits / (len(values) * len(files))
+
+
+def layout_values(spark, table: str, column: str, gold_schema="workspace.gold") -> list:
+    """Values a filter on ``column`` would use: the keys of its dimension (LAYOUT_DIMS),
+    else the distinct values in ``table``."""
+    if column in LAYOUT_DIMS:
+        dim, key = LAYOUT_DIMS[column]
+        table, column = f"{gold_schema}.{dim}", key
+    return [r[0] for r in spark.sql(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL").collect()]
+
+
+def verify_layouts(spark, layouts=None, gold_schema="workspace.gold", run_id=None,
+                   results_table=QA_RESULTS_TABLE):
+    """Check statistics and file skipping for every layout column; one row per (table, column).
+
+    Results are appended to ``results_table``: ``stats_indexed`` (error when a
+    live file has no statistics for a layout column; the metric is the number
+    of such files) and ``files_read_ratio`` (warn above MAX_FILES_READ_RATIO
+    when the table has more than one file). Raises ``RuntimeError`` after
+    recording when any ``stats_indexed`` check failed. A table whose Delta log
+    cannot be read by path gets a ``stats_indexed`` warn row with no metric and
+    ``passed`` NULL (not checked) per column, and does not fail the call.
+    """
+    layouts = FACT_LAYOUTS if layouts is None else layouts
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    out, qa_rows, failures = [], [], []
+    for name, layout in layouts.items():
+        table = f"{gold_schema}.{name}"
+        try:
+            files = file_stats(spark, table)
+        except Exception as exc:  # noqa: BLE001 - only a denied path read skips the table
+            if not is_path_access_denied(exc):
+                raise
+            logger.warning("Cannot read the Delta log of %s by path, layout checks skipped: %s", table, exc)
+            for column in layout.columns:
+                out.append((table, column, None, None, None, None))
+                qa_rows.append((run_id, table, f"stats_indexed:{column}", "stats_indexed", column, None, 0.0,
+                                "warn", None, None))
+            continue
+        rows = sum(f["rows"] or 0 for f in files)
+        for column in layout.columns:
+            missing = sum(1 for f in files if not has_stats(f, column))
+            ratio = files_read_ratio(files, column, layout_values(spark, table, column, gold_schema))
+            out.append((table, column, len(files), rows, missing == 0, ratio))
+            qa_rows += [
+                (run_id, table, f"stats_indexed:{column}", "stats_indexed", column, float(missing), 0.0,
+                 "error", missing == 0, rows),
+                (run_id, table, f"files_read_ratio:{column}", "files_read_ratio", column, ratio,
+                 MAX_FILES_READ_RATIO, "warn", len(files) <= 1 or ratio <= MAX_FILES_READ_RATIO, rows),
+            ]
+            if missing:
+                failures.append(f"{table}.{column} ({missing} of {len(files)} files)")
+    record_results(spark, qa_rows, results_table)
+    if failures:
+        raise RuntimeError("Files without min/max statistics for a layout column: " + ", ".join(failures))
+    return spark.createDataFrame(
+        out, "table_name STRING, column_name STRING, files BIGINT, rows BIGINT, stats_indexed BOOLEAN, "
+             "files_read_ratio DOUBLE"
+    )
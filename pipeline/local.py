@@ -0,0 +1,670 @@
+"""Local DuckDB backend for the Bronze -> Silver -> Gold pipeline.
+
+Runs the SQL produced by :mod:`pipeline.silver`, :mod:`pipeline.gold`,
+:mod:`pipeline.validation` and :mod:`pipeline.fk_coverage` (and the seed
+scripts under ``sql/``) against DuckDB instead of Spark, so a change can be
+checked on a laptop over a local CSV/Parquet extract. The Spark SQL is
+translated by :func:`translate`; the differences that matter for the output are
+
+* ``xxhash64``: a Python port of Spark's seeded XXH64, so geo/channel keys match;
+* ``sequence``/``explode``/``inline``: ``generate_series``/``unnest``;
+* Spark string literals (``'\\\\p{L}'``, ``'\\\\u0000'``) and ``regexp_replace`` (replace-all);
+* Java datetime patterns for ``try_to_timestamp``/``date_format``;
+* ``<=>``, ``EXCEPT``, ``CACHE TABLE``, ``FROM VALUES``, ``1L``, maps and structs.
+
+``MERGE INTO ... UPDATE SET * / INSERT *`` runs as-is on DuckDB >= 1.4. The
+catalog (``workspace``) is the alias the DuckDB database is attached under, so
+a different prefix is a constructor argument::
+
+    python -m pipeline.local DataCoSupplyChainDataset.csv --db dataco.duckdb \\
+        --compare data/databricks_gold_export
+"""
+
+import argparse
+import re
+import shutil
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+from pipeline import aggregates, export, fk_coverage, gold, retention, silver, validation
+from pipeline.bronze import clean_names
+from pipeline.layout import FACT_LAYOUTS
+from pipeline.sqlfiles import read_statements
+
+SPARK_CATALOG = "workspace"
+
+SOURCE_TABLE = "workspace.default.data_co_supply_chain_dataset"
+RAW_TABLE = "workspace.bronze.dataco_supplychain_raw"
+AUDITED_TABLE = "workspace.bronze.dataco_supplychain_raw_audited"
+FIXES_TABLE = "workspace.silver.ref_text_fixes"
+SILVER_TABLE = "workspace.silver.dataco_supplychain_clean_v3"
+CURRENT_VIEW = "workspace.silver.dataco_supplychain_clean_current"
+
+# ---------------------------------------------------------------------------
+# Spark xxhash64
+# ---------------------------------------------------------------------------
+
+_M64 = (1 << 64) - 1
+_P1, _P2, _P3, _P4, _P5 = (
+    0x9E3779B185EBCA87, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x85EBCA77C2B2AE63, 0x27D4EB2F165667C5,
+)
+
+
+def _rotl(x: int, r: int) -> int:
+    return ((x << r) | (x >> (64 - r))) & _M64
+
+
+def _round(acc: int, lane: int) -> int:
+    return (_rotl((acc + lane * _P2) & _M64, 31) * _P1) & _M64
+
+
+def _lane(data: bytes, i: int, size: int = 8) -> int:
+    return int.from_bytes(data[i:i + size], "little")
+
+
+def xxh64(data: bytes, seed: int) -> int:
+    """Reference XXH64 (unsigned)."""
+    n, i = len(data), 0
+    if n >= 32:
+        v = [(seed + _P1 + _P2) & _M64, (seed + _P2) & _M64, seed, (seed - _P1) & _M64]
+        while i + 32 <= n:
+            v = [_round(v[k], _lane(data, i + 8 * k)) for k in range(4)]
+            i += 32
+        h = (_rotl(v[0], 1) + _rotl(v[1], 7) + _rotl(v[2], 12) + _rotl(v[3], 18)) & _M64
+        for lane in v:
+            h = (((h ^ _round(0, lane)) * _P1) + _P4) & _M64
+    else:
+        h = (seed + _P5) & _M64
+    h = (h + n) & _M64
+    while i + 8 <= n:
+        h ^= _round(0, _lane(data, i))
+        h = (_rotl(h, 27) * _P1 + _P4) & _M64
+        i += 8
+    if i + 4 <= n:
+        h ^= (_lane(data, i, 4) * _P1) & _M64
+        h = (_rotl(h, 23) * _P2 + _P3) & _M64
+        i += 4
+    while i < n:
+        h ^= (data[i] * _P5) & _M64
+        h = (_rotl(h, 11) * _P1) & _M64
+        i += 1
+    h ^= h >> 33
+    h = (h * _P2) & _M64
+    h ^= h >> 29
+    h = (h * _P3) & _M64
+    return h ^ (h >> 32)
+
+
+@lru_cache(maxsize=None)
+def _spark_xxhash64(values: tuple) -> int:
+    h = 42  # Spark's seed; each argument is hashed with the previous hash as seed
+    for value in values:
+        if value is not None:
+            h = xxh64(value.encode("utf-8"), h)
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def spark_xxhash64(values: list) -> int:
+    """``xxhash64(s1, s2, ...)`` of Spark for string arguments (signed 64-bit)."""
+    return _spark_xxhash64(tuple(values))
+
+
+def _spark_xxhash64_arrow(values: pa.ListArray) -> pa.Array:
+    # Vectorised UDF: one Python call per chunk instead of per row
+    return pa.array([_spark_xxhash64(tuple(v)) for v in values.to_pylist()], pa.int64())
+
+
+# ---------------------------------------------------------------------------
+# Spark SQL -> DuckDB
+# ---------------------------------------------------------------------------
+
+# Java DateTimeFormatter letters used in this repo -> strftime
+_DATE_PATTERNS = [("yyyy", "%Y"), ("MM", "%m"), ("M", "%m"), ("dd", "%d"), ("d", "%d"),
+                  ("HH", "%H"), ("H", "%H"), ("mm", "%M"), ("EEEE", "%A")]
+
+
+def _strftime(java_pattern: str) -> str:
+    out, i = "", 0
+    while i < len(java_pattern):
+        for java, c in _DATE_PATTERNS:
+            if java_pattern.startswith(java, i):
+                out += c
+                i += len(java)
+                break
+        else:
+            out += java_pattern[i]
+            i += 1
+    return out
+
+
+def _skip_literal(sql: str, i: int) -> int:
+    """Index just past the Spark string literal starting at ``sql[i]``."""
+    quote, i = sql[i], i + 1
+    while i < len(sql):
+        if sql[i] == "\\":
+            i += 2
+            continue
+        if sql[i] == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def _literal(spark_literal: str) -> str:
+    """Spark string literal (backslash escapes) -> standard SQL literal."""
+    body = spark_literal[1:-1]
+    out, i = [], 0
+    while i < len(body):
+        if body.startswith("\\u", i) and re.fullmatch(r"[0-9a-fA-F]{4}", body[i + 2:i + 6]):
+            out.append(chr(int(body[i + 2:i + 6], 16)))
+            i += 6
+        elif body[i] == "\\" and i + 1 < len(body):
+            out.append(body[i + 1])
+            i += 2
+        else:
+            out.append(body[i])
+            i += 1
+    text = "".join(out).replace("'", "''")
+    # Control characters (e.g. the U+0000 NULL marker of gold.attr_hash_sql) as chr() calls
+    pieces = re.split(r"([\x00-\x08\x0b\x0c\x0e-\x1f])", text)
+    if len(pieces) == 1:
+        return f"'{text}'"
+    return "(" + " || ".join(f"chr({ord(p)})" if i % 2 else f"'{p}'" for i, p in enumerate(pieces)) + ")"
+
+
+def _split_args(inner: str) -> list[str]:
+    args, depth, start, i = [], 0, 0, 0
+    while i < len(inner):
+        ch = inner[i]
+        if ch in "'\"":
+            i = _skip_literal(inner, i)
+            continue
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(inner[start:i].strip())
+            start = i + 1
+        i += 1
+    if inner[start:].strip():
+        args.append(inner[start:].strip())
+    return args
+
+
+def _close_paren(sql: str, open_idx: int) -> int:
+    depth, i = 0, open_idx
+    while i < len(sql):
+        ch = sql[i]
+        if ch in "'\"":
+            i = _skip_literal(sql, i)
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _unpack_alias(arg: str) -> tuple[str, str]:
+    m = re.search(r"\s+AS\s+(\w+)\s*$", arg, re.I)
+    return arg[:m.start()], m.group(1)
+
+
+def _struct(args):
+    return "struct_pack(" + ", ".join(f"{n} := {e}" for e, n in map(_unpack_alias, args)) + ")"
+
+
+def _named_struct(args):
+    return "struct_pack(" + ", ".join(f"{args[i][1:-1]} := {args[i + 1]}" for i in range(0, len(args), 2)) + ")"
+
+
+def _map(args):
+    return "MAP {" + ", ".join(f"{args[i]}: {args[i + 1]}" for i in range(0, len(args), 2)) + "}"
+
+
+def _slice(args):
+    start, length = int(args[1]), int(args[2])
+    return f"list_slice({args[0]}, {start}, {start + length - 1})"
+
+
+_FUNCTIONS = {
+    "xxhash64": lambda a: f"spark_xxhash64([{', '.join(a)}])",
+    "regexp_replace": lambda a: f"regexp_replace({', '.join(a)}, 'g')",
+    "try_to_timestamp": lambda a: f"try_strptime({a[0]}, '{_strftime(a[1][1:-1])}')",
+    "date_format": lambda a: f"strftime({a[0]}, '{_strftime(a[1][1:-1])}')",
+    "to_date": lambda a: f"CAST({a[0]} AS DATE)",
+    "dayofweek": lambda a: f"(dayofweek({a[0]}) + 1)",  # Spark: Sunday = 1
+    "sequence": lambda a: f"CAST(generate_series({', '.join(a)}) AS DATE[])",
+    "explode": lambda a: f"unnest({a[0]})",
+    "inline": lambda a: f"unnest({a[0]}, recursive := true)",
+    "array": lambda a: f"[{', '.join(a)}]",
+    "struct": _struct,
+    "named_struct": _named_struct,
+    "map": _map,
+    "try_element_at": lambda a: f"({a[0]})[{a[1]}]",
+    "collect_list": lambda a: f"list({a[0]}) FILTER (WHERE {a[0]} IS NOT NULL)",
+    "collect_set": lambda a: f"list_distinct(list({a[0]}))",
+    "slice": _slice,
+    "current_timestamp": lambda a: "current_timestamp",
+}
+_CALL = re.compile(r"\b(" + "|".join(_FUNCTIONS) + r")\s*\(", re.I)
+
+_REWRITES = [
+    (re.compile(r"<=>"), "IS NOT DISTINCT FROM"),
+    (re.compile(r"\bUSING\s+delta\b", re.I), ""),
+    (re.compile(r"\*\s+EXCEPT\s*\(", re.I), "* EXCLUDE ("),
+    (re.compile(r"\bUNCACHE\s+TABLE\b", re.I), "DROP TABLE"),
+    (re.compile(r"\bCACHE\s+TABLE\b", re.I), "CREATE OR REPLACE TEMP TABLE"),
+    (re.compile(r"\b(\d+)L\b"), r"CAST(\1 AS BIGINT)"),
+]
+
+
+def _rewrite_code(code: str) -> str:
+    for pattern, repl in _REWRITES:
+        code = pattern.sub(repl, code)
+    return code
+
+
+def _rewrite_calls(sql: str) -> str:
+    out, i = [], 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch in "'\"":
+            end = _skip_literal(sql, i)
+            out.append(sql[i:end])
+            i = end
+            continue
+        m = _CALL.match(sql, i) if (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")) else None
+        if m:
+            open_idx = m.end() - 1
+            close = _close_paren(sql, open_idx)
+            args = [_rewrite_calls(a) for a in _split_args(sql[open_idx + 1:close])]
+            out.append(_FUNCTIONS[m.group(1).lower()](args))
+            i = close + 1
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _rewrite_values(sql: str) -> str:
+    """``FROM VALUES (..), (..) [AS t(cols)]`` -> ``FROM (VALUES ...) AS t(cols)``."""
+    out, pos = [], 0
+    for m in re.finditer(r"\bFROM\s+VALUES\s*", sql, re.I):
+        if m.start() < pos:
+            continue
+        i, first = m.end(), None
+        while i < len(sql) and sql[i] == "(":
+            close = _close_paren(sql, i)
+            first = first or sql[i + 1:close]
+            i = close + 1
+            nxt = re.match(r"\s*,\s*", sql[i:])
+            if not nxt or sql[i + nxt.end():i + nxt.end() + 1] != "(":
+                break
+            i += nxt.end()
+        alias = re.match(r"\s*AS\s+\w+\s*\([^)]*\)", sql[i:], re.I)
+        if alias:
+            suffix, end = alias.group(0), i + alias.end()
+        else:  # Spark's default names are col1, col2, ...
+            cols = ", ".join(f"col{k}" for k in range(1, len(_split_args(first)) + 1))
+            suffix, end = f" AS _values({cols})", i
+        out.append(sql[pos:m.start()] + "FROM (VALUES " + sql[m.end():i].strip() + ")" + suffix)
+        pos = end
+    return "".join(out) + sql[pos:]
+
+
+def translate(sql: str, catalog: str = SPARK_CATALOG) -> str:
+    """Spark SQL as used in this repo -> DuckDB SQL."""
+    parts, i, start = [], 0, 0
+    while i < len(sql):
+        if sql[i] == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = len(sql) if end == -1 else end
+            parts.append(_rewrite_code(sql[start:i]))
+            start = i = end
+        elif sql[i] == "'":
+            end = _skip_literal(sql, i)
+            parts.append(_rewrite_code(sql[start:i]) + _literal(sql[i:end]))
+            start = i = end
+        else:
+            i += 1
+    parts.append(_rewrite_code(sql[start:]))
+    out = _rewrite_values(_rewrite_calls("".join(parts)))
+    if catalog != SPARK_CATALOG:
+        out = re.sub(rf"\b{SPARK_CATALOG}\.", f"{catalog}.", out)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+
+def _utf8_csv(path: Path, workdir: Path) -> Path:
+    """``path`` if it is valid UTF-8, else a copy with bad bytes as U+FFFD (as Spark reads it)."""
+    try:
+        with path.open(encoding="utf-8") as f:
+            for _ in f:
+                pass
+        return path
+    except UnicodeDecodeError:
+        pass
+    workdir.mkdir(parents=True, exist_ok=True)
+    target = workdir / f"{path.stem}.utf8.csv"
+    with path.open(encoding="utf-8", errors="replace", newline="") as src, \
+            target.open("w", encoding="utf-8", newline="") as dst:
+        for line in src:
+            dst.write(line)
+    return target
+
+
+class LocalPipeline:
+    """The medallion build on one DuckDB connection.
+
+    ``catalog`` is the name the database is attached under; table names written
+    as ``workspace.<schema>.<table>`` in the shared SQL are mapped onto it.
+    """
+
+    def __init__(self, db_path=":memory:", catalog=SPARK_CATALOG, workdir=".local"):
+        self.catalog = catalog
+        self.workdir = Path(workdir)
+        self.con = duckdb.connect()
+        self.con.execute(f"ATTACH '{db_path}' AS {catalog}")
+        self.con.create_function("spark_xxhash64", _spark_xxhash64_arrow,
+                                 [duckdb.sqltype("VARCHAR[]")], duckdb.sqltype("BIGINT"), type="arrow")
+        for schema in ("default", "bronze", "silver", "gold"):
+            self.sql(f"CREATE SCHEMA IF NOT EXISTS workspace.{schema}")
+        self.timings = []
+        self.measure = False
+
+    def sql(self, spark_sql: str):
+        return self.con.execute(translate(spark_sql, self.catalog))
+
+    def name(self, table: str) -> str:
+        return translate(table, self.catalog)
+
+    def _stored_bytes(self) -> int:
+        self.con.execute(f"CHECKPOINT {self.catalog}")
+        row = self.con.execute(
+            "SELECT used_blocks * block_size FROM pragma_database_size() WHERE database_name = ?", [self.catalog]
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _timed(self, stage: str, fn, table=None):
+        """Run ``fn`` as ``stage``; with ``measure`` set, also record the rows in
+        ``table`` and the bytes the stage added to the database file."""
+        before = self._stored_bytes() if self.measure else 0
+        start = time.perf_counter()
+        result = fn()
+        timing = {"stage": stage, "seconds": round(time.perf_counter() - start, 3)}
+        if self.measure:
+            timing["rows"] = self.sql(f"SELECT COUNT(*) FROM {table}").fetchone()[0] if table else None
+            timing["bytes_written"] = max(0, self._stored_bytes() - before)
+        self.timings.append(timing)
+        return result
+
+    def exists(self, table: str) -> bool:
+        catalog, schema, name = self.name(table).split(".")
+        return bool(self.con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables "
+            "WHERE table_catalog = ? AND table_schema = ? AND table_name = ?", [catalog, schema, name],
+        ).fetchone()[0])
+
+    # -- Bronze ------------------------------------------------------------
+
+    def load_source(self, path):
+        """Source extract (CSV or Parquet, original column names) -> default.data_co_supply_chain_dataset.
+
+        ``path`` is one file or a directory of part files (as written by :mod:`pipeline.synthetic`).
+        CSV column types are inferred as Spark's CSV reader would (numbers, booleans, strings).
+        """
+        path = Path(path)
+        files = sorted(path.glob("*.parquet")) or sorted(path.glob("*.csv")) if path.is_dir() else [path]
+        if files[0].suffix == ".parquet":
+            reader = f"read_parquet({[str(f) for f in files]})"
+        else:
+            # No DATE/TIMESTAMP sniffing: Spark's CSV inference leaves the DateOrders columns as strings
+            files = [str(_utf8_csv(f, self.workdir)) for f in files]
+            reader = (f"read_csv({files}, header = true, "
+                      "auto_type_candidates = ['BOOLEAN', 'BIGINT', 'DOUBLE', 'VARCHAR'])")
+        self._timed("source", lambda: self.con.execute(
+            f"CREATE OR REPLACE TABLE {self.name(SOURCE_TABLE)} AS SELECT * FROM {reader}"
+        ), SOURCE_TABLE)
+
+    def ingest(self, mode="full", batch_id=None) -> str:
+        """Clean names (notebook 02) + audited append of the rows above the order_item_id
+        watermark, or whose values differ from the latest audited row of their id (notebook 01)."""
+        batch_id = batch_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        columns = [r[0] for r in self.con.execute(f"DESCRIBE {self.name(SOURCE_TABLE)}").fetchall()]
+        renamed = ", ".join(f'"{c}" AS {n}' for c, n in zip(columns, clean_names(columns)))
+        self._timed("bronze_clean_names", lambda: self.sql(
+            f"CREATE OR REPLACE TABLE {RAW_TABLE} AS SELECT {renamed} FROM {SOURCE_TABLE}"
+        ), RAW_TABLE)
+
+        audit = "SELECT *, current_timestamp() AS _ingest_ts, '{}' AS _batch_id FROM {}"
+        if mode == "incremental" and self.exists(AUDITED_TABLE):
+            hwm = self.sql(f"SELECT MAX(CAST(order_item_id AS BIGINT)) FROM {AUDITED_TABLE}").fetchone()[0] or 0
+            # EXCEPT compares whole rows with NULLs equal, like notebook 01's (id, row hash) anti-join
+            changed = f"""(
+              SELECT * FROM {RAW_TABLE} WHERE CAST(order_item_id AS BIGINT) > {hwm}
+              UNION ALL (
+                SELECT * FROM {RAW_TABLE} WHERE CAST(order_item_id AS BIGINT) <= {hwm}
+                EXCEPT
+                SELECT * EXCEPT (_ingest_ts, _batch_id) FROM {AUDITED_TABLE}
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY order_item_id ORDER BY _ingest_ts DESC) = 1
+              )
+            )"""
+            stmt = f"INSERT INTO {AUDITED_TABLE} {audit.format(batch_id, changed)}"
+        else:
+            stmt = f"CREATE OR REPLACE TABLE {AUDITED_TABLE} AS {audit.format(batch_id, RAW_TABLE)}"
+        self._timed("bronze_ingest", lambda: self.sql(stmt), AUDITED_TABLE)
+        return batch_id
+
+    # -- Silver ------------------------------------------------------------
+
+    def load_fix_map(self) -> dict:
+        if not self.exists(FIXES_TABLE):
+            for script in ("silver/03_ref_text_fixes_create_and_seed.sql",
+                           "silver/03_ref_text_fixes_upsert_city_batch.sql"):
+                for stmt in read_statements(script):
+                    self.sql(stmt)
+        rows = self.sql(f"SELECT field, bad_value, good_value FROM {FIXES_TABLE}").fetchall()
+        return {(field, bad): good for field, bad, good in rows if bad is not None}
+
+    def build_silver(self, mode="full", batch_id=None):
+        """Fused v1/v2/v3 build; ``incremental`` MERGEs the rows of ``batch_id``."""
+        fix_map = self.load_fix_map()
+        source = AUDITED_TABLE
+        if mode == "incremental" and self.exists(SILVER_TABLE):
+            self.sql(f"""
+            CREATE OR REPLACE TEMP TABLE bronze_new_rows AS
+            SELECT * FROM {AUDITED_TABLE}
+            WHERE _batch_id = '{batch_id}'
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY order_item_id ORDER BY _ingest_ts DESC) = 1
+            """)
+            source = "bronze_new_rows"
+
+        self._timed("silver_lookups", lambda: (
+            self.sql(f"CACHE TABLE canon_lookup AS {silver.canon_lookup_sql(source, fix_map)}"),
+            self.sql(f"CACHE TABLE ts_lookup AS {silver.ts_lookup_sql(source)}"),
+        ), "canon_lookup")
+        if source == AUDITED_TABLE:
+            stmt = f"CREATE OR REPLACE TABLE {SILVER_TABLE} AS {silver.fused_select_sql(source, 'canon_lookup', 'ts_lookup')}"
+        else:
+            stmt = silver.upsert_sql(self.name(SILVER_TABLE), source, "canon_lookup", "ts_lookup")
+        self._timed("silver_fused", lambda: self.sql(stmt), SILVER_TABLE)
+        self.sql(f"CREATE OR REPLACE VIEW {CURRENT_VIEW} AS SELECT * FROM {SILVER_TABLE}")
+
+    # -- Gold --------------------------------------------------------------
+
+    def build_gold(self, tables=None):
+        """Every Gold table from one materialised, column-pruned read of Silver (as pipeline.gold).
+
+        DuckDB has no clustering; facts with a layout are written sorted on its
+        columns instead, so row-group min/max (and the exported Parquet) skip the same way.
+        """
+        self._timed("gold_silver_scan", lambda: self.sql(
+            f"CACHE TABLE {gold.SILVER_VIEW} AS SELECT {', '.join(gold.SILVER_COLUMNS)} FROM {gold.SILVER_TABLE}"
+        ), gold.SILVER_VIEW)
+        self.sql(f"CACHE TABLE {gold.BRONZE_VIEW} AS SELECT {', '.join(gold.BRONZE_COLUMNS)} FROM {gold.BRONZE_TABLE}")
+        for table in tables or gold.GOLD_TABLES:
+            select_sql = gold.GOLD_TABLES[table]
+            if table in FACT_LAYOUTS:
+                select_sql = f"SELECT * FROM ({select_sql}) ORDER BY {', '.join(FACT_LAYOUTS[table].columns)}"
+            self._timed(f"gold.{table}", lambda: self.sql(
+                f"CREATE OR REPLACE TABLE {gold.GOLD_SCHEMA}.{table} AS {select_sql}"
+            ), f"{gold.GOLD_SCHEMA}.{table}")
+
+    def build_aggregates(self):
+        """Dashboard aggregates, rebuilt in full (there is no change feed locally)."""
+        for name, agg in aggregates.AGGREGATES.items():
+            self._timed(f"gold.{name}", lambda: self.sql(
+                f"CREATE OR REPLACE TABLE {aggregates.GOLD_SCHEMA}.{name} AS {agg.sql()}"
+            ), f"{aggregates.GOLD_SCHEMA}.{name}")
+
+    def build_retention(self):
+        """Retention tables, rebuilt in full (there is no change feed locally)."""
+        for name, select_sql in retention.full_sql().items():
+            self._timed(f"gold.{name}", lambda: self.sql(
+                f"CREATE OR REPLACE TABLE {retention.GOLD_SCHEMA}.{name} AS {select_sql}"
+            ), f"{retention.GOLD_SCHEMA}.{name}")
+
+    def validate(self) -> list[tuple]:
+        """Declared checks (one scan per table) + FK coverage; rows in validation.RESULT_SCHEMA order."""
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        rows = []
+        for table, checks in validation.CHECKS.items():
+            scan = self.sql(validation.scan_sql(table, checks)).fetchone()
+            for i, check in enumerate(checks):
+                metric = scan[i + 1]
+                rows.append((run_id, table, check.name, check.kind, check.column, metric,
+                             None if check.threshold is None else float(check.threshold),
+                             check.severity, check.passed(metric), scan[0]))
+
+        for dim, key in {(f"{gold.GOLD_SCHEMA}.{d}", k) for fks in fk_coverage.FOREIGN_KEYS.values() for _, d, k in fks}:
+            self.sql(f"CACHE TABLE {fk_coverage.key_set_view(dim, key)} AS "
+                     f"SELECT DISTINCT {key} AS key FROM {dim} WHERE {key} IS NOT NULL")
+        for fact, fks in fk_coverage.FOREIGN_KEYS.items():
+            scan = self.sql(fk_coverage.coverage_sql(fact, fks)).fetchone()
+            for i, (col, _, _) in enumerate(fks):
+                missing = scan[1 + 2 * i] or 0
+                rows.append((run_id, fact, f"fk:{col}", "fk_coverage", col, float(missing), 0.0,
+                             "error", missing == 0, scan[0]))
+
+        self.sql(f"CREATE TABLE IF NOT EXISTS {validation.QA_RESULTS_TABLE} AS "
+                 f"SELECT *, current_timestamp() AS checked_at FROM (SELECT "
+                 f"NULL::VARCHAR run_id, NULL::VARCHAR table_name, NULL::VARCHAR check_name, "
+                 f"NULL::VARCHAR check_kind, NULL::VARCHAR column_name, NULL::DOUBLE metric, "
+                 f"NULL::DOUBLE threshold, NULL::VARCHAR severity, NULL::BOOLEAN passed, "
+                 f"NULL::BIGINT rows_scanned) WHERE false")
+        self.con.executemany(
+            f"INSERT INTO {self.name(validation.QA_RESULTS_TABLE)} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, current_timestamp)",
+            rows,
+        )
+        return rows
+
+    def run(self, source_path=None, mode="full") -> list[dict]:
+        """Bronze -> Silver -> Gold -> checks; returns the per-stage timings."""
+        self.timings = []
+        if source_path is not None:
+            self.load_source(source_path)
+        batch_id = self.ingest(mode)
+        self.build_silver(mode, batch_id)
+        self.build_gold()
+        self.build_aggregates()
+        self.build_retention()
+        self.results = self._timed("validations", self.validate, validation.QA_RESULTS_TABLE)
+        return self.timings
+
+    # -- Export ------------------------------------------------------------
+
+    def export(self, root, formats=("parquet",), tables=None,
+               target_file_bytes=export.TARGET_FILE_BYTES) -> list[dict]:
+        """Gold tables as Parquet + manifest, in the layout of :mod:`pipeline.export`.
+
+        There is no Delta version locally: files go to ``<root>/<table>/local``
+        and the manifest's ``source_version`` is None.
+        """
+        summary = []
+        for name in tables or export.GOLD_EXPORT_TABLES:
+            start = time.perf_counter()
+            table = self.name(f"{gold.GOLD_SCHEMA}.{name}")
+            out_dir = Path(root) / name / "local"
+            shutil.rmtree(out_dir, ignore_errors=True)
+            out_dir.parent.mkdir(parents=True, exist_ok=True)
+            self.con.execute(
+                f"COPY (SELECT * FROM {table}) TO '{out_dir}' (FORMAT parquet, "
+                f"COMPRESSION {export.COMPRESSION}, FILE_SIZE_BYTES {target_file_bytes}, FILENAME_PATTERN 'part-{{i}}')"
+            )
+            counts = dict(self.con.execute(
+                f"SELECT parse_filename(filename), COUNT(*) FROM read_parquet('{out_dir}/*.parquet', filename = true) "
+                "GROUP BY 1"
+            ).fetchall())
+            files = [export.file_entry(p, out_dir, counts.get(p.name, 0)) for p in sorted(out_dir.glob("part-*.parquet"))]
+            csv_file = None
+            if "csv" in formats:
+                self.con.execute(f"COPY (SELECT * FROM {table}) TO '{out_dir / name}.csv' (HEADER)")
+                csv_file = export.file_entry(out_dir / f"{name}.csv", out_dir)
+            schema = [{"name": c, "type": t.lower(), "nullable": n == "YES"}
+                      for c, t, n, *_ in self.con.execute(f"DESCRIBE {table}").fetchall()]
+            manifest = export.write_manifest(out_dir, name, f"{gold.GOLD_SCHEMA}.{name}", None, schema,
+                                             sum(counts.values()), files, csv_file)
+            summary.append({"table": table, "rows": manifest["rows"], "files": len(files),
+                            "bytes": sum(f["bytes"] for f in files),
+                            "seconds": round(time.perf_counter() - start, 3)})
+        return summary
+
+    # -- Parity with a Databricks export -----------------------------------
+
+    def compare(self, export_dir) -> list[dict]:
+        """Row-for-row diff of each Gold table against ``<export_dir>/<table>.csv``."""
+        diffs = []
+        for csv in sorted(Path(export_dir).glob("*.csv")):
+            table = f"{self.name(gold.GOLD_SCHEMA)}.{csv.stem.lower()}"
+            if csv.stem.lower() not in gold.GOLD_TABLES:
+                continue
+            types = self.con.execute(f"DESCRIBE {table}").fetchall()
+            columns = "{" + ", ".join(f"'{name}': '{dtype}'" for name, dtype, *_ in types) + "}"
+            ref = f"read_csv('{csv}', header = true, columns = {columns})"
+            local_only = self.con.execute(f"SELECT COUNT(*) FROM (FROM {table} EXCEPT ALL FROM {ref})").fetchone()[0]
+            export_only = self.con.execute(f"SELECT COUNT(*) FROM (FROM {ref} EXCEPT ALL FROM {table})").fetchone()[0]
+            diffs.append({"table": table, "local_only_rows": local_only, "export_only_rows": export_only})
+        return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the medallion pipeline locally on DuckDB.")
+    parser.add_argument("source", help="DataCo extract (.csv or .parquet, original column names)")
+    parser.add_argument("--db", default=":memory:", help="DuckDB database file")
+    parser.add_argument("--catalog", default=SPARK_CATALOG)
+    parser.add_argument("--mode", choices=("full", "incremental"), default="full")
+    parser.add_argument("--compare", help="directory of Gold CSV exports to diff against")
+    parser.add_argument("--export", help="write Parquet + manifests for every Gold table to this directory")
+    parser.add_argument("--export-csv", action="store_true", help="also write one CSV per table with --export")
+    args = parser.parse_args(argv)
+
+    pipe = LocalPipeline(args.db, args.catalog)
+    for row in pipe.run(args.source, args.mode):
+        print(f"{row['stage']:<28} {row['seconds']:>8.3f}s")
+    for row in pipe.results:
+        if row[7] == "error" and not row[8]:
+            print("FAILED CHECK:", row[1], row[2], row[5])
+    if args.compare:
+        for diff in pipe.compare(args.compare):
+            print(diff)
+    if args.export:
+        for row in pipe.export(args.export, ("parquet", "csv") if args.export_csv else ("parquet",)):
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
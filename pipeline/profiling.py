@@ -0,0 +1,286 @@
+"""Per-batch column profiles, merged into table profiles without rescanning.
+
+The data-quality reports (``docs/06``, ``docs/09``) come from exact queries over
+whole tables, so each refresh rescans every batch ever loaded. Here every
+``_batch_id`` of an append-only table is profiled once, in one aggregate scan
+of that batch's rows, into ``PROFILE_TABLE`` (one row per batch and column):
+
+* ``rows``, ``nulls``, ``empties`` (blank strings), ``replacement_chars``
+  (values containing ``�``): counts, merged by summing;
+* ``min_value`` / ``max_value``: merged by min/max;
+* ``hll``: a HyperLogLog sketch (``hll_sketch_agg``), merged with
+  ``hll_union_agg`` into a distinct-count estimate;
+* ``quantiles``: numeric columns only, the values at ``PROBS`` (``approx_percentile``),
+  merged by :func:`merge_quantiles` (rows-weighted average of the batches' CDFs).
+
+:func:`table_profile` merges any set of batches this way, and
+:func:`profile_new_batches` profiles the batches not profiled yet and compares
+each with the merged profile of the earlier ones (null and ``�`` rate, median),
+logging the comparisons as ``warn`` checks in the QA results table. Cost
+follows the new batches; the comparison reads only the profile table.
+
+Only append-only tables can be profiled per batch: Silver MERGEs a re-sent
+row into a later batch, which would leave it counted under both.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from pipeline.sqlfiles import quote_literal
+from pipeline.validation import QA_RESULTS_TABLE, record_results
+
+PROFILE_TABLE = "workspace.ops.column_profiles"
+BRONZE_AUDITED_TABLE = "workspace.bronze.dataco_supplychain_raw_audited"
+PROFILED_TABLES = (BRONZE_AUDITED_TABLE,)
+BATCH_COLUMN = "_batch_id"
+
+PROBS = [i / 100 for i in range(101)]
+QUANTILE_ACCURACY = 10000  # approx_percentile accuracy: rank error ~1/accuracy
+
+# A batch whose rate differs from the earlier batches' by more than this is reported (warn)
+MAX_NULL_RATE_DELTA = 0.05
+MAX_REPLACEMENT_RATE_DELTA = 0.01
+# ... or whose median moved by more than this share of the earlier p05-p95 range
+MAX_MEDIAN_SHIFT = 0.25
+
+PROFILE_SCHEMA = (
+    "table_name STRING, batch_id STRING, column_name STRING, data_type STRING, rows BIGINT, nulls BIGINT, "
+    "empties BIGINT, replacement_chars BIGINT, min_value STRING, max_value STRING, hll BINARY, "
+    "quantiles ARRAY<DOUBLE>, run_id STRING"
+)
+
+_NUMERIC = ("tinyint", "smallint", "int", "bigint", "float", "double", "decimal")
+_INTEGRAL = ("tinyint", "smallint", "int", "bigint")
+
+
+def _is_numeric(data_type: str) -> bool:
+    return data_type.split("(")[0] in _NUMERIC
+
+
+def _profiled_columns(spark, table: str) -> list:
+    """``[(column, type)]`` of ``table`` that get a profile (atomic types, not the batch column)."""
+    return [
+        (f.name, f.dataType.simpleString()) for f in spark.table(table).schema.fields
+        if f.name != BATCH_COLUMN and not f.dataType.simpleString().startswith(("array", "map", "struct"))
+    ]
+
+
+def _column_aggregates(i: int, name: str, data_type: str) -> list:
+    col = f"`{name}`"
+    base = data_type.split("(")[0]
+    hashed = f"CAST({col} AS BIGINT)" if base in _INTEGRAL else f"CAST({col} AS STRING)"
+    aggs = [
+        f"SUM(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END) AS c{i}_nulls",
+        f"CAST(MIN({col}) AS STRING) AS c{i}_min",
+        f"CAST(MAX({col}) AS STRING) AS c{i}_max",
+        f"hll_sketch_agg({hashed}) AS c{i}_hll",
+    ]
+    if base == "string":
+        aggs += [
+            f"SUM(CASE WHEN trim({col}) = '' THEN 1 ELSE 0 END) AS c{i}_empties",
+            f"SUM(CASE WHEN {col} LIKE '%�%' THEN 1 ELSE 0 END) AS c{i}_replacement_chars",
+        ]
+    if _is_numeric(data_type):
+        probs = ", ".join(str(p) for p in PROBS)
+        aggs.append(f"approx_percentile(CAST({col} AS DOUBLE), array({probs}), {QUANTILE_ACCURACY}) AS c{i}_quantiles")
+    return aggs
+
+
+def profile_sql(table: str, columns: list, batch_ids: list) -> str:
+    """One scan of ``batch_ids`` in ``table``: one row per batch, every column's aggregates."""
+    aggs = [agg for i, (name, data_type) in enumerate(columns) for agg in _column_aggregates(i, name, data_type)]
+    batches = ", ".join(quote_literal(b) for b in batch_ids)
+    return (f"SELECT {BATCH_COLUMN}, COUNT(*) AS rows,\n  " + ",\n  ".join(aggs)
+            + f"\nFROM {table}\nWHERE {BATCH_COLUMN} IN ({batches})\nGROUP BY {BATCH_COLUMN}")
+
+
+def _ensure_table(spark, profile_table: str):
+    spark.sql(f"CREATE SCHEMA IF NOT EXISTS {profile_table.rsplit('.', 1)[0]}")
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {profile_table} (
+      table_name        STRING,
+      batch_id          STRING,
+      column_name       STRING,
+      data_type         STRING,
+      rows              BIGINT,
+      nulls             BIGINT,
+      empties           BIGINT,
+      replacement_chars BIGINT,
+      min_value         STRING,
+      max_value         STRING,
+      hll               BINARY,
+      quantiles         ARRAY<DOUBLE>,
+      run_id            STRING,
+      profiled_at       TIMESTAMP
+    ) USING delta
+    """)
+
+
+def new_batches(spark, table: str, profile_table=PROFILE_TABLE) -> list:
+    """``_batch_id`` values of ``table`` with no profile yet."""
+    _ensure_table(spark, profile_table)
+    profiled = spark.table(profile_table).where(f"table_name = {quote_literal(table)}").select("batch_id")
+    batches = spark.table(table).select(BATCH_COLUMN).distinct()
+    return sorted(r[0] for r in batches.join(profiled, batches[BATCH_COLUMN] == profiled["batch_id"], "left_anti")
+                  .collect() if r[0] is not None)
+
+
+def profile_batches(spark, table: str, batch_ids: list, run_id=None, profile_table=PROFILE_TABLE) -> int:
+    """Profile ``batch_ids`` of ``table`` (one scan) and append to ``profile_table``; returns profile rows."""
+    if not batch_ids:
+        return 0
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    columns = _profiled_columns(spark, table)
+    rows = []
+    for row in spark.sql(profile_sql(table, columns, batch_ids)).collect():
+        batch = row.asDict()
+        for i, (name, data_type) in enumerate(columns):
+            quantiles = batch.get(f"c{i}_quantiles")
+            rows.append((
+                table, batch[BATCH_COLUMN], name, data_type, batch["rows"], batch[f"c{i}_nulls"],
+                batch.get(f"c{i}_empties"), batch.get(f"c{i}_replacement_chars"),
+                batch[f"c{i}_min"], batch[f"c{i}_max"], batch[f"c{i}_hll"],
+                [float(q) for q in quantiles] if quantiles else None, run_id,
+            ))
+    _ensure_table(spark, profile_table)
+    (
+        spark.createDataFrame(rows, PROFILE_SCHEMA)
+        .selectExpr("*", "current_timestamp() AS profiled_at")
+        .write.format("delta").mode("append").saveAsTable(profile_table)
+    )
+    return len(rows)
+
+
+def merge_quantiles(summaries: list, probs=PROBS) -> list:
+    """Quantiles at ``probs`` of the union of batches, from ``(rows, quantiles at PROBS)`` per batch.
+
+    Each batch's quantiles give a piecewise-linear CDF; the union's CDF is their
+    rows-weighted average, built in one sweep over the breakpoints and inverted
+    at ``probs``. Tied quantiles (a value repeated across ranks) are a jump.
+    """
+    summaries = [(n, q) for n, q in summaries if n and q]
+    if not summaries:
+        return None
+    total = sum(n for n, _ in summaries)
+    slopes, jumps = {}, {}
+    for n, q in summaries:
+        for k in range(len(q) - 1):
+            mass = n * (PROBS[k + 1] - PROBS[k]) / total
+            if q[k + 1] > q[k]:
+                slope = mass / (q[k + 1] - q[k])
+                slopes[q[k]] = slopes.get(q[k], 0.0) + slope
+                slopes[q[k + 1]] = slopes.get(q[k + 1], 0.0) - slope
+            else:
+                jumps[q[k]] = jumps.get(q[k], 0.0) + mass
+
+    points, cdfs = [], []  # the union's CDF: linear between consecutive points
+    value = slope = 0.0
+    previous = None
+    for x in sorted(slopes.keys() | jumps.keys()):
+        value += slope * (x - previous) if previous is not None else 0.0
+        points.append(x)
+        cdfs.append(value)
+        if x in jumps:
+            value += jumps[x]
+            points.append(x)
+            cdfs.append(value)
+        slope += slopes.get(x, 0.0)
+        previous = x
+    cdfs[-1] = 1.0  # the sweep accumulates rounding; the last breakpoint is the union's max
+
+    merged = []
+    for p in probs:
+        j = min(bisect_left(cdfs, p - 1e-12), len(points) - 1)
+        if j == 0 or cdfs[j] == cdfs[j - 1]:
+            merged.append(points[j])
+        else:
+            merged.append(points[j - 1] + (points[j] - points[j - 1]) * (p - cdfs[j - 1]) / (cdfs[j] - cdfs[j - 1]))
+    return merged
+
+
+def _rate(batches: list, count: str, rows: int):
+    """Share of ``rows`` counted in ``count``; None for columns without that count (non-strings)."""
+    counts = [b[count] for b in batches if b[count] is not None]
+    return sum(counts) / rows if counts and rows else None
+
+
+def _merge(column: str, data_type: str, distinct_count, batches: list) -> dict:
+    numeric = _is_numeric(data_type)
+    key = float if numeric else str
+    mins = [b["min_value"] for b in batches if b["min_value"] is not None]
+    maxs = [b["max_value"] for b in batches if b["max_value"] is not None]
+    rows = sum(b["rows"] for b in batches)
+    nulls = sum(b["nulls"] for b in batches)
+    return {
+        "column_name": column, "data_type": data_type, "batches": len(batches), "rows": rows,
+        "null_rate": nulls / rows if rows else None,
+        "empty_rate": _rate(batches, "empties", rows),
+        "replacement_rate": _rate(batches, "replacement_chars", rows),
+        "distinct_count": distinct_count,
+        "min_value": min(mins, key=key) if mins else None,
+        "max_value": max(maxs, key=key) if maxs else None,
+        "quantiles": merge_quantiles([(b["rows"] - b["nulls"], b["quantiles"]) for b in batches]) if numeric else None,
+    }
+
+
+def table_profile(spark, table: str, batch_ids=None, exclude=(), profile_table=PROFILE_TABLE) -> list[dict]:
+    """Profile of ``table`` over ``batch_ids`` (default: every profiled batch) minus ``exclude``,
+    merged from the stored batch profiles; one dict per column."""
+    where = [f"table_name = {quote_literal(table)}"]
+    if batch_ids is not None:
+        where.append(f"batch_id IN ({', '.join(quote_literal(b) for b in batch_ids) or 'NULL'})")
+    if exclude:
+        where.append(f"batch_id NOT IN ({', '.join(quote_literal(b) for b in exclude)})")
+    rows = spark.sql(f"""
+    SELECT
+      column_name, data_type,
+      hll_sketch_estimate(hll_union_agg(hll, true)) AS distinct_count,
+      collect_list(struct(rows, nulls, empties, replacement_chars, min_value, max_value, quantiles)) AS batches
+    FROM {profile_table}
+    WHERE {' AND '.join(where)}
+    GROUP BY column_name, data_type
+    """).collect()
+    return [_merge(r["column_name"], r["data_type"], r["distinct_count"], r["batches"]) for r in rows]
+
+
+def drift_rows(table: str, batch: dict, history: dict, run_id: str) -> list:
+    """QA result rows (RESULT_SCHEMA) comparing one column of a batch with its history."""
+    column, rows = batch["column_name"], batch["rows"]
+    out = []
+
+    def check(kind, metric, threshold):
+        out.append((run_id, table, f"{kind}:{column}", kind, column, metric, threshold, "warn",
+                    metric is None or metric <= threshold, rows))
+
+    check("null_rate_drift", abs(batch["null_rate"] - history["null_rate"]), MAX_NULL_RATE_DELTA)
+    if batch["replacement_rate"] is not None and history["replacement_rate"] is not None:
+        check("replacement_rate_drift", abs(batch["replacement_rate"] - history["replacement_rate"]),
+              MAX_REPLACEMENT_RATE_DELTA)
+    if batch["quantiles"] and history["quantiles"]:
+        spread = history["quantiles"][95] - history["quantiles"][5]
+        shift = abs(batch["quantiles"][50] - history["quantiles"][50])
+        check("median_drift", shift / spread if spread else float(shift > 0), MAX_MEDIAN_SHIFT)
+    return out
+
+
+def profile_new_batches(spark, tables=PROFILED_TABLES, run_id=None, profile_table=PROFILE_TABLE,
+                        results_table=QA_RESULTS_TABLE):
+    """Profile every batch of ``tables`` not profiled yet and check each against the earlier batches.
+
+    The drift checks are appended to ``results_table`` (severity ``warn``);
+    returns them as a DataFrame (None when there was nothing new).
+    """
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    qa_rows = []
+    for table in tables:
+        batch_ids = new_batches(spark, table, profile_table)
+        profile_batches(spark, table, batch_ids, run_id, profile_table)
+        history = {p["column_name"]: p for p in table_profile(spark, table, exclude=batch_ids,
+                                                              profile_table=profile_table)}
+        if not history:  # first profiled load: nothing to compare with
+            continue
+        for batch_id in batch_ids:
+            for column in table_profile(spark, table, [batch_id], profile_table=profile_table):
+                if column["column_name"] in history and column["rows"]:
+                    qa_rows += drift_rows(table, column, history[column["column_name"]], run_id)
+    return record_results(spark, qa_rows, results_table) if qa_rows else None
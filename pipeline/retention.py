@@ -0,0 +1,248 @@
+"""Customer cohort and retention tables, updated from the new fact rows only.
+
+The Customer Retention page derives every customer's first-order month and
+monthly activity from the full fact on each refresh. Three Gold tables keep
+that state instead (qualifying orders only: cancelled and suspected-fraud
+orders do not count as a purchase, see KPI C3 in ``docs/02_kpi_glossary.md``):
+
+* ``customer_monthly_activity``: one row per customer and month they ordered in;
+* ``customer_first_order``: first order date and cohort month per customer;
+* ``cohort_retention``: cohort month x activity month, with the cohort size,
+  active customers and retention rate (the page's cohort table).
+
+A refresh reads the change data feed of ``fact_sales`` since the version the
+tables were last built from (``ops.build_state``) and takes the (customer,
+month) pairs the changes touch. Only those pairs are recomputed from the fact,
+restricted to the touched months so the fact's clustering on
+``order_date_key`` skips everything else. The touched customers' first orders
+are then re-derived from their activity, and only the cohorts those customers
+left or joined are recomputed in the matrix. A late-arriving older order
+moves its customer to an earlier cohort; both cohorts are recomputed.
+
+Without a previous build, after an SQL change, or when the feed does not cover
+the range, the three tables are rebuilt from the fact.
+"""
+
+import logging
+import time
+
+from pipeline.aggregates import is_change_feed_gap
+from pipeline.build_state import last_build, record_builds, sql_hash, table_versions
+from pipeline.instrumentation import current_run_id, track
+
+logger = logging.getLogger(__name__)
+
+GOLD_SCHEMA = "workspace.gold"
+FACT = "fact_sales"
+ACTIVITY = "customer_monthly_activity"
+FIRST_ORDER = "customer_first_order"
+COHORTS = "cohort_retention"
+
+# Key of each table (MERGE condition, and the change export's key)
+RETENTION_KEYS = {
+    ACTIVITY: ("customer_id", "activity_month"),
+    FIRST_ORDER: ("customer_id",),
+    COHORTS: ("cohort_month", "activity_month"),
+}
+
+QUALIFYING = "f.order_status NOT IN ('CANCELED', 'SUSPECTED_FRAUD')"
+_MONTH = "CAST(FLOOR(f.order_date_key / 100) AS INT)"  # yyyyMMdd -> yyyyMM
+
+
+def _month_index(col: str) -> str:
+    return f"(CAST(FLOOR({col} / 100) AS INT) * 12 + {col} % 100)"
+
+
+def activity_sql(gold_schema=GOLD_SCHEMA, where="") -> str:
+    return f"""
+SELECT
+  f.customer_id,
+  {_MONTH}                    AS activity_month,
+  MIN(f.order_date_key)       AS first_order_date_key,
+  COUNT(DISTINCT f.order_id)  AS orders,
+  SUM(f.net_sales)            AS net_sales
+FROM {gold_schema}.{FACT} f
+WHERE f.customer_id IS NOT NULL AND f.order_date_key IS NOT NULL AND {QUALIFYING} {where}
+GROUP BY f.customer_id, {_MONTH}"""
+
+
+def first_order_sql(gold_schema=GOLD_SCHEMA, where="") -> str:
+    return f"""
+SELECT
+  a.customer_id,
+  MIN(a.first_order_date_key) AS first_order_date_key,
+  MIN(a.activity_month)       AS cohort_month,
+  COUNT(*)                    AS active_months
+FROM {gold_schema}.{ACTIVITY} a
+{where}
+GROUP BY a.customer_id"""
+
+
+def cohorts_sql(gold_schema=GOLD_SCHEMA, cohort_months=None) -> str:
+    where = "" if cohort_months is None else f"WHERE cohort_month IN ({', '.join(str(int(m)) for m in cohort_months)})"
+    return f"""
+WITH cohort AS (
+  SELECT customer_id, cohort_month FROM {gold_schema}.{FIRST_ORDER} {where}
+),
+sizes AS (
+  SELECT cohort_month, COUNT(*) AS cohort_customers FROM cohort GROUP BY cohort_month
+)
+SELECT
+  c.cohort_month,
+  a.activity_month,
+  {_month_index('a.activity_month')} - {_month_index('c.cohort_month')} AS months_since_first,
+  s.cohort_customers,
+  COUNT(*)                                          AS active_customers,
+  CAST(COUNT(*) AS DOUBLE) / s.cohort_customers     AS retention_rate
+FROM cohort c
+JOIN {gold_schema}.{ACTIVITY} a ON a.customer_id = c.customer_id
+JOIN sizes s ON s.cohort_month = c.cohort_month
+GROUP BY c.cohort_month, a.activity_month, s.cohort_customers"""
+
+
+def full_sql(gold_schema=GOLD_SCHEMA) -> dict:
+    """``{table: SELECT}`` over everything, in build order."""
+    return {ACTIVITY: activity_sql(gold_schema), FIRST_ORDER: first_order_sql(gold_schema),
+            COHORTS: cohorts_sql(gold_schema)}
+
+
+def sync_sql(target: str, recomputed_sql: str, scope_view: str, keys: tuple, columns: list) -> str:
+    """MERGE ``recomputed_sql`` into ``target`` for the ``keys`` in ``scope_view``:
+    update changed rows, insert new ones, delete keys no longer produced."""
+    on = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+    scope_on = " AND ".join(f"r.{k} = x.{k}" for k in keys)
+    values = [c for c in columns if c not in keys]
+    changed = "\n     OR ".join(f"NOT (t.{c} <=> s.{c})" for c in values)
+    return f"""
+MERGE INTO {target} t
+USING (
+  SELECT {', '.join(f'x.{k}' for k in keys)}, {', '.join(f'r.{c}' for c in values)}, r.{values[0]} IS NOT NULL AS _present
+  FROM {scope_view} x LEFT JOIN ({recomputed_sql}) r ON {scope_on}
+) s
+ON {on}
+WHEN MATCHED AND NOT s._present THEN DELETE
+WHEN MATCHED AND ({changed}) THEN UPDATE SET {', '.join(f'{c} = s.{c}' for c in values)}
+WHEN NOT MATCHED AND s._present THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f's.{c}' for c in columns)})"""
+
+
+def _months_filter(months) -> str:
+    """Order-date ranges of ``months`` (yyyyMM), so the fact scan skips other files."""
+    return "(" + " OR ".join(f"f.order_date_key BETWEEN {m * 100} AND {m * 100 + 99}" for m in months) + ")"
+
+
+def _cohorts_of(spark, first_order: str, touched_view: str) -> set:
+    rows = spark.sql(
+        f"SELECT DISTINCT cohort_month FROM {first_order} WHERE customer_id IN (SELECT customer_id FROM {touched_view})"
+    ).collect()
+    return {r[0] for r in rows}
+
+
+def _touched_pairs(spark, fact: str, start: int, end: int):
+    """Cached ``(customer_id, activity_month)`` pairs of the commits ``start``..``end`` of ``fact``.
+
+    The change feed is read here, so a range it does not cover fails before any MERGE.
+    """
+    touched = spark.sql(f"""
+    SELECT DISTINCT f.customer_id, {_MONTH} AS activity_month
+    FROM table_changes('{fact}', {start}, {end}) f
+    WHERE f.customer_id IS NOT NULL AND f.order_date_key IS NOT NULL
+    """).cache()
+    try:
+        touched.count()
+    except Exception:
+        touched.unpersist()
+        raise
+    return touched
+
+
+def _incremental(spark, gold_schema: str, touched) -> dict:
+    """Apply the ``touched`` customer-months (:func:`_touched_pairs`); returns rows touched per step."""
+    activity, first_order, cohorts = (f"{gold_schema}.{t}" for t in (ACTIVITY, FIRST_ORDER, COHORTS))
+    touched.createOrReplaceTempView("retention_touched_pairs")
+    spark.table("retention_touched_pairs").select("customer_id").distinct().createOrReplaceTempView(
+        "retention_touched_customers")
+    try:
+        months = sorted(r[0] for r in touched.select("activity_month").distinct().collect())
+        if not months:
+            return {"pairs": 0, "customers": 0, "cohorts": 0}
+
+        recomputed = activity_sql(
+            gold_schema,
+            f"AND {_months_filter(months)} AND f.customer_id IN (SELECT customer_id FROM retention_touched_customers)",
+        )
+        sql_text = sync_sql(activity, recomputed, "retention_touched_pairs", RETENTION_KEYS[ACTIVITY],
+                            spark.table(activity).columns)
+        with track(spark, f"gold.{ACTIVITY}", activity) as write:
+            write.sql(sql_text)
+
+        affected = _cohorts_of(spark, first_order, "retention_touched_customers")
+        recomputed = first_order_sql(
+            gold_schema, "WHERE a.customer_id IN (SELECT customer_id FROM retention_touched_customers)")
+        sql_text = sync_sql(first_order, recomputed, "retention_touched_customers", RETENTION_KEYS[FIRST_ORDER],
+                            spark.table(first_order).columns)
+        with track(spark, f"gold.{FIRST_ORDER}", first_order) as write:
+            write.sql(sql_text)
+        affected |= _cohorts_of(spark, first_order, "retention_touched_customers")
+
+        if not affected:  # only non-qualifying orders changed
+            return {"pairs": touched.count(), "customers": 0, "cohorts": 0}
+        cohort_list = ", ".join(str(int(m)) for m in sorted(affected))
+        sql_text = f"""
+        MERGE INTO {cohorts} t
+        USING ({cohorts_sql(gold_schema, sorted(affected))}) s
+        ON t.cohort_month = s.cohort_month AND t.activity_month = s.activity_month
+        WHEN MATCHED AND (NOT (t.active_customers <=> s.active_customers)
+                          OR NOT (t.cohort_customers <=> s.cohort_customers)) THEN UPDATE SET *
+        WHEN NOT MATCHED THEN INSERT *
+        WHEN NOT MATCHED BY SOURCE AND t.cohort_month IN ({cohort_list}) THEN DELETE
+        """
+        with track(spark, f"gold.{COHORTS}", cohorts) as write:
+            write.sql(sql_text)
+        return {"pairs": touched.count(), "customers": spark.table("retention_touched_customers").count(),
+                "cohorts": len(affected)}
+    finally:
+        spark.catalog.dropTempView("retention_touched_customers")
+        spark.catalog.dropTempView("retention_touched_pairs")
+        touched.unpersist()
+
+
+def refresh_retention(spark, gold_schema=GOLD_SCHEMA, force=False) -> list[dict]:
+    """Bring the retention tables up to date with ``fact_sales``; one ``{"table", "seconds", "status"}`` row each."""
+    start = time.perf_counter()
+    fact = f"{gold_schema}.{FACT}"
+    targets = {name: f"{gold_schema}.{name}" for name in RETENTION_KEYS}
+    sql_texts = full_sql(gold_schema)
+    versions = table_versions(spark, [fact])
+    lasts = {name: None if force else last_build(spark, target) for name, target in targets.items()}
+
+    previous = {(last or {}).get("input_versions", {}).get(fact) for last in lasts.values()}
+    in_sync = (
+        None not in lasts.values() and versions[fact] is not None and len(previous) == 1
+        and all(lasts[n]["sql_hash"] == sql_hash(sql_texts[n])
+                and table_versions(spark, [t]).get(t) == lasts[n]["output_version"] for n, t in targets.items())
+    )
+    status = "rebuilt"
+    if in_sync:
+        (previous,) = previous
+        if previous == versions[fact]:
+            return [{"table": t, "seconds": 0.0, "status": "skipped"} for t in targets.values()]
+        try:
+            touched = _touched_pairs(spark, fact, previous + 1, versions[fact])
+        except Exception as exc:  # noqa: BLE001 - only a gap in the feed falls back to a rebuild
+            if not is_change_feed_gap(exc):
+                raise
+            logger.warning("No change feed for %s v%s-v%s, rebuilding retention: %s",
+                           fact, previous + 1, versions[fact], exc)
+        else:
+            counts = _incremental(spark, gold_schema, touched)
+            status = f"merged ({counts['pairs']} customer-months, {counts['cohorts']} cohorts)"
+    if status == "rebuilt":
+        for name, select_sql in sql_texts.items():
+            sql_text = (f"CREATE OR REPLACE TABLE {targets[name]} USING delta "
+                        f"TBLPROPERTIES (delta.enableChangeDataFeed = true) AS {select_sql}")
+            with track(spark, f"gold.{name}", targets[name]) as write:
+                write.sql(sql_text)
+
+    record_builds(spark, [(targets[n], sql_texts[n], versions) for n in targets], current_run_id())
+    seconds = round(time.perf_counter() - start, 3)
+    return [{"table": t, "seconds": seconds, "status": status} for t in targets.values()]
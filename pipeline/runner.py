@@ -0,0 +1,405 @@
+"""Dependency-aware runner for the notebooks and SQL scripts of the pipeline.
+
+Every notebook is one node and every statement of a SQL script is one node.
+Table reads and writes are inferred from the SQL text (and, for notebooks, from
+``spark.table`` / ``saveAsTable`` calls and the table names passed to the
+``pipeline`` helpers), and a node waits only for the nodes that last wrote what
+it reads or writes. Independent nodes, e.g. the Gold dimension builds, run
+concurrently from a thread pool against one Spark session.
+
+SQL table writes (and the writes inside the notebooks) are recorded in
+``ops.pipeline_runs`` under one run id. Completed nodes are recorded in a state
+file, so a failed run can be resumed without repeating the nodes that already
+succeeded::
+
+    python -m pipeline.runner --dry-run      # print the plan, run nothing
+    python -m pipeline.runner --resume       # skip nodes done by the last run
+    python -m pipeline.runner --force        # rebuild tables whose inputs are unchanged
+"""
+
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pipeline.build_state import is_current, record_builds
+from pipeline.instrumentation import current_run_id, start_run, track
+from pipeline.sqlfiles import REPO_ROOT, read_statements
+
+DEFAULT_CATALOG = "workspace"
+
+# Run order; it only matters where two nodes write the same table (the later one wins)
+PIPELINE = [
+    "notebooks/02_bronze_create_clean_names.py",
+    "notebooks/01_bronze_ingest_dataco.py",
+    "notebooks/03_silver_clean_dataco.py.py",
+    "notebooks/04_gold_star_schema_dataco.py",
+    "notebooks/05_gold_quality_gate.py",
+]
+
+STATE_PATH = REPO_ROOT / ".pipeline_state.json"
+
+_NAME = r"(`?\w+`?(?:\.`?\w+`?){0,2})"
+_SCHEMA_WRITE = re.compile(rf"\bCREATE\s+(?:SCHEMA|DATABASE)\s+(?:IF\s+NOT\s+EXISTS\s+)?{_NAME}", re.I)
+_TABLE_WRITES = [
+    re.compile(rf"\bCREATE\s+(?:OR\s+REPLACE\s+)?(?:TABLE|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?{_NAME}", re.I),
+    re.compile(rf"\bINSERT\s+(?:INTO|OVERWRITE)\s+(?:TABLE\s+)?{_NAME}", re.I),
+    re.compile(rf"\b(?:MERGE\s+INTO|DELETE\s+FROM|UPDATE|TRUNCATE\s+TABLE|ALTER\s+TABLE|OPTIMIZE)\s+{_NAME}", re.I),
+    re.compile(rf"\bDROP\s+(?:TABLE|VIEW)\s+(?:IF\s+EXISTS\s+)?{_NAME}", re.I),
+]
+_TABLE_READ = re.compile(rf"\b(?:FROM|JOIN|USING)\s+{_NAME}", re.I)
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_TABLE_NAME = re.compile(r"^\w+(?:\.\w+){1,2}$")
+
+# pipeline helpers whose table arguments are written rather than read
+_WRITE_ARGS = {"saveAsTable": (0,), "upsert_sql": (0,), "debug_views_sql": (1, 2), "track": (2,)}
+_UNTRACKED = re.compile(r"^\s*(?:DROP|CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP(?:ORARY)?\s+)?VIEW)\b", re.I)
+
+# Failures that fail the same way on every attempt: bad SQL, missing tables or
+# columns, and the checks the notebooks raise themselves (schema drift, quality gate)
+_DETERMINISTIC = (RuntimeError, ValueError, TypeError, KeyError, NameError, SyntaxError, AssertionError)
+_DETERMINISTIC_SPARK = {"AnalysisException", "ParseException"}
+
+
+def _normalise(name: str, parts: int = 3):
+    """Fully qualified, lower-case name; None for unqualified (temp view/CTE) names."""
+    name = name.replace("`", "").lower()
+    depth = name.count(".") + 1
+    if parts == 3 and depth == 1:
+        return None
+    if depth < parts:
+        name = f"{DEFAULT_CATALOG}.{name}"
+    return name
+
+
+def sql_io(sql_text: str) -> tuple[set, set]:
+    """(tables and schemas read, tables and schemas written) by ``sql_text``."""
+    text = _COMMENTS.sub(" ", sql_text)
+    writes = {_normalise(m, parts=2) for m in _SCHEMA_WRITE.findall(text)}
+    for pattern in _TABLE_WRITES:
+        writes |= {_normalise(m) for m in pattern.findall(text)}
+    reads = {_normalise(m) for m in _TABLE_READ.findall(text)}
+    writes.discard(None)
+    reads.discard(None)
+    return reads - writes, writes
+
+
+def _imported_constants(node: ast.ImportFrom) -> dict:
+    if not (node.module or "").startswith("pipeline"):
+        return {}
+    try:
+        module = importlib.import_module(node.module)
+    except ImportError:
+        return {}
+    return {
+        alias.asname or alias.name: getattr(module, alias.name)
+        for alias in node.names
+        if isinstance(getattr(module, alias.name, None), str)
+    }
+
+
+def notebook_io(path) -> tuple[set, set]:
+    """(reads, writes) of a notebook, from its SQL strings and table-name arguments."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+
+    consts = {}
+    for stmt in tree.body:
+        if isinstance(stmt, ast.ImportFrom):
+            consts.update(_imported_constants(stmt))
+        elif isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Constant):
+            if isinstance(stmt.value.value, str):
+                consts.update({t.id: stmt.value.value for t in stmt.targets if isinstance(t, ast.Name)})
+
+    def resolve(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return consts.get(node.id)
+        return None
+
+    def render(node: ast.JoinedStr) -> str:
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                parts.append(resolve(value.value) or "__expr__")
+            else:
+                parts.append(str(value.value))
+        return "".join(parts)
+
+    # Literal pieces of f-strings are read through render(), not on their own
+    fstring_parts = {id(v) for n in ast.walk(tree) if isinstance(n, ast.JoinedStr) for v in n.values}
+
+    reads, writes = set(), set()
+    for node in ast.walk(tree):
+        text = render(node) if isinstance(node, ast.JoinedStr) else None
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in fstring_parts:
+            text = node.value
+        if text:
+            r, w = sql_io(text)
+            reads |= r
+            writes |= w
+        if not isinstance(node, ast.Call):
+            continue
+
+        func = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", "")
+        args = [resolve(a) for a in node.args]
+        if func == "run_script" and len(args) > 1 and args[1]:
+            for stmt in read_statements(args[1]):
+                r, w = sql_io(stmt)
+                reads |= r
+                writes |= w
+        elif func == "build_gold":
+            gold = importlib.import_module("pipeline.gold")
+            reads |= {_normalise(gold.SILVER_TABLE), _normalise(gold.BRONZE_TABLE)}
+            writes |= {_normalise(f"{gold.GOLD_SCHEMA}.{t}") for t in gold.GOLD_TABLES}
+        elif func == "refresh_aggregates":
+            aggregates = importlib.import_module("pipeline.aggregates")
+            for name, agg in aggregates.AGGREGATES.items():
+                reads |= {_normalise(t) for t in agg.inputs()}
+                writes.add(_normalise(f"{aggregates.GOLD_SCHEMA}.{name}"))
+        elif func == "refresh_retention":
+            retention = importlib.import_module("pipeline.retention")
+            reads.add(_normalise(f"{retention.GOLD_SCHEMA}.{retention.FACT}"))
+            writes |= {_normalise(f"{retention.GOLD_SCHEMA}.{t}") for t in retention.RETENTION_KEYS}
+        elif func == "run_validations":
+            checks = importlib.import_module("pipeline.validation")
+            tables = checks.CHECKS
+            if len(node.args) > 1 and isinstance(node.args[1], ast.Dict):
+                tables = [resolve(k) for k in node.args[1].keys if resolve(k)]
+            reads |= {_normalise(t) for t in tables}
+            writes.add(_normalise(checks.QA_RESULTS_TABLE))
+        elif func == "run_fk_checks":
+            fks = importlib.import_module("pipeline.fk_coverage")
+            reads |= {_normalise(t) for t in fks.FOREIGN_KEYS}
+            reads |= {_normalise(f"{fks.GOLD_SCHEMA}.{dim}") for v in fks.FOREIGN_KEYS.values() for _, dim, _ in v}
+            writes.add(_normalise(fks.QA_RESULTS_TABLE))
+        for i, arg in enumerate(args):
+            if arg and _TABLE_NAME.match(arg):
+                (writes if i in _WRITE_ARGS.get(func, ()) else reads).add(_normalise(arg))
+
+    return reads - writes, writes
+
+
+@dataclass
+class Node:
+    id: str
+    kind: str  # "sql" | "notebook"
+    source: str  # statement text, or notebook path
+    reads: set
+    writes: set
+    deps: set = field(default_factory=set)
+
+    @property
+    def fingerprint(self) -> str:
+        text = self.source if self.kind == "sql" else Path(self.source).read_text(encoding="utf-8")
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_nodes(paths=PIPELINE) -> list[Node]:
+    """Nodes for ``paths`` (relative to the repo root), in run order, with deps resolved."""
+    nodes = []
+    for rel in paths:
+        path = REPO_ROOT / rel
+        if path.suffix == ".sql":
+            for i, stmt in enumerate(read_statements(path), start=1):
+                reads, writes = sql_io(stmt)
+                nodes.append(Node(f"{rel}#{i:02d}", "sql", stmt, reads, writes))
+        else:
+            reads, writes = notebook_io(path)
+            nodes.append(Node(rel, "notebook", str(path), reads, writes))
+
+    # A node depends on the last earlier writer of anything it touches (and of the
+    # schema it writes into), and a writer also waits for earlier readers of its output
+    last_writer, readers = {}, {}
+    for node in nodes:
+        touched = node.reads | node.writes
+        touched |= {t.rsplit(".", 1)[0] for t in node.writes if t.count(".") == 2}
+        node.deps = {last_writer[t] for t in touched if t in last_writer}
+        for t in node.writes:
+            node.deps |= readers.pop(t, set())
+        node.deps.discard(node.id)
+        for t in node.reads:
+            readers.setdefault(t, set()).add(node.id)
+        for t in node.writes:
+            last_writer[t] = node.id
+    return nodes
+
+
+def plan(nodes: list[Node]) -> list[dict]:
+    """Dry-run view: nodes grouped into waves that can run concurrently."""
+    wave = {}
+    for node in nodes:  # deps always point to earlier nodes
+        wave[node.id] = 1 + max((wave[d] for d in node.deps), default=-1)
+    return [
+        {
+            "wave": wave[n.id],
+            "node": n.id,
+            "writes": ", ".join(sorted(n.writes)),
+            "reads": ", ".join(sorted(n.reads)),
+            "depends_on": ", ".join(sorted(n.deps)),
+        }
+        for n in sorted(nodes, key=lambda n: wave[n.id])
+    ]
+
+
+def _load_state(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("done", {})
+
+
+def _save_state(path: Path, done: dict):
+    path.write_text(json.dumps({"done": done}, indent=2), encoding="utf-8")
+
+
+def _tracked_table(node: Node):
+    """The one table a SQL node writes, if it is a table write worth recording in ops.pipeline_runs."""
+    tables = [t for t in node.writes if t.count(".") == 2]
+    if len(tables) == 1 and not _UNTRACKED.match(_COMMENTS.sub("", node.source)):
+        return tables[0]
+    return None
+
+
+def _retryable(exc: Exception) -> bool:
+    """False for failures a retry cannot fix; lost connections, timeouts and task failures are retried."""
+    if isinstance(exc, _DETERMINISTIC):
+        return False
+    return not any(cls.__name__ in _DETERMINISTIC_SPARK for cls in type(exc).__mro__)
+
+
+def _execute(spark, node: Node, display, force=False) -> str:
+    """Run ``node``; returns "ok", or "skipped (unchanged)" for an up-to-date table build."""
+    if node.kind == "sql":
+        target = _tracked_table(node)
+        if target:
+            current, versions = is_current(spark, target, node.source, node.reads)
+            if current and not force:
+                return "skipped (unchanged)"
+            with track(spark, node.id, target) as write:
+                df = write.sql(node.source)
+            record_builds(spark, [(target, node.source, versions)], current_run_id())
+        else:
+            df = spark.sql(node.source)
+        if node.source.lstrip().upper().startswith(("SELECT", "WITH")):
+            print(f"[{node.id}]")
+            display(df)
+        return "ok"
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.append(str(REPO_ROOT))
+    code = compile(Path(node.source).read_text(encoding="utf-8"), node.source, "exec")
+    exec(code, {"__name__": "__main__", "spark": spark, "display": display})
+    return "ok"
+
+
+def run_pipeline(spark, paths=PIPELINE, max_workers=4, retries=2, retry_delay=10.0,
+                 resume=False, dry_run=False, state_path=STATE_PATH, display=None, force=False) -> list[dict]:
+    """Run ``paths`` as a DAG; returns one result row per node.
+
+    ``resume`` skips nodes recorded as done by the previous (failed) run, as long
+    as their SQL / notebook source is unchanged. SQL table builds whose SQL and
+    input Delta versions are unchanged since they last ran are skipped unless
+    ``force``. ``dry_run`` returns the plan only. Only failures that can pass on
+    a second attempt are retried (see :func:`_retryable`); schema drift, a failed
+    quality gate or bad SQL fail the node at once.
+    """
+    nodes = load_nodes(paths)
+    if dry_run:
+        return plan(nodes)
+
+    display = display or (lambda df: df.show(truncate=False))
+    run_id = start_run()
+    print("Run id:", run_id)
+    state_path = Path(state_path)
+    done = _load_state(state_path) if resume else {}
+    by_id = {n.id: n for n in nodes}
+    results = {}
+    lock = threading.Lock()
+
+    for node in nodes:
+        if done.get(node.id) == node.fingerprint:
+            results[node.id] = {"node": node.id, "status": "skipped (resume)", "attempts": 0, "seconds": 0.0,
+                               "error": ""}
+    done = {k: v for k, v in done.items() if k in results}
+
+    def attempt(node: Node) -> dict:
+        start = time.perf_counter()
+        for n in range(1, retries + 2):
+            try:
+                status = _execute(spark, node, display, force)
+                with lock:
+                    done[node.id] = node.fingerprint
+                    _save_state(state_path, done)
+                error = ""
+                break
+            except Exception as exc:  # noqa: BLE001 - transient failures are retried, then reported
+                status, error = "failed", f"{type(exc).__name__}: {exc}"
+                print(f"[{node.id}] attempt {n} failed: {error}")
+                if n > retries or not _retryable(exc):
+                    break
+                time.sleep(retry_delay * n)
+        return {"node": node.id, "status": status, "attempts": n,
+                "seconds": round(time.perf_counter() - start, 3), "error": error}
+
+    pending = {n.id for n in nodes if n.id not in results}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            failed = {k for k, r in results.items() if r["status"] in ("failed", "blocked")}
+            for node_id in sorted(pending):
+                deps = by_id[node_id].deps
+                if deps & failed:
+                    results[node_id] = {"node": node_id, "status": "blocked", "attempts": 0, "seconds": 0.0,
+                                        "error": ""}
+                    pending.discard(node_id)
+                elif all(d in results for d in deps):
+                    running[pool.submit(attempt, by_id[node_id])] = node_id
+                    pending.discard(node_id)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                results[running.pop(future)] = result
+                print(f"[{result['node']}] {result['status']} in {result['seconds']}s")
+
+    ordered = [results[n.id] for n in nodes]
+    failed = [r["node"] for r in ordered if r["status"] != "ok" and not r["status"].startswith("skipped")]
+    if failed:
+        raise RuntimeError(f"Pipeline failed; rerun with resume=True after fixing: {failed}")
+    state_path.unlink(missing_ok=True)
+    return ordered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=PIPELINE, help="notebooks / SQL scripts, in run order")
+    parser.add_argument("--dry-run", action="store_true", help="print the execution plan and exit")
+    parser.add_argument("--resume", action="store_true", help="skip nodes completed by the last run")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="rebuild tables even if their inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        for row in run_pipeline(None, args.paths, dry_run=True):
+            print(f"{row['wave']:>3}  {row['node']:<45} -> {row['writes'] or '-'}")
+        return
+
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.getOrCreate()
+    for row in run_pipeline(spark, args.paths, max_workers=args.workers, retries=args.retries,
+                            resume=args.resume, force=args.force):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
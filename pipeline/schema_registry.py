@@ -0,0 +1,140 @@
+"""Schema fingerprints for the Bronze clean-names step, and drift detection.
+
+Notebook 02 renames the raw source columns with :func:`pipeline.bronze.clean_names`
+and used to rewrite Bronze with ``overwriteSchema`` on every run, so a renamed,
+added or retyped source column silently changed the Bronze schema under every
+later step. ``REGISTRY_TABLE`` keeps, per source table, a fingerprint of the
+raw schema (column names, types and order), the resolved raw -> clean column
+mapping and the source Delta version last written to Bronze.
+
+:func:`check_schema` compares the current source schema with that entry:
+
+* ``new``: no entry yet; the mapping is resolved and registered after the write;
+* ``unchanged``: same fingerprint; the stored mapping is reused, and the write
+  is skipped when the source has no new commits either;
+* ``drift``: the fingerprint differs; :func:`drift_report` lists the columns
+  added, removed, retyped or moved, and notebook 02 stops before Bronze (and
+  so Silver) is rebuilt on the new schema. Accepting the change re-registers
+  the new mapping.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from pipeline.bronze import clean_names
+from pipeline.sqlfiles import quote_literal
+from pipeline.text_fixes import delta_version
+
+REGISTRY_TABLE = "workspace.ops.schema_registry"
+
+DRIFT_SCHEMA = "change STRING, raw_column STRING, position INT, old_type STRING, new_type STRING, clean_column STRING"
+
+
+def schema_fields(schema) -> list:
+    """``[(name, type), ...]`` of a Spark ``StructType``, in column order."""
+    return [(f.name, f.dataType.simpleString()) for f in schema.fields]
+
+
+def fingerprint(fields: list) -> str:
+    return hashlib.sha1(json.dumps(fields).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SchemaCheck:
+    status: str  # "new" | "unchanged" | "drift"
+    fields: list
+    mapping: list  # [(raw column, clean column), ...] to apply
+    source_version: int = None
+    registered_version: int = None
+    drift: list = field(default_factory=list)
+
+    @property
+    def source_changed(self) -> bool:
+        return self.source_version is None or self.source_version != self.registered_version
+
+
+def _ensure_table(spark, registry_table: str):
+    spark.sql(f"CREATE SCHEMA IF NOT EXISTS {registry_table.rsplit('.', 1)[0]}")
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {registry_table} (
+      source_table   STRING,
+      fingerprint    STRING,
+      raw_schema     STRING,
+      column_map     STRING,
+      source_version BIGINT,
+      run_id         STRING,
+      registered_at  TIMESTAMP
+    ) USING delta
+    """)
+
+
+def registered(spark, source_table: str, registry_table=REGISTRY_TABLE):
+    """The registry entry of ``source_table`` (``fingerprint``, ``fields``, ``mapping``,
+    ``source_version``), or None."""
+    _ensure_table(spark, registry_table)
+    row = spark.table(registry_table).where(f"source_table = {quote_literal(source_table)}").first()
+    if row is None:
+        return None
+    return {"fingerprint": row["fingerprint"], "fields": [tuple(f) for f in json.loads(row["raw_schema"])],
+            "mapping": [tuple(m) for m in json.loads(row["column_map"])], "source_version": row["source_version"]}
+
+
+def drift_report(old_fields: list, new_fields: list) -> list:
+    """``(change, raw_column, position, old_type, new_type, clean_column)`` per column that differs."""
+    old, new = dict(old_fields), dict(new_fields)
+    old_pos = {name: i for i, (name, _) in enumerate(old_fields)}
+    old_clean = dict(zip(old, clean_names(list(old))))
+    new_clean = dict(zip(new, clean_names(list(new))))
+    rows = []
+    for i, (name, dtype) in enumerate(new_fields):
+        if name not in old:
+            rows.append(("added", name, i, None, dtype, new_clean[name]))
+        elif old[name] != dtype:
+            rows.append(("retyped", name, i, old[name], dtype, new_clean[name]))
+        elif old_pos[name] != i:
+            rows.append(("moved", name, i, None, None, new_clean[name]))
+    rows += [("removed", name, old_pos[name], dtype, None, old_clean[name])
+             for name, dtype in old_fields if name not in new]
+    return rows
+
+
+def check_schema(spark, source_table: str, registry_table=REGISTRY_TABLE) -> SchemaCheck:
+    """Compare the schema of ``source_table`` with its registry entry (see module docstring)."""
+    fields = schema_fields(spark.table(source_table).schema)
+    try:
+        version = delta_version(spark, source_table)
+    except Exception:  # noqa: BLE001 - not a Delta table: every run counts as changed
+        version = None
+    entry = registered(spark, source_table, registry_table)
+    if entry is None:
+        names = [name for name, _ in fields]
+        return SchemaCheck("new", fields, list(zip(names, clean_names(names))), version)
+    if entry["fingerprint"] == fingerprint(fields):
+        return SchemaCheck("unchanged", fields, entry["mapping"], version, entry["source_version"])
+    names = [name for name, _ in fields]
+    return SchemaCheck("drift", fields, list(zip(names, clean_names(names))), version, entry["source_version"],
+                       drift_report(entry["fields"], fields))
+
+
+def register(spark, source_table: str, check: SchemaCheck, run_id=None, registry_table=REGISTRY_TABLE):
+    """Record ``check``'s schema, mapping and source version after a successful write."""
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    _ensure_table(spark, registry_table)
+    (
+        spark.createDataFrame(
+            [(source_table, fingerprint(check.fields), json.dumps(check.fields), json.dumps(check.mapping),
+              check.source_version, run_id)],
+            "source_table STRING, fingerprint STRING, raw_schema STRING, column_map STRING, "
+            "source_version BIGINT, run_id STRING",
+        )
+        .createOrReplaceTempView("schema_registry_updates")
+    )
+    spark.sql(f"""
+    MERGE INTO {registry_table} t
+    USING (SELECT *, current_timestamp() AS registered_at FROM schema_registry_updates) s
+    ON t.source_table = s.source_table
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED THEN INSERT *
+    """)
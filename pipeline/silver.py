@@ -0,0 +1,408 @@
+"""Silver build for the DataCo supply chain dataset.
+
+The original build wrote three physical tables (v1 typed -> v2 standardised
+keys -> v3 mapped clean labels), each one re-reading the previous. The fused
+build below runs the same three steps as one statement, so Bronze is read once
+and only the v3 output is written. The v2 standardisation regexes run on a small
+lookup of distinct values rather than on every row, and the text fixes are
+applied to that lookup from a compiled map instead of four table joins.
+Timestamps are likewise parsed once per distinct string. v1/v2 survive as optional views
+over v3 for debugging.
+"""
+
+from pipeline.sqlfiles import quote_literal
+from pipeline.text_fixes import fix_lookup_sql
+
+# Spark SQL string literals (backslashes escaped for the SQL parser)
+_SPACES = r"'\\s+'"
+_NOT_ALNUM = r"'[^\\p{L}\\p{N} ]'"
+
+# Source timestamp formats, in the order they are tried
+TS_FORMATS = ("M/d/yyyy H:mm", "MM/dd/yyyy HH:mm")
+
+USA_VARIANTS = ("EE. UU.", "EE.UU.", "EE UU", "ESTADOS UNIDOS", "Estados Unidos", "United States", "USA")
+
+# Columns added by v2 (whitespace-standardised values, then canonical keys)
+STD_COLUMNS = [
+    "order_region_std", "market_std", "shipping_mode_std",
+    "order_country_std", "order_state_std", "order_city_std", "order_zipcode_std",
+    "customer_country_std", "customer_state_std", "customer_city_std", "customer_zipcode_std",
+]
+KEY_COLUMNS = [
+    "order_country_key", "order_state_key", "order_city_key", "order_zipcode_key",
+    "customer_country_key", "customer_state_key", "customer_city_key", "customer_zipcode_key",
+    "market_key", "order_region_key", "shipping_mode_key",
+]
+
+# field -> v1 columns that share one canonicalisation rule (and one lookup)
+CANON_FIELDS = {
+    "country": ["order_country", "customer_country"],
+    "state": ["order_state", "customer_state"],
+    "city": ["order_city", "customer_city"],
+    "zipcode": ["order_zipcode", "customer_zipcode"],
+    "market": ["market"],
+    "order_region": ["order_region"],
+    "shipping_mode": ["shipping_mode"],
+}
+
+# Fields corrected by silver.ref_text_fixes (its `field` values)
+FIXED_FIELDS = ("country", "city")
+
+# Columns added by v3 (reference-driven fixes for encoding corruption)
+CLEAN_COLUMNS = [
+    "order_country_clean", "order_city_clean",
+    "customer_country_clean", "customer_city_clean",
+    "order_country_clean_key", "order_city_clean_key",
+    "customer_country_clean_key", "customer_city_clean_key",
+]
+
+
+# Surrogate keys shared by the gold dims and facts, computed once here so they
+# can never disagree (see docs/08_star_schema.md)
+SURROGATE_KEY_COLUMNS = ["geo_key", "channel_key", "discount_band_key"]
+
+# (discount_band_key, upper bound of discount_rate); band 1 is exactly 0%
+DISCOUNT_BANDS = ((2, 0.05), (3, 0.10), (4, 0.15), (5, 0.20), (6, 0.25))
+
+DERIVED_COLUMNS = STD_COLUMNS + KEY_COLUMNS + CLEAN_COLUMNS + SURROGATE_KEY_COLUMNS
+
+
+def discount_band_expr(col: str) -> str:
+    """discount_rate -> gold.dim_discount_band key (NULL outside 0-25%)."""
+    whens = [f"WHEN {col} = 0 THEN 1"]
+    lower = 0
+    for key, upper in DISCOUNT_BANDS:
+        whens.append(f"WHEN {col} > {lower:.2f} AND {col} <= {upper:.2f} THEN {key}")
+        lower = upper
+    return "CASE\n    " + "\n    ".join(whens) + "\n    ELSE NULL\n  END"
+
+
+def std_expr(col: str) -> str:
+    """trim + collapse repeated whitespace."""
+    return f"regexp_replace(trim({col}), {_SPACES}, ' ')"
+
+
+def key_expr(col: str) -> str:
+    """Canonical key string: drop punctuation, collapse whitespace, upper-case."""
+    return f"upper(regexp_replace(regexp_replace({col}, {_NOT_ALNUM}, ''), {_SPACES}, ' '))"
+
+
+def country_key_expr(col: str) -> str:
+    variants = ", ".join(f"'{v}'" for v in USA_VARIANTS)
+    return f"CASE WHEN {col} IN ({variants}) THEN 'USA' ELSE {key_expr(col)} END"
+
+
+def ts_lookup_sql(source: str) -> str:
+    """Distinct raw timestamp strings, parsed once, with the format that matched.
+
+    Many rows share the same minute-resolution string, so every format in
+    ``TS_FORMATS`` is tried once per distinct value (first match wins, as the
+    original COALESCE did). ``try_to_timestamp`` keeps a non-matching format
+    from failing the build under ANSI mode, so misses surface as ``unparsed``.
+    ``order_rows``/``ship_rows`` keep per-column row counts for
+    :func:`ts_parse_metrics_sql`.
+    """
+    parses = ",\n    ".join(
+        f"try_to_timestamp(raw, '{fmt}') AS p{i}" for i, fmt in enumerate(TS_FORMATS)
+    )
+    detect = "\n    ".join(
+        f"WHEN p{i} IS NOT NULL THEN '{fmt}'" for i, fmt in enumerate(TS_FORMATS)
+    )
+    first_match = ", ".join(f"p{i}" for i in range(len(TS_FORMATS)))
+    return f"""
+WITH raw_values AS (
+  SELECT raw, SUM(order_rows) AS order_rows, SUM(ship_rows) AS ship_rows
+  FROM (
+    SELECT inline(array(
+        struct(CAST(order_date_dateorders    AS STRING) AS raw, 1L AS order_rows, 0L AS ship_rows),
+        struct(CAST(shipping_date_dateorders AS STRING) AS raw, 0L AS order_rows, 1L AS ship_rows)
+    ))
+    FROM {source}
+  )
+  GROUP BY raw
+),
+parsed AS (
+  SELECT
+    raw,
+    order_rows,
+    ship_rows,
+    {parses}
+  FROM raw_values
+)
+SELECT
+  raw,
+  order_rows,
+  ship_rows,
+  COALESCE({first_match}) AS ts,
+  CASE
+    WHEN raw IS NULL THEN 'null'
+    {detect}
+    ELSE 'unparsed'
+  END AS format
+FROM parsed"""
+
+
+def ts_parse_metrics_sql(ts_lookup: str) -> str:
+    """Rows per (column, matched format) with a sample of unparseable strings."""
+    return f"""
+SELECT
+  column_name,
+  format,
+  SUM(rows)  AS rows,
+  COUNT(*)   AS distinct_values,
+  slice(collect_list(CASE WHEN format = 'unparsed' THEN raw END), 1, 10) AS sample_values
+FROM (
+  SELECT raw, format, inline(array(
+      struct('order_ts' AS column_name, order_rows AS rows),
+      struct('ship_ts'  AS column_name, ship_rows  AS rows)
+  ))
+  FROM {ts_lookup}
+)
+WHERE rows > 0
+GROUP BY column_name, format
+ORDER BY column_name, rows DESC"""
+
+
+def typed_sql(source: str, ts_lookup: str) -> str:
+    """v1: typed, PII-free projection of Bronze with parsed timestamps.
+
+    Timestamps come from ``ts_lookup`` (:func:`ts_lookup_sql` over the same
+    source rows) instead of being parsed per row. Bronze keeps every delivered
+    version of a row, so only the latest ``_ingest_ts`` per ``order_item_id``
+    is projected; full rebuilds and MERGE sources share that rule.
+    """
+    return f"""
+SELECT
+  CAST(order_item_id AS BIGINT) AS order_item_id,
+  CAST(order_id      AS BIGINT) AS order_id,
+  CAST(customer_id   AS BIGINT) AS customer_id,
+  CAST(product_card_id AS BIGINT) AS product_card_id,
+  CAST(category_id     AS BIGINT) AS category_id,
+  CAST(department_id   AS BIGINT) AS department_id,
+
+  order_date_dateorders    AS order_ts_raw,
+  shipping_date_dateorders AS ship_ts_raw,
+
+  order_ts_parsed AS order_ts,
+  ship_ts_parsed  AS ship_ts,
+
+  to_date(order_ts_parsed) AS order_date,
+  to_date(ship_ts_parsed)  AS ship_date,
+
+  CAST(sales                    AS DOUBLE) AS gross_sales,
+  CAST(order_item_total         AS DOUBLE) AS net_sales,
+  CAST(order_item_discount      AS DOUBLE) AS discount_amount,
+  CAST(order_item_discount_rate AS DOUBLE) AS discount_rate,
+  CAST(order_profit_per_order   AS DOUBLE) AS profit,
+
+  CAST(order_item_quantity      AS INT)    AS quantity,
+  CAST(order_item_product_price AS DOUBLE) AS unit_price,
+  CAST(product_price            AS DOUBLE) AS catalog_price,
+
+  CAST(days_for_shipping_real        AS INT) AS days_for_shipping_real,
+  CAST(days_for_shipment_scheduled   AS INT) AS days_for_shipment_scheduled,
+  CAST(late_delivery_risk            AS INT) AS late_delivery_risk,
+
+  CAST(delivery_status AS STRING) AS delivery_status,
+  CAST(shipping_mode   AS STRING) AS shipping_mode,
+  CAST(order_status    AS STRING) AS order_status,
+
+  CAST(market      AS STRING) AS market,
+  CAST(order_region AS STRING) AS order_region,
+
+  CAST(order_country AS STRING) AS order_country,
+  CAST(order_state   AS STRING) AS order_state,
+  CAST(order_city    AS STRING) AS order_city,
+  CAST(order_zipcode AS STRING) AS order_zipcode,
+
+  CAST(customer_segment AS STRING) AS customer_segment,
+  CAST(customer_country AS STRING) AS customer_country,
+  CAST(customer_state   AS STRING) AS customer_state,
+  CAST(customer_city    AS STRING) AS customer_city,
+  CAST(customer_zipcode AS STRING) AS customer_zipcode,
+
+  CAST(latitude  AS DOUBLE) AS latitude,
+  CAST(longitude AS DOUBLE) AS longitude,
+
+  CAST(product_name        AS STRING) AS product_name,
+  CAST(product_category_id AS BIGINT) AS product_category_id,
+  CAST(product_description AS STRING) AS product_description,
+  CAST(product_status      AS BIGINT) AS product_status,
+
+  CASE WHEN days_for_shipping_real > days_for_shipment_scheduled THEN 1 ELSE 0 END AS is_late_by_days,
+
+  _ingest_ts,
+  _batch_id
+
+FROM (
+  SELECT
+    src.*,
+    o.ts  AS order_ts_parsed,
+    sh.ts AS ship_ts_parsed
+  FROM (
+    SELECT * FROM {source}
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY order_item_id ORDER BY _ingest_ts DESC) = 1
+  ) src
+  LEFT JOIN {ts_lookup} o  ON CAST(src.order_date_dateorders    AS STRING) <=> o.raw
+  LEFT JOIN {ts_lookup} sh ON CAST(src.shipping_date_dateorders AS STRING) <=> sh.raw
+)"""
+
+
+def canon_lookup_sql(source: str, fix_map: dict) -> str:
+    """Distinct raw values per field with their standardised, key and clean values.
+
+    The v2 regexes only depend on the value, and these columns have a few
+    thousand distinct values against ~180k rows, so they are evaluated once per
+    distinct value here and joined back (broadcast) in :func:`fused_select_sql`.
+    The v3 text fixes (``fix_map``, see :mod:`pipeline.text_fixes`) are applied
+    in the same projection for the country and city fields.
+    """
+    values = ",\n        ".join(
+        f"struct('{field}' AS field, CAST({c} AS STRING) AS raw)"
+        for field, cols in CANON_FIELDS.items()
+        for c in cols
+    )
+    fixed = ", ".join(quote_literal(f) for f in FIXED_FIELDS)
+    return f"""
+WITH raw_values AS (
+  SELECT DISTINCT field, raw
+  FROM (
+    SELECT inline(array(
+        {values}
+    ))
+    FROM {source}
+  )
+),
+std_values AS (
+  SELECT
+    field,
+    raw,
+    CASE WHEN field = 'zipcode' THEN raw ELSE {std_expr("raw")} END AS std
+  FROM raw_values
+),
+clean_values AS (
+  SELECT
+    field,
+    raw,
+    std,
+    CASE
+      WHEN field = 'country' THEN {country_key_expr("std")}
+      WHEN field = 'zipcode' THEN {key_expr("coalesce(std,'')")}
+      ELSE {key_expr("std")}
+    END AS key,
+    CASE
+      WHEN field IN ({fixed}) THEN COALESCE({fix_lookup_sql(fix_map, "field", "std")}, std)
+    END AS clean
+  FROM std_values
+)
+SELECT
+  field,
+  raw,
+  std,
+  key,
+  clean,
+  {key_expr("clean")} AS clean_key
+FROM clean_values"""
+
+
+def fused_select_sql(source: str, lookup: str, ts_lookup: str) -> str:
+    """v1 -> v2 -> v3 as one statement over ``source`` (Bronze audited rows).
+
+    ``lookup`` and ``ts_lookup`` are (cached) relations built by
+    :func:`canon_lookup_sql` and :func:`ts_lookup_sql` over the same source rows;
+    the v3 text fixes arrive with ``lookup``.
+    """
+    fields = ",\n".join(
+        f"lk_{field} AS (SELECT raw, std, key, clean, clean_key FROM {lookup} WHERE field = '{field}')"
+        for field in CANON_FIELDS
+    )
+    return f"""
+WITH typed AS ({typed_sql(source, ts_lookup)}
+),
+{fields}
+SELECT /*+ BROADCAST(rg, mk, sm, oc, os, oci, oz, cc, cs, cci, cz) */
+  b.*,
+
+  rg.std AS order_region_std,
+  mk.std AS market_std,
+  sm.std AS shipping_mode_std,
+
+  oc.std  AS order_country_std,
+  os.std  AS order_state_std,
+  oci.std AS order_city_std,
+  oz.std  AS order_zipcode_std,
+
+  cc.std  AS customer_country_std,
+  cs.std  AS customer_state_std,
+  cci.std AS customer_city_std,
+  cz.std  AS customer_zipcode_std,
+
+  oc.key  AS order_country_key,
+  os.key  AS order_state_key,
+  oci.key AS order_city_key,
+  oz.key  AS order_zipcode_key,
+
+  cc.key  AS customer_country_key,
+  cs.key  AS customer_state_key,
+  cci.key AS customer_city_key,
+  cz.key  AS customer_zipcode_key,
+
+  mk.key AS market_key,
+  rg.key AS order_region_key,
+  sm.key AS shipping_mode_key,
+
+  oc.clean  AS order_country_clean,
+  oci.clean AS order_city_clean,
+
+  cc.clean  AS customer_country_clean,
+  cci.clean AS customer_city_clean,
+
+  oc.clean_key  AS order_country_clean_key,
+  oci.clean_key AS order_city_clean_key,
+
+  cc.clean_key  AS customer_country_clean_key,
+  cci.clean_key AS customer_city_clean_key,
+
+  xxhash64(coalesce(oc.key,''), coalesce(os.key,''), coalesce(oci.key,'')) AS geo_key,
+  xxhash64(coalesce(mk.key,''), coalesce(rg.key,''), coalesce(sm.key,'')) AS channel_key,
+  {discount_band_expr("b.discount_rate")} AS discount_band_key
+
+FROM typed b
+LEFT JOIN lk_order_region  rg  ON b.order_region     <=> rg.raw
+LEFT JOIN lk_market        mk  ON b.market           <=> mk.raw
+LEFT JOIN lk_shipping_mode sm  ON b.shipping_mode    <=> sm.raw
+LEFT JOIN lk_country       oc  ON b.order_country    <=> oc.raw
+LEFT JOIN lk_state         os  ON b.order_state      <=> os.raw
+LEFT JOIN lk_city          oci ON b.order_city       <=> oci.raw
+LEFT JOIN lk_zipcode       oz  ON b.order_zipcode    <=> oz.raw
+LEFT JOIN lk_country       cc  ON b.customer_country <=> cc.raw
+LEFT JOIN lk_state         cs  ON b.customer_state   <=> cs.raw
+LEFT JOIN lk_city          cci ON b.customer_city    <=> cci.raw
+LEFT JOIN lk_zipcode       cz  ON b.customer_zipcode <=> cz.raw
+"""
+
+
+def debug_views_sql(silver_table: str, v1_view: str, v2_view: str) -> list[str]:
+    """v1/v2 as zero-copy views over the fused table (column sets as before)."""
+    v2_drop = ", ".join(CLEAN_COLUMNS + SURROGATE_KEY_COLUMNS)
+    v1_drop = ", ".join(DERIVED_COLUMNS)
+    return [
+        f"CREATE OR REPLACE VIEW {v1_view} AS SELECT * EXCEPT ({v1_drop}) FROM {silver_table}",
+        f"CREATE OR REPLACE VIEW {v2_view} AS SELECT * EXCEPT ({v2_drop}) FROM {silver_table}",
+    ]
+
+
+def upsert_sql(target: str, source: str, lookup: str, ts_lookup: str) -> str:
+    """MERGE the fused output for ``source`` rows into ``target`` on the order_item_id grain.
+
+    ``source`` must hold at most one row per order_item_id. Late updates overwrite
+    the stored row unless it came from a newer ingest; new items are inserted.
+    The target is not aliased (Delta MERGE gotcha, see docs/07).
+    """
+    return f"""
+MERGE INTO {target}
+USING ({fused_select_sql(source, lookup, ts_lookup)}) s
+ON {target}.order_item_id = s.order_item_id
+WHEN MATCHED AND s._ingest_ts >= {target}._ingest_ts THEN UPDATE SET *
+WHEN NOT MATCHED THEN INSERT *
+"""
@@ -0,0 +1,361 @@
+"""Scripted, parallel load of the Gold Parquet exports into Snowflake.
+
+Replaces the Snowsight "Load Data" steps of ``docs/runboooks/snowflake_load.md``.
+For every table exported by :mod:`pipeline.export` (``<root>/<table>/_latest.json``):
+
+1. the export is checked against its manifest (sizes, checksums, row counts);
+2. files larger than ``MAX_CHUNK_BYTES`` are split into ~``CHUNK_BYTES`` Parquet
+   chunks (Snowflake loads fastest from 100-250 MB compressed files, one file
+   per load thread);
+3. the chunks are uploaded concurrently to an internal stage;
+4. one ``COPY INTO`` loads them into a fresh ``<TABLE>_LOADING`` table;
+5. the loaded row count is compared with the manifest, and only a matching
+   load is swapped in for the live table.
+
+Tables load in parallel, every statement runs on a connection borrowed from a
+pool, and a failed table leaves the previous data in place. After the load, FK
+orphans are counted for the facts (the runbook's coverage checks).
+
+The warehouse is behind a small interface (``execute`` / ``upload`` /
+``copy_into`` / ``publish`` / ``column_type``) implemented by
+:class:`SnowflakeTarget` and by :class:`DuckDBTarget`, a local stand-in that
+loads the same files the same way, so a load can be rehearsed without an
+account::
+
+    python -m pipeline.snowflake_load .local/exports --duckdb .local/snowflake.duckdb
+    python -m pipeline.snowflake_load /path/to/exports          # SNOWFLAKE_* env vars
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from pipeline import export
+from pipeline.fk_coverage import FOREIGN_KEYS
+from pipeline.sqlfiles import REPO_ROOT
+
+SNOWFLAKE_SCHEMA = "DATACO.GOLD"
+STAGE = "GOLD_LOAD_STAGE"
+CHUNK_BYTES = 128 * 1024 * 1024
+MAX_CHUNK_BYTES = 256 * 1024 * 1024
+LOADING_SUFFIX = "_LOADING"
+
+# Manifest column types (Spark simpleString or DuckDB) -> Snowflake
+_SNOWFLAKE_TYPES = {
+    "tinyint": "NUMBER(38,0)", "smallint": "NUMBER(38,0)", "int": "NUMBER(38,0)",
+    "integer": "NUMBER(38,0)", "bigint": "NUMBER(38,0)", "hugeint": "NUMBER(38,0)",
+    "float": "FLOAT", "real": "FLOAT", "double": "FLOAT",
+    "string": "VARCHAR", "varchar": "VARCHAR",
+    "boolean": "BOOLEAN", "date": "DATE",
+    "timestamp": "TIMESTAMP_NTZ", "timestamp_ntz": "TIMESTAMP_NTZ",
+    "timestamp with time zone": "TIMESTAMP_TZ",
+}
+
+
+class _PooledTarget:
+    """Connection pool shared by the targets: one statement per borrowed connection."""
+
+    def __init__(self, schema: str, pool_size: int):
+        self.schema = schema
+        self.pool_size = pool_size
+        self._pool = queue.Queue()
+        self._opened = 0
+        self._opened_lock = threading.Lock()
+
+    def _connect(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def connection(self):
+        try:
+            con = self._pool.get_nowait()
+        except queue.Empty:
+            with self._opened_lock:
+                can_open = self._opened < self.pool_size
+                self._opened += can_open
+            con = self._connect() if can_open else self._pool.get()
+        try:
+            yield con
+        finally:
+            self._pool.put(con)
+
+    def execute(self, sql: str) -> list[dict]:
+        """Run one statement; rows as dicts keyed by lower-case column name."""
+        with self.connection() as con:
+            cur = con.cursor()
+            try:
+                cur.execute(sql)
+                if cur.description is None:
+                    return []
+                names = [d[0].lower() for d in cur.description]
+                return [dict(zip(names, row)) for row in cur.fetchall()]
+            finally:
+                cur.close()
+
+    def table(self, name: str) -> str:
+        return f"{self.schema}.{name.upper()}"
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class SnowflakeTarget(_PooledTarget):
+    """Loads through an internal stage: ``PUT`` per chunk, one ``COPY INTO`` per table."""
+
+    def __init__(self, schema=SNOWFLAKE_SCHEMA, pool_size=8, stage=STAGE, **connect_args):
+        super().__init__(schema, pool_size)
+        self.stage = f"{schema}.{stage}"
+        self.connect_args = connect_args
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Credentials from ``SNOWFLAKE_ACCOUNT`` / ``_USER`` / ``_PASSWORD`` (or
+        ``_AUTHENTICATOR``) / ``_ROLE`` / ``_WAREHOUSE``."""
+        keys = ("account", "user", "password", "authenticator", "role", "warehouse")
+        args = {k: os.environ[f"SNOWFLAKE_{k.upper()}"] for k in keys if os.environ.get(f"SNOWFLAKE_{k.upper()}")}
+        return cls(**args, **kwargs)
+
+    def _connect(self):
+        import snowflake.connector  # only needed against a real account
+
+        return snowflake.connector.connect(**self.connect_args)
+
+    def prepare(self):
+        self.execute(f"CREATE SCHEMA IF NOT EXISTS {self.schema}")
+        self.execute(f"CREATE STAGE IF NOT EXISTS {self.stage} FILE_FORMAT = (TYPE = PARQUET)")
+
+    def column_type(self, manifest_type: str) -> str:
+        t = manifest_type.lower()
+        if t.startswith("decimal"):
+            return "NUMBER" + t[len("decimal"):]
+        if t not in _SNOWFLAKE_TYPES:
+            raise ValueError(f"No Snowflake type for manifest type {manifest_type!r}")
+        return _SNOWFLAKE_TYPES[t]
+
+    def upload(self, path: Path, prefix: str):
+        # Already snappy-compressed Parquet: no gzip on top
+        rows = self.execute(
+            f"PUT 'file://{Path(path).resolve().as_posix()}' @{self.stage}/{prefix}/ "
+            "AUTO_COMPRESS = FALSE OVERWRITE = TRUE PARALLEL = 4"
+        )
+        failed = [r for r in rows if r["status"] not in ("UPLOADED", "SKIPPED")]
+        if failed:
+            raise RuntimeError(f"PUT {path} failed: {failed}")
+
+    def copy_into(self, table: str, prefix: str, files: list[str]) -> int:
+        file_list = ", ".join(f"'{f}'" for f in files)
+        rows = self.execute(f"""
+        COPY INTO {table} FROM @{self.stage}/{prefix}/
+        FILES = ({file_list})
+        FILE_FORMAT = (TYPE = PARQUET)
+        MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+        ON_ERROR = ABORT_STATEMENT
+        FORCE = TRUE
+        PURGE = TRUE
+        """)
+        return sum(r.get("rows_loaded") or 0 for r in rows)
+
+    def publish(self, loading: str, table: str):
+        """Swap the loaded table in (atomic); the previous data is dropped with it."""
+        self.execute(f"CREATE TABLE IF NOT EXISTS {table} LIKE {loading}")
+        self.execute(f"ALTER TABLE {loading} SWAP WITH {table}")
+        self.execute(f"DROP TABLE {loading}")
+
+
+class DuckDBTarget(_PooledTarget):
+    """Local stand-in for :class:`SnowflakeTarget`, backed by a DuckDB file.
+
+    ``upload`` copies the chunk into a stage directory, ``copy_into`` reads the
+    staged files with ``read_parquet`` and removes them, like ``PURGE = TRUE``.
+    """
+
+    def __init__(self, db_path=":memory:", schema="gold", pool_size=8, stage_dir=None):
+        import duckdb
+
+        super().__init__(schema, pool_size)
+        self._db = duckdb.connect(str(db_path))
+        self.stage_dir = Path(stage_dir or REPO_ROOT / ".local" / "stage")
+
+    def _connect(self):
+        return self._db.cursor()
+
+    def prepare(self):
+        self.execute(f"CREATE SCHEMA IF NOT EXISTS {self.schema}")
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+
+    def column_type(self, manifest_type: str) -> str:
+        t = manifest_type.lower()
+        return {"string": "VARCHAR", "timestamp_ntz": "TIMESTAMP"}.get(t, t.upper())
+
+    def upload(self, path: Path, prefix: str):
+        out_dir = self.stage_dir / prefix
+        out_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, out_dir / Path(path).name)
+
+    def copy_into(self, table: str, prefix: str, files: list[str]) -> int:
+        paths = [(self.stage_dir / prefix / f).as_posix() for f in files]
+        file_list = ", ".join(f"'{p}'" for p in paths)
+        rows = self.execute(f"INSERT INTO {table} BY NAME SELECT * FROM read_parquet([{file_list}])")
+        shutil.rmtree(self.stage_dir / prefix, ignore_errors=True)
+        return rows[0]["count"] if rows else 0
+
+    def publish(self, loading: str, table: str):
+        with self.connection() as con:
+            con.execute("BEGIN TRANSACTION")
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+            con.execute(f"ALTER TABLE {loading} RENAME TO {table.rsplit('.', 1)[-1]}")
+            con.execute("COMMIT")
+
+    def close(self):
+        super().close()
+        self._db.close()
+
+
+def chunk_files(export_dir: Path, manifest: dict, work_dir: Path, chunk_bytes=CHUNK_BYTES,
+                max_chunk_bytes=MAX_CHUNK_BYTES) -> list[Path]:
+    """Export files ready to load: files up to ``max_chunk_bytes`` as they are,
+    larger ones split into ~``chunk_bytes`` Parquet chunks under ``work_dir``."""
+    chunks = []
+    for entry in manifest["files"]:
+        path = export_dir / entry["path"]
+        if entry["bytes"] <= max_chunk_bytes or not entry["rows"]:
+            chunks.append(path)
+            continue
+        n_chunks = math.ceil(entry["bytes"] / chunk_bytes)
+        rows_per_chunk = math.ceil(entry["rows"] / n_chunks)
+        source = pq.ParquetFile(path)
+        writer, written, part = None, 0, 0
+        for batch in source.iter_batches(batch_size=min(rows_per_chunk, 65_536)):
+            if writer is None:
+                chunks.append(work_dir / f"{path.stem}-{part:03d}.parquet")
+                writer = pq.ParquetWriter(chunks[-1], source.schema_arrow, compression=export.COMPRESSION)
+            writer.write_batch(batch)
+            written += batch.num_rows
+            if written >= rows_per_chunk:
+                writer.close()
+                writer, written, part = None, 0, part + 1
+        if writer is not None:
+            writer.close()
+    return chunks
+
+
+def create_sql(target, table: str, schema: list) -> str:
+    columns = ",\n  ".join(f"{c['name']} {target.column_type(c['type'])}" for c in schema)
+    return f"CREATE OR REPLACE TABLE {table} (\n  {columns}\n)"
+
+
+def load_table(target, root, name: str, upload_pool: ThreadPoolExecutor, work_dir: Path) -> dict:
+    """Load one exported table; returns a summary row (``status`` "loaded" or "failed: ...")."""
+    start = time.perf_counter()
+    latest = Path(root) / name / export.LATEST
+    manifest = json.loads(latest.read_text(encoding="utf-8"))
+    export_dir = latest.parent / manifest["directory"]
+    table, loading = target.table(name), target.table(name + LOADING_SUFFIX)
+    summary = {"table": table, "source_version": manifest["source_version"], "expected_rows": manifest["rows"],
+               "loaded_rows": None, "chunks": 0, "bytes": 0}
+    try:
+        problems = export.verify_manifest(latest)
+        if problems:
+            raise RuntimeError("export does not match its manifest: " + "; ".join(problems))
+
+        table_work_dir = work_dir / name
+        shutil.rmtree(table_work_dir, ignore_errors=True)
+        table_work_dir.mkdir(parents=True)
+        chunks = chunk_files(export_dir, manifest, table_work_dir)
+        prefix = f"{name}/{manifest['directory']}"
+        summary.update(chunks=len(chunks), bytes=sum(c.stat().st_size for c in chunks))
+        list(upload_pool.map(lambda chunk: target.upload(chunk, prefix), chunks))
+        shutil.rmtree(table_work_dir, ignore_errors=True)
+
+        target.execute(create_sql(target, loading, manifest["schema"]))
+        copied = target.copy_into(loading, prefix, [c.name for c in chunks])
+        loaded = target.execute(f"SELECT COUNT(*) AS n FROM {loading}")[0]["n"]
+        summary["loaded_rows"] = loaded
+        if copied != manifest["rows"] or loaded != manifest["rows"]:
+            raise RuntimeError(f"row count mismatch: manifest {manifest['rows']}, COPY {copied}, table {loaded}")
+        target.publish(loading, table)
+        status = "loaded"
+    except Exception as exc:  # noqa: BLE001 - one bad table must not stop the others
+        target.execute(f"DROP TABLE IF EXISTS {loading}")
+        status = f"failed: {exc}"[:500]
+    return {**summary, "status": status, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def fk_orphans(target, foreign_keys=None) -> list[dict]:
+    """Fact rows whose FK has no dimension row, per (fact, FK column); 0 everywhere = coverage passed."""
+    foreign_keys = FOREIGN_KEYS if foreign_keys is None else foreign_keys
+    results = []
+    for fact, fks in foreign_keys.items():
+        fact_table = target.table(fact.rsplit(".", 1)[-1])
+        for col, dim, key in fks:
+            dim_table = target.table(dim.rsplit(".", 1)[-1])
+            missing = target.execute(
+                f"SELECT COUNT(*) AS n FROM {fact_table} f LEFT JOIN {dim_table} d ON f.{col} = d.{key} "
+                f"WHERE d.{key} IS NULL"
+            )[0]["n"]
+            results.append({"fact_table": fact_table, "fk_column": col, "dim_table": dim_table,
+                            "missing_rows": missing})
+    return results
+
+
+def load_exports(target, root, tables=None, workers=4, upload_workers=8, work_dir=None) -> list[dict]:
+    """Load ``tables`` (default: every export under ``root``) in parallel; one summary row each."""
+    tables = tables or [p.parent.name for p in sorted(Path(root).glob(f"*/{export.LATEST}"))]
+    work_dir = Path(work_dir or Path(root) / "_chunks")
+    target.prepare()
+    with ThreadPoolExecutor(upload_workers) as upload_pool, ThreadPoolExecutor(workers) as table_pool:
+        futures = [table_pool.submit(load_table, target, root, name, upload_pool, work_dir) for name in tables]
+        summary = [f.result() for f in futures]
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load Gold Parquet exports into Snowflake (or a local DuckDB stand-in).")
+    parser.add_argument("root", help="export root (the <root>/<table>/_latest.json layout of pipeline.export)")
+    parser.add_argument("--tables", nargs="+", help="tables to load (default: every export under root)")
+    parser.add_argument("--workers", type=int, default=4, help="tables loaded in parallel")
+    parser.add_argument("--upload-workers", type=int, default=8, help="chunks uploaded in parallel")
+    parser.add_argument("--duckdb", help="load into this DuckDB file instead of Snowflake")
+    parser.add_argument("--schema", help=f"target schema (default: {SNOWFLAKE_SCHEMA}, or gold for --duckdb)")
+    args = parser.parse_args(argv)
+
+    pool_size = args.workers + args.upload_workers
+    if args.duckdb:
+        target = DuckDBTarget(args.duckdb, args.schema or "gold", pool_size)
+    else:
+        target = SnowflakeTarget.from_env(schema=args.schema or SNOWFLAKE_SCHEMA, pool_size=pool_size)
+    try:
+        summary = load_exports(target, args.root, args.tables, args.workers, args.upload_workers)
+        for s in summary:
+            print(f"{s['table']:<32} {s['loaded_rows'] if s['loaded_rows'] is not None else '-':>10} / "
+                  f"{s['expected_rows']:<10} {s['chunks']:>3} chunks {s['seconds']:>8.3f}s  {s['status']}")
+        failed = [s for s in summary if s["status"] != "loaded"]
+        # FK checks need the fact and all of its dimensions in this load
+        loaded = {s["table"] for s in summary if s["status"] == "loaded"}
+        foreign_keys = {
+            fact: fks for fact, fks in FOREIGN_KEYS.items()
+            if {target.table(t.rsplit(".", 1)[-1]) for t in [fact] + [dim for _, dim, _ in fks]} <= loaded
+        }
+        orphans = [o for o in fk_orphans(target, foreign_keys) if o["missing_rows"]]
+        for o in orphans:
+            print(f"FK orphans {o['fact_table']}.{o['fk_column']} -> {o['dim_table']}: {o['missing_rows']}")
+    finally:
+        target.close()
+    if failed or orphans:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Helpers for running the scripts under ``sql/`` one statement at a time.
+
+``spark.sql`` only accepts a single statement, while the scripts in ``sql/``
+are written to be pasted into a Databricks SQL editor as a whole.
+"""
+
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SQL_DIR = REPO_ROOT / "sql"
+
+
+def split_statements(sql_text: str) -> list[str]:
+    """Split a script on ``;`` while respecting quotes and comments."""
+    statements = []
+    buf = []
+    i, n = 0, len(sql_text)
+    quote = None
+
+    while i < n:
+        ch = sql_text[i]
+        nxt = sql_text[i + 1] if i + 1 < n else ""
+
+        if quote:
+            buf.append(ch)
+            if ch == "\\" and quote != "`":
+                buf.append(nxt)
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            i += 1
+            continue
+
+        if ch == "-" and nxt == "-":
+            end = sql_text.find("\n", i)
+            end = n if end == -1 else end
+            buf.append(sql_text[i:end])
+            i = end
+            continue
+        if ch == "/" and nxt == "*":
+            end = sql_text.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            buf.append(sql_text[i:end])
+            i = end
+            continue
+
+        if ch in ("'", '"', "`"):
+            quote = ch
+        elif ch == ";":
+            statements.append("".join(buf))
+            buf = []
+            i += 1
+            continue
+
+        buf.append(ch)
+        i += 1
+
+    statements.append("".join(buf))
+    return [s.strip() for s in statements if _has_code(s)]
+
+
+def _has_code(statement: str) -> bool:
+    for line in statement.splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            return True
+    return False
+
+
+def read_statements(path) -> list[str]:
+    """Statements of a script, with ``path`` relative to ``sql/`` unless absolute."""
+    path = Path(path)
+    if not path.is_absolute():
+        path = SQL_DIR / path
+    return split_statements(path.read_text(encoding="utf-8"))
+
+
+def run_script(spark, path) -> list:
+    """Run every statement of a script; returns the DataFrame of each statement."""
+    return [spark.sql(stmt) for stmt in read_statements(path)]
+
+
+def quote_literal(value) -> str:
+    """Spark SQL string literal for ``value`` (NULL for None)."""
+    if value is None:
+        return "NULL"
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
@@ -0,0 +1,243 @@
+"""Deterministic, scale-factor DataCo extracts for load and benchmark runs.
+
+Writes CSV files shaped like ``data_co_supply_chain_dataset`` (the original 53
+column headers) with ``BASE_ROWS * scale`` order items. Reference values are
+sampled from the Gold exports under ``data/databricks_gold_export``, so products,
+categories, departments, order geography and market/region/shipping-mode
+combinations keep the cardinalities of the real extract; customers and orders
+grow with the scale factor. The quirks the Silver build exists for are kept:
+
+* order/ship timestamps in both ``M/d/yyyy H:mm`` and ``MM/dd/yyyy HH:mm``;
+* accented city/country values with the accents replaced by ``�`` (how the
+  latin-1 source file reads as UTF-8);
+* late-arriving rows: every part after the first carries a share of orders
+  dated inside earlier parts' windows, with higher ``Order Item Id`` values;
+* corrected rows: ``revision`` > 0 re-issues the same extract with a share of
+  in-flight orders (pending, processing, on hold, ...) moved on to
+  ``COMPLETE`` under their existing ``Order Item Id``, so an incremental run on
+  the new revision has updates as well as inserts to apply.
+
+Each part is generated from its own seed, so the output only depends on
+``(scale, seed, parts, revision)`` and parts can be written in parallel::
+
+    python -m pipeline.synthetic --scale 10 --out .local/synthetic/sf10
+    python -m pipeline.synthetic --scale 10 --revision 1 --out .local/synthetic/sf10_r1
+"""
+
+import argparse
+import csv
+import math
+import random
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from pipeline.sqlfiles import REPO_ROOT
+
+EXPORT_DIR = REPO_ROOT / "data" / "databricks_gold_export"
+
+BASE_ROWS = 180_519  # order items in the original DataCo extract
+START = datetime(2015, 1, 1)
+END = datetime(2018, 1, 31, 23, 59)
+
+PADDED_TS_RATE = 0.1  # share of rows using MM/dd/yyyy HH:mm
+CORRUPT_RATE = 1.0  # share of accented city/country values written with U+FFFD
+LATE_RATE = 0.02  # share of orders in a part dated inside an earlier part
+CORRECTION_RATE = 0.05  # share of in-flight orders completed in each revision
+
+HEADERS = [
+    "Type", "Days for shipping (real)", "Days for shipment (scheduled)", "Benefit per order",
+    "Sales per customer", "Delivery Status", "Late_delivery_risk", "Category Id", "Category Name",
+    "Customer City", "Customer Country", "Customer Email", "Customer Fname", "Customer Id",
+    "Customer Lname", "Customer Password", "Customer Segment", "Customer State", "Customer Street",
+    "Customer Zipcode", "Department Id", "Department Name", "Latitude", "Longitude", "Market",
+    "Order City", "Order Country", "Order Customer Id", "order date (DateOrders)", "Order Id",
+    "Order Item Cardprod Id", "Order Item Discount", "Order Item Discount Rate", "Order Item Id",
+    "Order Item Product Price", "Order Item Profit Ratio", "Order Item Quantity", "Sales",
+    "Order Item Total", "Order Profit Per Order", "Order Region", "Order State", "Order Status",
+    "Order Zipcode", "Product Card Id", "Product Category Id", "Product Description", "Product Image",
+    "Product Name", "Product Price", "Product Status", "shipping date (DateOrders)", "Shipping Mode",
+]
+
+PAYMENT_TYPES = (("DEBIT", 38), ("TRANSFER", 28), ("PAYMENT", 23), ("CASH", 11))
+ORDER_STATUSES = (
+    ("COMPLETE", 33), ("PENDING_PAYMENT", 22), ("PROCESSING", 12), ("PENDING", 11), ("CLOSED", 11),
+    ("ON_HOLD", 5), ("SUSPECTED_FRAUD", 2), ("CANCELED", 2), ("PAYMENT_REVIEW", 2),
+)
+IN_FLIGHT_STATUSES = {"PENDING_PAYMENT", "PROCESSING", "PENDING", "ON_HOLD", "PAYMENT_REVIEW"}
+SCHEDULED_DAYS = {"Standard Class": 4, "Second Class": 2, "First Class": 1, "Same Day": 0}
+DISCOUNT_RATES = (0, 0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.09, 0.1, 0.12, 0.13, 0.15,
+                  0.16, 0.17, 0.18, 0.2, 0.25)
+ITEMS_PER_ORDER = ((1, 30), (2, 20), (3, 20), (4, 15), (5, 15))
+FIRST_NAMES = ("Mary", "Robert", "James", "John", "Maria", "David", "Michael", "Richard", "Joseph",
+               "Linda", "Jennifer", "Patricia", "Elizabeth", "Barbara", "Susan", "Jessica")
+LAST_NAMES = ("Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson",
+              "Moore", "Taylor", "Anderson", "Thomas", "Jackson", "White", "Harris", "Martin")
+
+
+def _read_export(name: str) -> list[dict]:
+    with (EXPORT_DIR / f"{name}.csv").open(encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+@lru_cache(maxsize=1)
+def reference_data() -> dict:
+    """Value pools from the Gold exports (loaded once per process)."""
+    categories = {r["category_id"]: r["category_name"] for r in _read_export("dim_category")}
+    departments = {r["department_id"]: r["department_name"] for r in _read_export("dim_department")}
+    customers = _read_export("dim_customer")
+    return {
+        "products": _read_export("dim_product"),
+        "categories": categories,
+        "departments": departments,
+        "customers": customers,
+        "customer_id_stride": 10 ** len(str(max(int(r["customer_id"]) for r in customers))),
+        "geo": _read_export("dim_geo"),
+        "channels": [(r["market"], r["order_region"], r["shipping_mode"]) for r in _read_export("dim_channel")],
+    }
+
+
+def _weighted(options) -> tuple[list, list]:
+    return [v for v, _ in options], [w for _, w in options]
+
+
+def _corrupt(rng: random.Random, value: str) -> str:
+    if rng.random() < CORRUPT_RATE:
+        return re.sub(r"[^\x00-\x7f]", "�", value)
+    return value
+
+
+def _timestamp(rng: random.Random, ts: datetime) -> str:
+    if rng.random() < PADDED_TS_RATE:
+        return ts.strftime("%m/%d/%Y %H:%M")
+    return f"{ts.month}/{ts.day}/{ts.year} {ts.hour}:{ts.minute:02d}"
+
+
+def part_sizes(scale: float, parts: int) -> list[int]:
+    """Order items per part; the total is ``round(BASE_ROWS * scale)``."""
+    total = round(BASE_ROWS * scale)
+    size = total // parts
+    return [size] * (parts - 1) + [total - size * (parts - 1)]
+
+
+def _window(part: int, parts: int) -> tuple[datetime, float]:
+    span = (END - START).total_seconds() / parts
+    return START + timedelta(seconds=span * part), span
+
+
+def generate_part(scale: float, part: int, parts: int, seed: int, out_dir, revision=0) -> dict:
+    """Write ``part-<part>.csv``; returns its file name and row count."""
+    ref = reference_data()
+    rng = random.Random(f"{seed}:{part}")
+    # Own stream, so a revision changes the corrected orders only
+    fix_rng = random.Random(f"{seed}:{part}:r{revision}")
+    sizes = part_sizes(scale, parts)
+    n_customers = max(1, round(len(ref["customers"]) * scale))
+    pay_types, pay_weights = _weighted(PAYMENT_TYPES)
+    statuses, status_weights = _weighted(ORDER_STATUSES)
+    basket_sizes, basket_weights = _weighted(ITEMS_PER_ORDER)
+
+    # Ids continue across parts, so a later part always has higher ids (the ingest watermark)
+    item_id = sum(sizes[:part]) + 1
+    order_id = item_id
+    last_item = item_id + sizes[part]
+
+    path = Path(out_dir) / f"part-{part:05d}.csv"
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        while item_id < last_item:
+            window = rng.randrange(part) if part and rng.random() < LATE_RATE else part
+            start, span = _window(window, parts)
+            order_ts = start + timedelta(minutes=rng.randrange(max(1, int(span // 60))))
+
+            k = rng.randrange(n_customers)
+            customer = ref["customers"][k % len(ref["customers"])]
+            customer_id = int(customer["customer_id"]) + (k // len(ref["customers"])) * ref["customer_id_stride"]
+            geo = rng.choice(ref["geo"])
+            market, region, mode = rng.choice(ref["channels"])
+            pay_type = rng.choices(pay_types, pay_weights)[0]
+            status = rng.choices(statuses, status_weights)[0]
+            if revision and status in IN_FLIGHT_STATUSES and fix_rng.random() < CORRECTION_RATE:
+                status = "COMPLETE"
+
+            scheduled = SCHEDULED_DAYS.get(mode, 4)
+            real = max(0, scheduled + rng.randint(-2, 4))
+            if status in ("CANCELED", "SUSPECTED_FRAUD"):
+                delivery = "Shipping canceled"
+            elif real > scheduled:
+                delivery = "Late delivery"
+            elif real < scheduled:
+                delivery = "Advance shipping"
+            else:
+                delivery = "Shipping on time"
+            ship_ts = order_ts + timedelta(days=real)
+            order_zip = str(rng.randint(10000, 99999)) if geo["country"] == "Estados Unidos" else ""
+
+            for _ in range(min(rng.choices(basket_sizes, basket_weights)[0], last_item - item_id)):
+                product = rng.choice(ref["products"])
+                price = float(product["catalog_price"])
+                quantity = rng.randint(1, 5)
+                rate = rng.choice(DISCOUNT_RATES)
+                sales = round(price * quantity, 2)
+                discount = round(sales * rate, 2)
+                total = round(sales - discount, 2)
+                ratio = round(rng.uniform(-0.8, 0.5), 2)
+                profit = round(total * ratio, 2)
+                writer.writerow([
+                    pay_type, real, scheduled, profit, total, delivery, int(real > scheduled),
+                    product["category_id"], ref["categories"].get(product["category_id"], ""),
+                    _corrupt(rng, customer["customer_city"]), _corrupt(rng, customer["customer_country"]),
+                    "XXXXXXXXX", FIRST_NAMES[customer_id % len(FIRST_NAMES)], customer_id,
+                    LAST_NAMES[customer_id // len(FIRST_NAMES) % len(LAST_NAMES)], "XXXXXXXXX",
+                    customer["customer_segment"], customer["customer_state"],
+                    f"{customer_id % 9999 + 1} Synthetic Street", customer["customer_zipcode"],
+                    product["department_id"], ref["departments"].get(product["department_id"], ""),
+                    customer["latitude"], customer["longitude"], market,
+                    _corrupt(rng, geo["city"]), _corrupt(rng, geo["country"]), customer_id,
+                    _timestamp(rng, order_ts), order_id, product["product_card_id"], discount, rate, item_id,
+                    price, ratio, quantity, sales, total, profit, region, geo["state"], status, order_zip,
+                    product["product_card_id"], product["product_category_id"], product["product_description"],
+                    "", product["product_name"], price, product["product_status"],
+                    _timestamp(rng, ship_ts), mode,
+                ])
+                item_id += 1
+            order_id += 1
+    return {"file": path.name, "rows": sizes[part]}
+
+
+def generate(scale: float, out_dir, seed=42, parts=None, max_workers=None, revision=0) -> list[dict]:
+    """Write a ``scale`` x DataCo extract to ``out_dir`` as ``parts`` CSV files.
+
+    ``parts`` defaults to one per 1x of data (at least one). Returns one
+    ``{"file", "rows"}`` entry per part, in part order.
+    """
+    parts = parts or max(1, math.ceil(scale))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.glob("part-*.csv"):
+        stale.unlink()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(generate_part, scale, p, parts, seed, out_dir, revision) for p in range(parts)]
+        return [f.result() for f in futures]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic DataCo extract.")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiple of the original 180,519 rows")
+    parser.add_argument("--out", required=True, help="output directory for part-*.csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--parts", type=int, help="number of files (default: one per 1x)")
+    parser.add_argument("--workers", type=int, help="parallel processes (default: CPU count)")
+    parser.add_argument("--revision", type=int, default=0,
+                        help="re-issue of the extract with corrected rows (0: first issue)")
+    args = parser.parse_args(argv)
+
+    written = generate(args.scale, args.out, args.seed, args.parts, args.workers, args.revision)
+    print(f"{sum(p['rows'] for p in written):,} rows in {len(written)} files -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
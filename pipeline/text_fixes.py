@@ -0,0 +1,65 @@
+"""Compiled form of ``silver.ref_text_fixes`` for the silver build.
+
+The fix table is read once per Delta version and turned into a single map
+literal keyed by ``(field, bad_value)``, which the silver build applies in one
+projection instead of joining the table once per corrected column. Compiled
+maps are cached in-process and, optionally, as JSON files in ``cache_dir`` so
+later runs only pay for a ``DESCRIBE HISTORY`` until the table changes.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+from pipeline.sqlfiles import quote_literal
+
+logger = logging.getLogger(__name__)
+
+_compiled = {}
+
+
+def delta_version(spark, table: str) -> int:
+    """Current Delta version of ``table`` (reads the transaction log only)."""
+    return spark.sql(f"DESCRIBE HISTORY {table} LIMIT 1").first()["version"]
+
+
+def load_fix_map(spark, table: str, cache_dir=None) -> dict:
+    """``{(field, bad_value): good_value}`` for the current version of ``table``."""
+    version = delta_version(spark, table)
+    if (table, version) in _compiled:
+        return _compiled[(table, version)]
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = Path(cache_dir) / f"{table}.v{version}.json"
+
+    if cache_file is not None and cache_file.exists():
+        entries = json.loads(cache_file.read_text(encoding="utf-8"))
+    else:
+        rows = spark.table(table).select("field", "bad_value", "good_value").collect()
+        entries = [[r.field, r.bad_value, r.good_value] for r in rows]
+        if cache_file is not None:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            for stale in cache_file.parent.glob(f"{table}.v*.json"):
+                stale.unlink()
+            cache_file.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+
+    fix_map = {(field, bad): good for field, bad, good in entries if bad is not None}
+    _compiled.clear()
+    _compiled[(table, version)] = fix_map
+    logger.info("Fix map: %s v%s (%d entries)", table, version, len(fix_map))
+    return fix_map
+
+
+def fix_lookup_sql(fix_map: dict, field_col: str, value_col: str) -> str:
+    """Expression returning the good value for ``(field_col, value_col)``, else NULL."""
+    if not fix_map:
+        return "CAST(NULL AS STRING)"
+    entries = ",\n    ".join(
+        f"named_struct('field', {quote_literal(field)}, 'bad_value', {quote_literal(bad)}), {quote_literal(good)}"
+        for (field, bad), good in sorted(fix_map.items())
+    )
+    return (
+        f"try_element_at(map(\n    {entries}\n  ), "
+        f"named_struct('field', {field_col}, 'bad_value', {value_col}))"
+    )
@@ -0,0 +1,201 @@
+"""Declarative data-quality checks, evaluated with one aggregate scan per table.
+
+The validation scripts under ``sql/`` run one query per check, so every row
+count, grain check, null-key check and encoding check is a separate full scan.
+Here the checks are declared per table in ``CHECKS`` and compiled into a single
+``SELECT`` of aggregates for that table. Each check yields one metric that is
+compared with its threshold, and the results are appended to ``QA_RESULTS_TABLE``,
+which the Data Trust page (through ``QA_LATEST_VIEW``) and the pipeline gate read.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from pipeline.sqlfiles import quote_literal
+
+QA_RESULTS_TABLE = "workspace.gold.qa_results"
+QA_LATEST_VIEW = "workspace.gold.qa_results_latest"
+
+SILVER_TABLE = "workspace.silver.dataco_supplychain_clean_v3"
+GOLD_SCHEMA = "workspace.gold"
+
+RESULT_SCHEMA = (
+    "run_id STRING, table_name STRING, check_name STRING, check_kind STRING, column_name STRING, "
+    "metric DOUBLE, threshold DOUBLE, severity STRING, passed BOOLEAN, rows_scanned BIGINT"
+)
+
+# Kinds whose metric must be >= threshold; every other kind must be <= threshold
+_LOWER_BOUNDS = ("row_count", "min_value")
+
+
+@dataclass(frozen=True)
+class Check:
+    kind: str
+    column: str = None
+    threshold: float = 0
+    severity: str = "error"  # "error" fails the gate, "warn" is reported only
+
+    @property
+    def name(self) -> str:
+        return self.kind if self.column is None else f"{self.kind}:{self.column}"
+
+    def metric_sql(self) -> str:
+        """Aggregate expression for this check's metric."""
+        col = self.column
+        if self.kind == "row_count":
+            return "COUNT(*)"
+        if self.kind == "unique":
+            return f"COUNT(*) - COUNT(DISTINCT {col})"
+        if self.kind == "unique_current":  # type 2 dims: one current version per key
+            return f"SUM(CASE WHEN is_current THEN 1 ELSE 0 END) - COUNT(DISTINCT CASE WHEN is_current THEN {col} END)"
+        if self.kind == "not_null":
+            return f"SUM(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END)"
+        if self.kind == "no_corruption":
+            return f"SUM(CASE WHEN {col} LIKE '%�%' THEN 1 ELSE 0 END)"
+        if self.kind == "min_value":
+            return f"MIN({col})"
+        if self.kind == "max_value":
+            return f"MAX({col})"
+        raise ValueError(f"Unknown check kind: {self.kind}")
+
+    def passed(self, metric) -> bool:
+        if self.threshold is None:
+            return True  # informational metric
+        if metric is None:
+            return self.kind not in _LOWER_BOUNDS  # empty table: MIN/MAX/SUM are NULL
+        if self.kind in _LOWER_BOUNDS:
+            return metric >= self.threshold
+        return metric <= self.threshold
+
+
+def row_count(min_rows=1):
+    return [Check("row_count", threshold=min_rows)]
+
+
+def unique(column):
+    return [Check("unique", column)]
+
+
+def unique_current(column):
+    return [Check("unique_current", column)]
+
+
+def not_null(*columns, severity="error", threshold=0):
+    return [Check("not_null", c, threshold, severity) for c in columns]
+
+
+def no_corruption(*columns, severity="error", threshold=0):
+    return [Check("no_corruption", c, threshold, severity) for c in columns]
+
+
+def value_range(column, low, high, severity="warn"):
+    return [Check("min_value", column, low, severity), Check("max_value", column, high, severity)]
+
+
+_FACT_KEYS = ["order_item_id", "order_id", "customer_id", "product_card_id", "order_date_key"]
+
+# table -> checks, each table evaluated in one scan
+CHECKS = {
+    SILVER_TABLE: (
+        row_count()
+        + unique("order_item_id")
+        + not_null("order_item_id", "order_id", "customer_id", "product_card_id")
+        + not_null("order_ts", "ship_ts", severity="warn")
+        + no_corruption("order_country_std", "order_city_std", threshold=None)
+        + no_corruption("order_country_clean", "order_city_clean",
+                        "customer_country_clean", "customer_city_clean")
+        + value_range("discount_rate", 0, 0.25)
+    ),
+    f"{GOLD_SCHEMA}.dim_date": row_count() + unique("date_key"),
+    f"{GOLD_SCHEMA}.dim_customer": row_count() + unique_current("customer_id") + not_null("valid_from"),
+    f"{GOLD_SCHEMA}.dim_product": row_count() + unique_current("product_card_id") + not_null("valid_from"),
+    f"{GOLD_SCHEMA}.dim_category": row_count() + unique("category_id"),
+    f"{GOLD_SCHEMA}.dim_department": row_count() + unique("department_id"),
+    f"{GOLD_SCHEMA}.dim_geo": row_count() + unique("geo_key"),
+    f"{GOLD_SCHEMA}.dim_channel": row_count() + unique("channel_key"),
+    f"{GOLD_SCHEMA}.dim_discount_band": row_count(6) + unique("discount_band_key"),
+    f"{GOLD_SCHEMA}.fact_sales": (
+        row_count()
+        + unique("order_item_id")
+        + not_null(*_FACT_KEYS)
+        + value_range("discount_rate", 0, 0.25)
+    ),
+    f"{GOLD_SCHEMA}.fact_fulfilment": (
+        row_count()
+        + unique("order_item_id")
+        + not_null(*_FACT_KEYS, "ship_date_key")
+    ),
+}
+
+
+def scan_sql(table: str, checks: list) -> str:
+    """One aggregate query returning every metric of ``checks`` as m0, m1, ..."""
+    metrics = [f"CAST({c.metric_sql()} AS DOUBLE) AS m{i}" for i, c in enumerate(checks)]
+    return "SELECT COUNT(*) AS rows_scanned,\n  " + ",\n  ".join(metrics) + f"\nFROM {table}"
+
+
+def run_validations(spark, checks=None, run_id=None, results_table=QA_RESULTS_TABLE):
+    """Evaluate ``checks`` (default: all of CHECKS) and append them to ``results_table``.
+
+    Returns the result rows of this run as a DataFrame.
+    """
+    checks = CHECKS if checks is None else checks
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+    rows = []
+    for table, table_checks in checks.items():
+        scan = spark.sql(scan_sql(table, table_checks)).first()
+        for i, check in enumerate(table_checks):
+            metric = scan[f"m{i}"]
+            rows.append((run_id, table, check.name, check.kind, check.column, metric,
+                         None if check.threshold is None else float(check.threshold),
+                         check.severity, check.passed(metric), scan["rows_scanned"]))
+    return record_results(spark, rows, results_table)
+
+
+def record_results(spark, rows: list, results_table=QA_RESULTS_TABLE):
+    """Append result tuples (in RESULT_SCHEMA order) to ``results_table``; returns them as a DataFrame."""
+    results = spark.createDataFrame(rows, RESULT_SCHEMA)
+    spark.sql(f"CREATE SCHEMA IF NOT EXISTS {results_table.rsplit('.', 1)[0]}")
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {results_table} (
+      run_id       STRING,
+      table_name   STRING,
+      check_name   STRING,
+      check_kind   STRING,
+      column_name  STRING,
+      metric       DOUBLE,
+      threshold    DOUBLE,
+      severity     STRING,
+      passed       BOOLEAN,
+      rows_scanned BIGINT,
+      checked_at   TIMESTAMP
+    ) USING delta
+    """)
+    (
+        results.selectExpr("*", "current_timestamp() AS checked_at")
+        .write.format("delta").mode("append").saveAsTable(results_table)
+    )
+    return results
+
+
+def latest_view_sql(results_table=QA_RESULTS_TABLE, view=QA_LATEST_VIEW) -> str:
+    """View with the most recent result of every (table, check), for the Data Trust page."""
+    return f"""
+    CREATE OR REPLACE VIEW {view} AS
+    SELECT * FROM {results_table}
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY table_name, check_name ORDER BY checked_at DESC) = 1
+    """
+
+
+def gate(spark, run_id: str, results_table=QA_RESULTS_TABLE):
+    """Raise if any error-severity check of ``run_id`` failed (reads the QA table)."""
+    failed = (
+        spark.table(results_table)
+        .where(f"run_id = {quote_literal(run_id)} AND severity = 'error' AND NOT passed")
+        .select("table_name", "check_name", "metric", "threshold")
+        .collect()
+    )
+    if failed:
+        details = "; ".join(f"{r.table_name} {r.check_name}={r.metric} (threshold {r.threshold})" for r in failed)
+        raise RuntimeError(f"Quality gate failed for run {run_id}: {details}")
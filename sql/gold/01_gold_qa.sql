@@ -14,9 +14,9 @@ FROM DATACO.GOLD.FACT_SALES f
 LEFT JOIN DATACO.GOLD.DIM_DATE d
   ON f.ORDER_DATE_KEY = d.DATE_KEY
 LEFT JOIN DATACO.GOLD.DIM_CUSTOMER c
-  ON f.CUSTOMER_ID = c.CUSTOMER_ID
+  ON f.CUSTOMER_ID = c.CUSTOMER_ID AND c.IS_CURRENT
 LEFT JOIN DATACO.GOLD.DIM_PRODUCT p
-  ON f.PRODUCT_CARD_ID = p.PRODUCT_CARD_ID
+  ON f.PRODUCT_CARD_ID = p.PRODUCT_CARD_ID AND p.IS_CURRENT
 LEFT JOIN DATACO.GOLD.DIM_CATEGORY cat
   ON f.CATEGORY_ID = cat.CATEGORY_ID
 LEFT JOIN DATACO.GOLD.DIM_DEPARTMENT dep
@@ -48,9 +48,9 @@ LEFT JOIN DATACO.GOLD.DIM_DATE d_order
 LEFT JOIN DATACO.GOLD.DIM_DATE d_ship
   ON f.SHIP_DATE_KEY = d_ship.DATE_KEY
 LEFT JOIN DATACO.GOLD.DIM_CUSTOMER c
-  ON f.CUSTOMER_ID = c.CUSTOMER_ID
+  ON f.CUSTOMER_ID = c.CUSTOMER_ID AND c.IS_CURRENT
 LEFT JOIN DATACO.GOLD.DIM_PRODUCT p
-  ON f.PRODUCT_CARD_ID = p.PRODUCT_CARD_ID
+  ON f.PRODUCT_CARD_ID = p.PRODUCT_CARD_ID AND p.IS_CURRENT
 LEFT JOIN DATACO.GOLD.DIM_CATEGORY cat
   ON f.CATEGORY_ID = cat.CATEGORY_ID
 LEFT JOIN DATACO.GOLD.DIM_DEPARTMENT dep
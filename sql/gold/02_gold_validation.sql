@@ -15,10 +15,10 @@ SELECT 'gold.dim_discount_band', COUNT(*) FROM workspace.gold.dim_discount_band
 SELECT 'gold.fact_sales', COUNT(*) FROM workspace.gold.fact_sales UNION ALL
 SELECT 'gold.fact_fulfilment', COUNT(*) FROM workspace.gold.fact_fulfilment;
 
--- 2) Dimension key uniqueness
+-- 2) Dimension key uniqueness (type 2 dims: current versions)
 SELECT 'dim_date' AS dim, COUNT(*) AS rows, COUNT(DISTINCT date_key) AS distinct_keys FROM workspace.gold.dim_date UNION ALL
-SELECT 'dim_customer', COUNT(*), COUNT(DISTINCT customer_id) FROM workspace.gold.dim_customer UNION ALL
-SELECT 'dim_product', COUNT(*), COUNT(DISTINCT product_card_id) FROM workspace.gold.dim_product UNION ALL
+SELECT 'dim_customer', COUNT(*), COUNT(DISTINCT customer_id) FROM workspace.gold.dim_customer WHERE is_current UNION ALL
+SELECT 'dim_product', COUNT(*), COUNT(DISTINCT product_card_id) FROM workspace.gold.dim_product WHERE is_current UNION ALL
 SELECT 'dim_category', COUNT(*), COUNT(DISTINCT category_id) FROM workspace.gold.dim_category UNION ALL
 SELECT 'dim_department', COUNT(*), COUNT(DISTINCT department_id) FROM workspace.gold.dim_department UNION ALL
 SELECT 'dim_geo', COUNT(*), COUNT(DISTINCT geo_key) FROM workspace.gold.dim_geo UNION ALL
@@ -65,8 +65,8 @@ SELECT
   COUNT(*) AS fact_rows
 FROM workspace.gold.fact_sales f
 LEFT JOIN workspace.gold.dim_date d           ON f.order_date_key = d.date_key
-LEFT JOIN workspace.gold.dim_customer c       ON f.customer_id = c.customer_id
-LEFT JOIN workspace.gold.dim_product p        ON f.product_card_id = p.product_card_id
+LEFT JOIN workspace.gold.dim_customer c       ON f.customer_id = c.customer_id AND c.is_current
+LEFT JOIN workspace.gold.dim_product p        ON f.product_card_id = p.product_card_id AND p.is_current
 LEFT JOIN workspace.gold.dim_geo g            ON f.geo_key = g.geo_key
 LEFT JOIN workspace.gold.dim_channel ch       ON f.channel_key = ch.channel_key
 LEFT JOIN workspace.gold.dim_discount_band b  ON f.discount_band_key = b.discount_band_key
@@ -87,8 +87,8 @@ SELECT
 FROM workspace.gold.fact_fulfilment f
 LEFT JOIN workspace.gold.dim_date d1      ON f.order_date_key = d1.date_key
 LEFT JOIN workspace.gold.dim_date d2      ON f.ship_date_key  = d2.date_key
-LEFT JOIN workspace.gold.dim_customer c   ON f.customer_id = c.customer_id
-LEFT JOIN workspace.gold.dim_product p    ON f.product_card_id = p.product_card_id
+LEFT JOIN workspace.gold.dim_customer c   ON f.customer_id = c.customer_id AND c.is_current
+LEFT JOIN workspace.gold.dim_product p    ON f.product_card_id = p.product_card_id AND p.is_current
 LEFT JOIN workspace.gold.dim_geo g        ON f.geo_key = g.geo_key
 LEFT JOIN workspace.gold.dim_channel ch   ON f.channel_key = ch.channel_key
 LEFT JOIN workspace.gold.dim_category cat ON f.category_id = cat.category_id
@@ -0,0 +1,46 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline import export
+
+
+def write_export(tmp_path, rows=100):
+    out_dir = tmp_path / "fact_sales" / "v3"
+    out_dir.mkdir(parents=True)
+    pq.write_table(pa.table({"order_item_id": list(range(rows))}), out_dir / "part-00000.parquet")
+    files = [export.file_entry(out_dir / "part-00000.parquet", out_dir, rows)]
+    export.write_manifest(out_dir, "fact_sales", "workspace.gold.fact_sales", 3,
+                          [{"name": "order_item_id", "type": "bigint", "nullable": True}], rows, files)
+    return out_dir
+
+
+def test_complete_export_has_no_problems(tmp_path):
+    out_dir = write_export(tmp_path)
+    assert export.verify_manifest(out_dir.parent / export.LATEST) == []
+    assert export.verify_manifest(out_dir / export.MANIFEST) == []
+
+
+def test_missing_file(tmp_path):
+    out_dir = write_export(tmp_path)
+    (out_dir / "part-00000.parquet").unlink()
+    assert export.verify_manifest(out_dir / export.MANIFEST) == ["missing: part-00000.parquet"]
+
+
+def test_size_and_checksum_mismatch(tmp_path):
+    out_dir = write_export(tmp_path)
+    path = out_dir / "part-00000.parquet"
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert export.verify_manifest(out_dir / export.MANIFEST) == ["checksum mismatch: part-00000.parquet"]
+    path.write_bytes(bytes(data) + b"\0")
+    assert export.verify_manifest(out_dir / export.MANIFEST) == ["size mismatch: part-00000.parquet"]
+
+
+def test_row_count_mismatch(tmp_path):
+    out_dir = write_export(tmp_path)
+    files = [export.file_entry(out_dir / "part-00000.parquet", out_dir, 100)]
+    export.write_manifest(out_dir, "fact_sales", "workspace.gold.fact_sales", 3, [], 101, files)
+    assert export.verify_manifest(out_dir / export.MANIFEST) == [
+        "row count mismatch: files hold 100, manifest says 101"
+    ]
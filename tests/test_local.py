@@ -0,0 +1,130 @@
+import shutil
+
+import pytest
+
+from pipeline import gold, synthetic
+from pipeline.local import AUDITED_TABLE, SILVER_TABLE, LocalPipeline, spark_xxhash64, translate, xxh64
+
+
+# -- xxhash64 ----------------------------------------------------------------
+
+def test_xxh64_reference_vectors():
+    assert xxh64(b"", 0) == 0xEF46DB3751D8E999
+    assert xxh64(b"abc", 0) == 0x44BC2CF5AD770999
+    assert xxh64(b"Nobody inspects the spammish repetition", 0) == 0xFBCEA83C8A378BF1  # > 32 bytes
+
+
+def test_spark_xxhash64_matches_databricks():
+    # channel_key of (USCA, West of USA, Standard Class) in data/databricks_gold_export/dim_channel.csv
+    assert spark_xxhash64(["USCA", "WEST OF USA", "STANDARD CLASS"]) == -6414398782282335679
+
+
+def test_spark_xxhash64_chains_arguments_and_skips_nulls():
+    expected = xxh64(b"b", xxh64(b"a", 42))
+    assert spark_xxhash64(["a", "b"]) % (1 << 64) == expected
+    assert spark_xxhash64(["a", None]) == spark_xxhash64([None, "a"])
+    assert spark_xxhash64(["a", "\0"]) != spark_xxhash64(["\0", "a"])
+
+
+# -- translate ---------------------------------------------------------------
+
+def test_translate_xxhash64():
+    assert translate("SELECT xxhash64(coalesce(a, ''), b) AS k FROM t") == \
+        "SELECT spark_xxhash64([coalesce(a, ''), b]) AS k FROM t"
+
+
+def test_translate_sequence_explode():
+    sql = "SELECT explode(sequence(to_date('2015-01-01'), to_date('2015-01-05'), interval 1 day)) AS d"
+    assert translate(sql) == (
+        "SELECT unnest(CAST(generate_series(CAST('2015-01-01' AS DATE), CAST('2015-01-05' AS DATE), "
+        "interval 1 day) AS DATE[])) AS d"
+    )
+
+
+def test_translate_unicode_class_and_replace_all():
+    assert translate("SELECT regexp_replace(city, '[^\\\\p{L} ]', '') FROM t") == \
+        "SELECT regexp_replace(city, '[^\\p{L} ]', '', 'g') FROM t"
+
+
+def test_translate_null_marker_literal():
+    assert translate("SELECT coalesce(a, '\\u0000')") == "SELECT coalesce(a, ('' || chr(0) || ''))"
+
+
+def test_translate_drops_comments():
+    # The apostrophe must not open a literal that swallows the statement
+    assert translate("-- it's xxhash64(a)\nSELECT 'x' <=> y") == "\nSELECT 'x' IS NOT DISTINCT FROM y"
+
+
+def test_merge_runs_on_duckdb(tmp_path):
+    local = LocalPipeline(workdir=tmp_path)
+    local.sql("CREATE TABLE workspace.gold.m (k INT, v STRING, w STRING)")
+    local.sql("INSERT INTO workspace.gold.m VALUES (1, 'a', NULL), (2, 'b', 'x'), (3, 'c', 'y')")
+    source = "SELECT * FROM (VALUES (1, 'a', NULL), (2, 'B', 'x'), (4, 'd', NULL)) AS s(k, v, w)"
+    sql = gold.merge_sql("workspace.gold.m", source, ("k",), ["k", "v", "w"])
+    assert "<=>" not in translate(sql)
+    # 2 updated, 4 inserted, 3 deleted; 1 is unchanged (NULL <=> NULL)
+    assert local.sql(sql).fetchone()[0] == 3
+    assert sorted(local.sql("SELECT * FROM workspace.gold.m").fetchall()) == [
+        (1, "a", None), (2, "B", "x"), (4, "d", None)
+    ]
+
+
+# -- incremental vs full -----------------------------------------------------
+
+@pytest.fixture(scope="module")
+def extracts(tmp_path_factory):
+    """Day 1: first part of the extract; day 2: both parts, with corrected rows in the first."""
+    root = tmp_path_factory.mktemp("synthetic")
+    synthetic.generate(0.02, root / "r0", parts=2, max_workers=2)
+    synthetic.generate(0.02, root / "r1", parts=2, max_workers=2, revision=1)
+    (root / "day1").mkdir()
+    shutil.copy(root / "r0" / "part-00000.csv", root / "day1")
+    return root
+
+
+# Stamped with the run's clock, so they differ between any two runs
+RUN_COLUMNS = ("_ingest_ts", "_batch_id", "valid_from", "valid_to")
+
+
+def table_rows(local, table):
+    columns = [r[0] for r in local.sql(f"DESCRIBE {table}").fetchall() if r[0] not in RUN_COLUMNS]
+    return sorted(local.sql(f"SELECT {', '.join(columns)} FROM {table}").fetchall(), key=repr)
+
+
+def test_incremental_run_matches_full_rebuild(extracts, tmp_path):
+    incremental = LocalPipeline(workdir=tmp_path / "incremental")
+    incremental.run(extracts / "day1")
+    incremental.run(extracts / "r1", mode="incremental")
+
+    full = LocalPipeline(workdir=tmp_path / "full")
+    full.run(extracts / "r1")
+
+    audited, items = incremental.sql(
+        f"SELECT COUNT(*), COUNT(DISTINCT order_item_id) FROM {AUDITED_TABLE}"
+    ).fetchone()
+    assert audited > items  # day 1 items corrected on day 2 were appended again
+
+    for table in [SILVER_TABLE] + [f"{gold.GOLD_SCHEMA}.{name}" for name in gold.GOLD_TABLES]:
+        assert table_rows(incremental, table) == table_rows(full, table), table
+
+
+def test_full_silver_rebuild_keeps_latest_correction(extracts, tmp_path):
+    local = LocalPipeline(workdir=tmp_path)
+    local.run(extracts / "day1")
+    local.run(extracts / "r1", mode="incremental")
+    merged = table_rows(local, SILVER_TABLE)
+
+    local.build_silver("full")
+    local.build_gold()
+    for table in (SILVER_TABLE, f"{gold.GOLD_SCHEMA}.fact_sales"):
+        rows, items = local.sql(f"SELECT COUNT(*), COUNT(DISTINCT order_item_id) FROM {table}").fetchone()
+        assert rows == items, table
+    assert table_rows(local, SILVER_TABLE) == merged
+
+
+def test_incremental_rerun_appends_nothing(extracts, tmp_path):
+    local = LocalPipeline(workdir=tmp_path)
+    local.run(extracts / "r0")
+    before = local.sql(f"SELECT COUNT(*) FROM {AUDITED_TABLE}").fetchone()[0]
+    local.run(extracts / "r0", mode="incremental")
+    assert local.sql(f"SELECT COUNT(*) FROM {AUDITED_TABLE}").fetchone()[0] == before
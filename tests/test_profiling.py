@@ -0,0 +1,35 @@
+import pytest
+
+from pipeline.profiling import PROBS, merge_quantiles
+
+
+def uniform(low, high):
+    return [low + (high - low) * p for p in PROBS]
+
+
+def test_single_batch_keeps_its_quantiles():
+    assert merge_quantiles([(100, uniform(0, 10))]) == pytest.approx(uniform(0, 10))
+
+
+def test_disjoint_batches_of_equal_size():
+    merged = merge_quantiles([(50, uniform(0, 1)), (50, uniform(1, 2))])
+    assert merged[0] == 0 and merged[-1] == 2
+    assert merged[25] == pytest.approx(0.5)
+    assert merged[50] == pytest.approx(1.0)
+    assert merged[75] == pytest.approx(1.5)
+
+
+def test_batches_are_weighted_by_rows():
+    merged = merge_quantiles([(300, uniform(0, 1)), (100, uniform(1, 2))])
+    assert merged[75] == pytest.approx(1.0)
+
+
+def test_constant_batch_is_a_jump():
+    merged = merge_quantiles([(50, [5.0] * len(PROBS)), (50, uniform(0, 10))])
+    assert merged[50] == pytest.approx(5.0)
+    assert merged[0] == 0 and merged[-1] == 10
+
+
+def test_empty_batches_are_skipped():
+    assert merge_quantiles([(0, None), (0, [])]) is None
+    assert merge_quantiles([(0, None), (10, uniform(0, 1))]) == pytest.approx(uniform(0, 1))
@@ -0,0 +1,36 @@
+from pipeline.runner import _retryable, load_nodes, plan, sql_io
+
+
+def test_reads_and_writes_are_fully_qualified():
+    reads, writes = sql_io(
+        "CREATE OR REPLACE TABLE gold.a AS\n"
+        "SELECT * FROM workspace.silver.b s JOIN gold.c c ON s.k = c.k;\n"
+        "INSERT INTO gold.d SELECT * FROM gold.a"
+    )
+    assert reads == {"workspace.silver.b", "workspace.gold.c"}
+    assert writes == {"workspace.gold.a", "workspace.gold.d"}
+
+
+def test_tables_in_comments_are_ignored():
+    reads, writes = sql_io("-- SELECT * FROM gold.commented\nSELECT * FROM silver.t")
+    assert reads == {"workspace.silver.t"}
+    assert writes == set()
+
+
+def test_schema_writes():
+    assert sql_io("CREATE SCHEMA IF NOT EXISTS workspace.gold") == (set(), {"workspace.gold"})
+
+
+def test_independent_gold_builds_share_a_wave():
+    waves = {row["node"]: row["wave"] for row in plan(load_nodes(["sql/gold/01_gold_build.sql"]))}
+    assert waves["sql/gold/01_gold_build.sql#01"] == 0  # CREATE SCHEMA
+    assert {waves[f"sql/gold/01_gold_build.sql#{i:02d}"] for i in range(2, 12)} == {1}
+
+
+def test_deterministic_failures_are_not_retried():
+    class AnalysisException(Exception):
+        pass
+
+    assert not _retryable(RuntimeError("Schema drift in bronze"))
+    assert not _retryable(AnalysisException("[TABLE_OR_VIEW_NOT_FOUND]"))
+    assert _retryable(ConnectionError("connection reset"))
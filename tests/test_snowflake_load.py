@@ -0,0 +1,37 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.snowflake_load import chunk_files
+
+
+def manifest_for(export_dir, rows):
+    path = export_dir / "part-00000.parquet"
+    pq.write_table(pa.table({"id": list(range(rows)), "label": [f"row {i}" for i in range(rows)]}), path,
+                   row_group_size=1_000)
+    return {"files": [{"path": path.name, "rows": rows, "bytes": path.stat().st_size}]}
+
+
+def test_small_files_are_loaded_as_they_are(tmp_path):
+    manifest = manifest_for(tmp_path, 1_000)
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    assert chunk_files(tmp_path, manifest, work_dir) == [tmp_path / "part-00000.parquet"]
+    assert not any(work_dir.iterdir())
+
+
+def test_large_files_are_split_without_losing_rows(tmp_path):
+    manifest = manifest_for(tmp_path, 10_000)
+    size = manifest["files"][0]["bytes"]
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    chunks = chunk_files(tmp_path, manifest, work_dir, chunk_bytes=size // 4, max_chunk_bytes=size // 2)
+    assert len(chunks) >= 4
+    assert all(c.parent == work_dir for c in chunks)
+    ids = [i for c in chunks for i in pq.read_table(c).column("id").to_pylist()]
+    assert ids == list(range(10_000))
+
+
+def test_files_without_rows_are_not_split(tmp_path):
+    manifest = manifest_for(tmp_path, 10)
+    manifest["files"][0]["rows"] = 0
+    assert chunk_files(tmp_path, manifest, tmp_path, max_chunk_bytes=1) == [tmp_path / "part-00000.parquet"]
@@ -0,0 +1,23 @@
+from pipeline.sqlfiles import split_statements
+
+
+def test_split_on_semicolons():
+    assert split_statements("SELECT 1;\nSELECT 2;\n") == ["SELECT 1", "SELECT 2"]
+
+
+def test_semicolons_inside_quotes_do_not_split():
+    sql = "SELECT 'a;b' AS x; SELECT \"c;d\"; SELECT `e;f`"
+    assert split_statements(sql) == ["SELECT 'a;b' AS x", 'SELECT "c;d"', "SELECT `e;f`"]
+
+
+def test_escaped_quote_stays_inside_the_literal():
+    assert split_statements("SELECT 'it\\'s; fine'; SELECT 2") == ["SELECT 'it\\'s; fine'", "SELECT 2"]
+
+
+def test_semicolons_inside_comments_do_not_split():
+    sql = "SELECT 1 -- not; here\n; /* nor; here */ SELECT 2"
+    assert split_statements(sql) == ["SELECT 1 -- not; here", "/* nor; here */ SELECT 2"]
+
+
+def test_comment_only_statements_are_dropped():
+    assert split_statements("SELECT 1;\n-- trailing note;\n") == ["SELECT 1"]